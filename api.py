@@ -0,0 +1,511 @@
+"""API JSON - FuryCelula
+
+Blueprint com as mesmas ações das páginas, mas respondendo só com o recurso
+alterado (missão, perfil, loja, histórico) em JSON, sem renderizar template
+nem redirecionar. GETs levam ETag e respondem 304 a um If-None-Match igual.
+"""
+import io
+
+from flask import Blueprint, Response, jsonify, request, url_for
+
+from config import ITENS_LOJA, TIPOS_HISTORICO, HISTORICO_POR_PAGINA, BUSCA_LIMITE
+from database import get_repositorio
+import importacao
+from utils import (
+    salvar_log,
+    criar_missao,
+    validar_titulo,
+    validar_status,
+    validar_tag,
+    validar_tag_missao,
+    carregar_perfil,
+    adicionar_xp,
+    adicionar_moedas,
+    comprar_item,
+    equipar_item,
+    executar_lote
+)
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+repo = get_repositorio()
+
+# Endpoints que só leem dados (em GET): dispensam a trava entre processos
+ROTAS_SOMENTE_LEITURA = {
+    "api.listar_missoes",
+    "api.obter_missao",
+    "api.progresso_missao",
+    "api.listar_tags",
+    "api.perfil",
+    "api.loja",
+    "api.historico",
+    "api.buscar",
+    "api.exportar_missoes",
+    "api.exportar_historico",
+}
+
+
+def _condicional(dados):
+    """Resposta JSON com ETag; 304 sem corpo se o cliente já tem essa versão."""
+    resposta = jsonify(dados)
+    resposta.add_etag()
+    return resposta.make_conditional(request)
+
+
+def _erro(mensagem, codigo):
+    return jsonify({"erro": mensagem}), codigo
+
+
+CORPO_INVALIDO = "O corpo JSON deve ser um objeto"
+
+
+def _dados_requisicao():
+    """Campos do corpo da requisição, em JSON ou formulário; None se o JSON não é um objeto."""
+    dados = request.get_json(silent=True)
+    if dados is None:
+        return request.form
+    return dados if isinstance(dados, dict) else None
+
+
+def _tag(dados):
+    """Tag {id} ou {nome, cor} a partir dos campos enviados, ou None."""
+    tag = dados.get("tag")
+    if isinstance(tag, dict):
+        return tag if tag.get("id") or (tag.get("nome") and tag.get("cor")) else None
+    if dados.get("tag_id"):
+        return {"id": dados["tag_id"]}
+    nome, cor = dados.get("tag_nome"), dados.get("tag_cor")
+    return {"nome": nome, "cor": cor} if nome and cor else None
+
+
+def _lista_de_textos(valor):
+    """True se `valor` é uma lista de strings (um texto solto viraria letra por letra)."""
+    return isinstance(valor, list) and all(isinstance(item, str) for item in valor)
+
+
+def _resumo_perfil():
+    """Campos do perfil que mudam com as ações (XP, nível, moedas)."""
+    perfil = carregar_perfil()
+    return {chave: perfil.get(chave) for chave in ("nivel", "xp", "xp_proximo_nivel", "moedas")}
+
+
+def _com_xp(mensagem, xp):
+    novo_nivel, subiu = adicionar_xp(xp)
+    if subiu:
+        mensagem += f" SUBIU DE NÍVEL! {novo_nivel}!"
+    return mensagem
+
+
+# --- Missões ---
+
+@api.route("/missoes")
+def listar_missoes():
+    """Lista as missões na ordem atual (filtros opcionais ?status= e ?tag=<id>)."""
+    status = request.args.get("status")
+    if status and not validar_status(status)[0]:
+        return _erro("Status inválido", 400)
+    return _condicional({
+        "missoes": repo.listar_missoes(status, tag=request.args.get("tag") or None),
+        "estatisticas": repo.estatisticas(),
+    })
+
+
+@api.route("/missoes", methods=["POST"])
+def criar():
+    """Cria uma missão (+10 XP). Campos: titulo, tag {nome, cor}."""
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    titulo = (dados.get("titulo") or "").strip()
+
+    sucesso, nova_missao, erro = criar_missao(titulo, _tag(dados))
+    if not sucesso:
+        return _erro(erro, 400)
+    if not repo.adicionar_missao(nova_missao):
+        return _erro("Erro ao salvar missão", 500)
+
+    salvar_log("Criou missão", titulo)
+    mensagem = _com_xp("Missão criada (+10 XP)!", 10)
+    # Como gravada (ordem, tag {id, nome, cor}): igual ao GET do Location
+    missao = repo.obter_missao(nova_missao["id"])
+    resposta = jsonify({"missao": missao, "perfil": _resumo_perfil(), "mensagem": mensagem})
+    resposta.headers["Location"] = url_for("api.obter_missao", missao_id=nova_missao["id"])
+    return resposta, 201
+
+
+@api.route("/missoes/lote", methods=["POST"])
+def lote():
+    """
+    Aplica uma ação a várias missões em uma só gravação.
+
+    Campos: acao (concluir, iniciar, tag, apagar, importar), ids, tag
+    {id} ou {nome, cor} e, para importar, titulos.
+    """
+    dados = request.get_json(silent=True)
+    if dados is not None and not isinstance(dados, dict):
+        return _erro(CORPO_INVALIDO, 400)
+    if dados is None:
+        dados = {
+            "acao": request.form.get("acao"),
+            "ids": request.form.getlist("ids"),
+            "titulos": request.form.get("titulos", "").splitlines(),
+            "tag_nome": request.form.get("tag_nome"),
+            "tag_cor": request.form.get("tag_cor"),
+        }
+    ids, titulos = dados.get("ids") or [], dados.get("titulos") or []
+    if not _lista_de_textos(ids) or not _lista_de_textos(titulos):
+        return _erro("ids e titulos devem ser listas de textos", 400)
+    sucesso, mensagem, missoes = executar_lote(
+        dados.get("acao"), ids=ids, tag=_tag(dados), titulos=titulos
+    )
+    if not sucesso:
+        return _erro(mensagem, 400)
+    return jsonify({
+        "missoes": missoes,
+        "perfil": _resumo_perfil(),
+        "estatisticas": repo.estatisticas(),
+        "mensagem": mensagem,
+    })
+
+
+@api.route("/missoes/importar", methods=["POST"])
+def importar_missoes():
+    """
+    Importa missões de CSV ou JSON Lines (arquivo `arquivo` ou corpo cru).
+
+    O formato vem de ?formato= ou da extensão do arquivo; ?estrito=1 não
+    grava nada se alguma linha tiver erro. Responde com o relatório por linha.
+    """
+    enviado = request.files.get("arquivo")
+    fluxo = enviado.stream if enviado else request.stream
+    nome = enviado.filename if enviado else ""
+    formato = request.args.get("formato") or importacao.formato_do_arquivo(nome, padrao="")
+    if not formato and not enviado:
+        formato = "jsonl" if "json" in (request.mimetype or "") else "csv"
+    if formato not in importacao.FORMATOS_TRANSFERENCIA:
+        return _erro("Formato inválido (use csv ou jsonl)", 400)
+
+    estrito = request.args.get("estrito") in ("1", "true")
+    if estrito and not (enviado and enviado.stream.seekable()):
+        # O modo estrito lê a entrada duas vezes
+        fluxo = io.BytesIO(fluxo.read())
+    texto = io.TextIOWrapper(fluxo, encoding="utf-8-sig", newline="")
+    try:
+        resultado = importacao.importar_missoes(texto, formato, estrito=estrito, origem=nome)
+    except UnicodeDecodeError:
+        return _erro("Arquivo não está em UTF-8", 400)
+    finally:
+        texto.detach()
+
+    resultado["estatisticas"] = repo.estatisticas()
+    # Estrito com erros: nada foi gravado
+    return jsonify(resultado), 422 if estrito and resultado["total_erros"] else 200
+
+
+@api.route("/missoes/exportar")
+def exportar_missoes():
+    """Todas as missões em CSV ou JSON Lines (?formato=), geradas em streaming."""
+    return _exportacao(importacao.exportar_missoes, "missoes")
+
+
+@api.route("/missoes/<missao_id>")
+def obter_missao(missao_id):
+    missao = repo.obter_missao(missao_id)
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+    return _condicional({"missao": missao})
+
+
+@api.route("/missoes/<missao_id>", methods=["PATCH"])
+def editar_missao(missao_id):
+    """Altera título e/ou tag (tag nula remove a tag)."""
+    missao = repo.obter_missao(missao_id)
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    campos = {}
+    if "titulo" in dados:
+        is_valid, titulo_sanitizado, erro = validar_titulo((dados.get("titulo") or "").strip())
+        if not is_valid:
+            return _erro(erro, 400)
+        campos["titulo"] = titulo_sanitizado
+    if "tag" in dados or "tag_nome" in dados or "tag_id" in dados:
+        is_valid, campos["tag"], erro = validar_tag_missao(_tag(dados))
+        if not is_valid:
+            return _erro(erro, 400)
+    if not campos:
+        return _erro("Nada para alterar", 400)
+
+    titulo_antigo = missao["titulo"]
+    atualizada = repo.atualizar_missao(missao_id, campos)
+    if atualizada is None:
+        return _erro("Erro ao salvar alterações", 500)
+    if "titulo" in campos:
+        salvar_log("Editou missão", f"{titulo_antigo} → {campos['titulo']}")
+    return jsonify({"missao": atualizada})
+
+
+@api.route("/missoes/<missao_id>", methods=["DELETE"])
+def apagar_missao(missao_id):
+    missao = repo.remover_missao(missao_id)
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+    salvar_log("Excluiu missão", missao["titulo"])
+    return jsonify({"missao": missao, "estatisticas": repo.estatisticas()})
+
+
+@api.route("/missoes/<missao_id>/iniciar", methods=["POST"])
+def iniciar_missao(missao_id):
+    missao = repo.atualizar_missao(missao_id, {"status": "em_andamento"})
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+    salvar_log("Iniciou missão", missao["titulo"])
+    return jsonify({"missao": missao, "estatisticas": repo.estatisticas()})
+
+
+@api.route("/missoes/<missao_id>/registrar", methods=["POST"])
+def registrar_progresso(missao_id):
+    """Registra progresso sem concluir (+5 XP)."""
+    from datetime import datetime
+
+    missao = repo.registrar_progresso(missao_id, {"data": datetime.now().isoformat()})
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+
+    salvar_log("Registrou progresso", missao["titulo"])
+    mensagem = _com_xp(f"Progresso registrado! (+5 XP) Total: {missao['progresso']['total']}x", 5)
+    return jsonify({"missao": missao, "perfil": _resumo_perfil(), "mensagem": mensagem})
+
+
+@api.route("/missoes/<missao_id>/progresso")
+def progresso_missao(missao_id):
+    """Contagem por dia de todo o período e os registros ainda não compactados."""
+    progresso = repo.progresso_da_missao(missao_id)
+    if progresso is None:
+        return _erro("Missão não encontrada", 404)
+    return _condicional({"progresso": progresso})
+
+
+@api.route("/missoes/<missao_id>/concluir", methods=["POST"])
+def concluir_missao(missao_id):
+    """Conclui a missão (+50 XP, +5 moedas). Concluir de novo não rende nada."""
+    missao = repo.obter_missao(missao_id)
+    if missao is None:
+        return _erro("Missão não encontrada", 404)
+    if missao["status"] == "concluída":
+        return jsonify({"missao": missao, "mensagem": "Missão já concluída"})
+
+    missao = repo.atualizar_missao(missao_id, {"status": "concluída"})
+    if missao is None:
+        return _erro("Erro ao atualizar missão", 500)
+
+    salvar_log("Concluiu missão", missao["titulo"])
+    mensagem = _com_xp("Missão concluída (+50 XP, +5 Moedas)!", 50)
+    adicionar_moedas(5)
+    return jsonify({
+        "missao": missao,
+        "perfil": _resumo_perfil(),
+        "estatisticas": repo.estatisticas(),
+        "mensagem": mensagem,
+    })
+
+
+@api.route("/missoes/<missao_id>/posicao", methods=["POST"])
+def posicionar_missao(missao_id):
+    """Move a missão para `posicao` (0 = topo) ou para junto de `depois_de`/`antes_de`."""
+    atual = repo.posicao_da_missao(missao_id)
+    if atual is None:
+        return _erro("Missão não encontrada", 404)
+
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    posicao = dados.get("posicao")
+    for campo, deslocamento in (("depois_de", 1), ("antes_de", 0)):
+        vizinha = dados.get(campo)
+        ref = repo.posicao_da_missao(vizinha) if vizinha else None
+        if ref is not None:
+            # Sem a missão movida, as posições abaixo dela sobem uma casa
+            posicao = ref + deslocamento - (1 if ref > atual else 0)
+
+    try:
+        posicao = int(posicao)
+    except (TypeError, ValueError):
+        return _erro("Posição inválida", 400)
+    if not repo.posicionar_missao(missao_id, posicao):
+        return _erro("Não foi possível mover a missão", 400)
+    return jsonify({"missao": repo.obter_missao(missao_id), "posicao": repo.posicao_da_missao(missao_id)})
+
+
+# --- Tags ---
+
+@api.route("/tags")
+def listar_tags():
+    return _condicional({"tags": repo.listar_tags()})
+
+
+@api.route("/tags", methods=["POST"])
+def criar_tag():
+    """Cria uma tag. Campos: nome, cor (#rrggbb)."""
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    valida, nome, erro = validar_tag(dados.get("nome"), dados.get("cor"))
+    if not valida:
+        return _erro(erro, 400)
+    tag = repo.criar_tag(nome, dados["cor"])
+    if tag is None:
+        return _erro("Tag já existe", 409)
+    return jsonify({"tag": tag}), 201
+
+
+@api.route("/tags/<tag_id>", methods=["PATCH"])
+def editar_tag(tag_id):
+    """Renomeia e/ou troca a cor (só a tag é gravada, não as missões)."""
+    tag = repo.obter_tag(tag_id)
+    if tag is None:
+        return _erro("Tag não encontrada", 404)
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    valida, nome, erro = validar_tag(dados.get("nome", tag["nome"]), dados.get("cor", tag["cor"]))
+    if not valida:
+        return _erro(erro, 400)
+    if nome != tag["nome"]:
+        if repo.renomear_tag(tag_id, nome) is None:
+            return _erro("Já existe uma tag com esse nome", 409)
+        salvar_log("Editou tag", f"{tag['nome']} → {nome}")
+    if dados.get("cor", tag["cor"]) != tag["cor"]:
+        repo.recolorir_tag(tag_id, dados["cor"])
+    return jsonify({"tag": repo.obter_tag(tag_id)})
+
+
+@api.route("/tags/<tag_id>/mesclar", methods=["POST"])
+def mesclar_tag(tag_id):
+    """Junta a tag à tag `destino` (ID); as missões dela passam para o destino."""
+    origem = repo.obter_tag(tag_id)
+    if origem is None:
+        return _erro("Tag não encontrada", 404)
+    dados = _dados_requisicao()
+    if dados is None:
+        return _erro(CORPO_INVALIDO, 400)
+    destino = repo.mesclar_tags(tag_id, dados.get("destino", ""))
+    if destino is None:
+        return _erro("Destino inválido", 400)
+    salvar_log("Editou tag", f"{origem['nome']} mesclada em {destino['nome']}")
+    return jsonify({"tag": destino, "estatisticas": repo.estatisticas()})
+
+
+@api.route("/tags/<tag_id>", methods=["DELETE"])
+def apagar_tag(tag_id):
+    """Apaga a tag; as missões dela ficam sem tag."""
+    afetadas = repo.remover_tag(tag_id)
+    if afetadas is None:
+        return _erro("Tag não encontrada", 404)
+    return jsonify({"missoes_afetadas": afetadas, "estatisticas": repo.estatisticas()})
+
+
+# --- Perfil e loja ---
+
+@api.route("/perfil")
+def perfil():
+    return _condicional({"perfil": carregar_perfil()})
+
+
+@api.route("/loja")
+def loja():
+    perfil_atual = carregar_perfil()
+    inventario = perfil_atual.get("inventario", [])
+    itens = [dict(item, possui=item["id"] in inventario) for item in ITENS_LOJA]
+    return _condicional({
+        "itens": itens,
+        "moedas": perfil_atual.get("moedas", 0),
+        "tema_ativo": perfil_atual.get("tema_ativo", ""),
+    })
+
+
+@api.route("/loja/<item_id>/comprar", methods=["POST"])
+def comprar(item_id):
+    sucesso, mensagem = comprar_item(item_id)
+    if not sucesso:
+        return _erro(mensagem, 400)
+    salvar_log("Comprou item", item_id)
+    return jsonify({"perfil": carregar_perfil(), "mensagem": mensagem})
+
+
+@api.route("/loja/<item_id>/equipar", methods=["POST"])
+def equipar(item_id):
+    sucesso, mensagem = equipar_item(item_id)
+    if not sucesso:
+        return _erro(mensagem, 400)
+    return jsonify({"tema_ativo": carregar_perfil().get("tema_ativo", ""), "mensagem": mensagem})
+
+
+# --- Histórico ---
+
+@api.route("/historico")
+def historico():
+    """Uma página do histórico; filtros como em /historico (tipo, modo, de, ate, cursor)."""
+    try:
+        limite = min(max(int(request.args.get("limite", HISTORICO_POR_PAGINA)), 1), 500)
+    except ValueError:
+        return _erro("Limite inválido", 400)
+
+    logs, proximo = repo.pagina_historico(
+        cursor=request.args.get("cursor"),
+        limite=limite,
+        tipos=[t for t in request.args.getlist("tipo") if t in TIPOS_HISTORICO],
+        excluir=request.args.get("modo") == "excluir",
+        de=request.args.get("de") or None,
+        ate=request.args.get("ate") or None,
+    )
+    return _condicional({"logs": logs, "proximo": proximo})
+
+
+@api.route("/historico/exportar")
+def exportar_historico():
+    """Histórico inteiro em CSV ou JSON Lines (?formato=), gerado em streaming."""
+    return _exportacao(importacao.exportar_historico, "historico")
+
+
+def _exportacao(exportar, nome):
+    formato = request.args.get("formato", "csv")
+    if formato not in importacao.FORMATOS_TRANSFERENCIA:
+        return _erro("Formato inválido (use csv ou jsonl)", 400)
+    tipo = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return Response(
+        exportar(formato),
+        mimetype=tipo,
+        headers={"Content-Disposition": f"attachment; filename={nome}.{formato}"},
+    )
+
+
+# --- Busca ---
+
+@api.route("/busca")
+def buscar():
+    """
+    Busca textual (sem acentos, por prefixo) em missões e/ou histórico.
+
+    Parâmetros: q, em (missoes, historico ou ambos, o padrão), limite.
+    """
+    consulta = request.args.get("q", "").strip()
+    if not consulta:
+        return _erro("Informe o termo de busca (q)", 400)
+    try:
+        limite = min(max(int(request.args.get("limite", BUSCA_LIMITE)), 1), 500)
+    except ValueError:
+        return _erro("Limite inválido", 400)
+
+    em = request.args.get("em")
+    resultado = {}
+    if em in (None, "", "missoes"):
+        resultado["missoes"] = repo.buscar_missoes(consulta, limite)
+    if em in (None, "", "historico"):
+        resultado["historico"] = repo.buscar_historico(consulta, limite)
+    if not resultado:
+        return _erro("'em' deve ser missoes ou historico", 400)
+    return _condicional(resultado)
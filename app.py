@@ -2,35 +2,108 @@
 
 Aplicação de gerenciamento de missões com gamificação.
 """
-import random
-import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, g
 
 # Importar configurações e utilitários
 from config import (
-    MISSOES_PATH,
-    HISTORICO_PATH,
-    PERFIL_PATH,
     FLASK_DEBUG,
     FLASK_SECRET_KEY,
-    ITENS_LOJA
+    SERVIDOR_HOST,
+    SERVIDOR_PORTA,
+    ITENS_LOJA,
+    TIPOS_HISTORICO,
+    PERFIL_WRITE_BEHIND_SEGUNDOS
 )
+from database import get_repositorio
+from eventos import configurar as configurar_eventos
+from fragmentos import Adiado, configurar as configurar_fragmentos
+from metricas import configurar as configurar_metricas
+from api import api, ROTAS_SOMENTE_LEITURA as ROTAS_API_SOMENTE_LEITURA
 from utils import (
-    carregar_json,
-    salvar_json,
     salvar_log,
     criar_missao,
     validar_titulo,
+    validar_tag,
+    validar_tag_missao,
     carregar_perfil,
     salvar_perfil,
+    apagar_perfil,
+    iniciar_sessao,
+    encerrar_sessao,
+    configurar_perfil_adiado,
     adicionar_xp,
     adicionar_moedas,
     comprar_item,
-    equipar_item
+    equipar_item,
+    executar_lote,
+    versoes_dados
 )
 
 app = Flask(__name__)
 app.secret_key = FLASK_SECRET_KEY
+app.register_blueprint(api)
+
+# Métricas (GET /metrics, Server-Timing, cProfile opcional); antes dos
+# hooks abaixo, para medir a requisição inteira
+configurar_metricas(app)
+
+# Cache de fragmentos ({% fragmento %}) e de bytecode dos templates
+configurar_fragmentos(app)
+
+# Eventos ao vivo (GET /eventos): perfil, contadores, status e histórico
+configurar_eventos(app)
+
+# Repositório de dados (JSON ou SQLite, conforme config.STORAGE_BACKEND)
+repo = get_repositorio()
+
+# Write-behind opcional do perfil (FURY_PERFIL_WRITE_BEHIND=<segundos>)
+if PERFIL_WRITE_BEHIND_SEGUNDOS > 0:
+    configurar_perfil_adiado(PERFIL_WRITE_BEHIND_SEGUNDOS)
+
+
+# Páginas que só leem dados (em GET): dispensam a trava entre processos e
+# leem os objetos publicados no cache, que as requisições que alteram dados
+# não tocam (cópia na escrita, ver utils.carregar_em_sessao)
+ROTAS_SOMENTE_LEITURA = {
+    "static",
+    "index",
+    "dashboard",
+    "missoes",
+    "editar_missao",
+    "editar_missao_posicao",
+    "configuracoes",
+    "historico",
+    "loja",
+    "metricas",
+    "eventos",
+} | ROTAS_API_SOMENTE_LEITURA
+
+
+@app.before_request
+def abrir_sessao():
+    """Abre a unidade de trabalho: cada arquivo é lido e gravado uma vez por requisição."""
+    somente_leitura = request.method in ("GET", "HEAD") and request.endpoint in ROTAS_SOMENTE_LEITURA
+    iniciar_sessao(exclusiva=not somente_leitura)
+    if somente_leitura and request.blueprint is None and request.endpoint != "static":
+        # Versões lidas antes dos dados: se outro processo gravar no meio da
+        # requisição, o fragmento fica com a versão antiga e só é refeito
+        g.versoes = repo.versoes()
+
+
+@app.after_request
+def gravar_sessao(response):
+    """Grava de uma vez o que a requisição alterou (perfil, missões, histórico)."""
+    # O Flask chama after_request também para o 500 de uma exceção: nesse
+    # caso a sessão fica aberta e descartar_sessao a descarta
+    if response.status_code < 500:
+        encerrar_sessao()
+    return response
+
+
+@app.teardown_request
+def descartar_sessao(exc):
+    """Descarta as alterações pendentes se a requisição terminou em erro (5xx)."""
+    encerrar_sessao(gravar=False)
 
 
 @app.route("/")
@@ -47,10 +120,21 @@ def inject_perfil():
     return dict(perfil=p)
 
 
+@app.context_processor
+def inject_tags():
+    """Injeta as tags (id, nome, cor) em todos os templates (lidas só se usadas)."""
+    return dict(tags=Adiado(repo.listar_tags))
+
+
+@app.context_processor
+def inject_versoes():
+    """Injeta as versões dos dados, chaves dos {% fragmento %} dos templates."""
+    return dict(versoes=versoes_dados(g.get("versoes")))
+
+
 @app.route("/dashboard", methods=["GET", "POST"])
 def dashboard():
     """Dashboard com métricas e adição de missões."""
-    missoes = carregar_json(MISSOES_PATH)
     perfil = carregar_perfil()
     
     if request.method == "POST":
@@ -66,8 +150,7 @@ def dashboard():
         sucesso, nova_missao, erro = criar_missao(titulo, tag)
         
         if sucesso:
-            missoes.append(nova_missao)
-            if salvar_json(MISSOES_PATH, missoes):
+            if repo.adicionar_missao(nova_missao):
                 salvar_log("Criou missão", titulo)
                 novo_nivel, subiu = adicionar_xp(10)
                 msg = "Missão criada (+10 XP)!"
@@ -82,18 +165,15 @@ def dashboard():
         return redirect(url_for("dashboard"))
     
     # Calcular métricas
-    total = len(missoes)
-    concluidas = len([m for m in missoes if m.get("status") == "concluída"])
-    abertas = total - concluidas
-    percentual = round((concluidas / total) * 100, 1) if total > 0 else 0
+    stats = repo.estatisticas()
     
     return render_template(
         "dashboard.html",
-        missoes=missoes,
-        total=total,
-        concluidas=concluidas,
-        abertas=abertas,
-        percentual=percentual,
+        missoes=Adiado(repo.listar_missoes),
+        total=stats["total"],
+        concluidas=stats["concluidas"],
+        abertas=stats["abertas"],
+        percentual=stats["percentual"],
         perfil=perfil
     )
 
@@ -101,15 +181,8 @@ def dashboard():
 @app.route("/missoes", methods=["GET", "POST"])
 def missoes():
     """Lista de missões com filtros."""
-    todas_missoes = carregar_json(MISSOES_PATH)
     status_filtro = request.args.get("status")
     
-    # Aplicar filtro se especificado
-    if status_filtro:
-        missoes_filtradas = [m for m in todas_missoes if m.get("status") == status_filtro]
-    else:
-        missoes_filtradas = todas_missoes
-    
     if request.method == "POST":
         titulo = request.form.get("nova_missao", "").strip()
         tag_nome = request.form.get("tag_nome")
@@ -123,8 +196,7 @@ def missoes():
         sucesso, nova_missao, erro = criar_missao(titulo, tag)
         
         if sucesso:
-            todas_missoes.append(nova_missao)
-            if salvar_json(MISSOES_PATH, todas_missoes):
+            if repo.adicionar_missao(nova_missao):
                 salvar_log("Criou missão", titulo)
                 novo_nivel, subiu = adicionar_xp(10)
                 msg = "Missão criada (+10 XP)!"
@@ -138,58 +210,78 @@ def missoes():
         
         return redirect(url_for("missoes", status=status_filtro))
     
+    consulta = request.args.get("q", "").strip()
+    tag_filtro = request.args.get("tag") or None
+    if consulta:
+        lista = Adiado(lambda: repo.buscar_missoes(consulta, status=status_filtro or None, tag=tag_filtro))
+    elif tag_filtro:
+        lista = Adiado(lambda: repo.listar_missoes(status_filtro, tag=tag_filtro))
+    else:
+        # Sem filtro por tag: o template percorre as missões uma vez, direto
+        # do arquivo (ou do cache), sem montar a lista
+        lista = Adiado(lambda: repo.iterar_missoes(status_filtro or None), uma_passada=True)
+
     return render_template(
         "missoes.html",
-        missoes=missoes_filtradas,
-        status_filtro=status_filtro or ""
+        missoes=lista,
+        status_filtro=status_filtro or "",
+        tag_filtro=tag_filtro or "",
+        consulta=consulta
     )
 
 
 
-@app.route("/registrar/<int:i>")
-def registrar_progresso(i):
+@app.route("/missoes/lote", methods=["POST"])
+def missoes_lote():
+    """Aplica uma ação às missões marcadas (ou importa uma lista de títulos)."""
+    tag_nome = request.form.get("tag_nome")
+    tag_cor = request.form.get("tag_cor")
+    tag = {"nome": tag_nome, "cor": tag_cor} if tag_nome and tag_cor else None
+
+    sucesso, msg, _ = executar_lote(
+        request.form.get("acao", ""),
+        ids=request.form.getlist("ids"),
+        tag=tag,
+        titulos=request.form.get("titulos", "").splitlines(),
+    )
+    flash(msg, "success" if sucesso else "error")
+    return redirect(url_for(
+        "missoes",
+        status=request.form.get("status_filtro") or None,
+        tag=request.form.get("tag_filtro") or None,
+    ))
+
+
+@app.route("/missao/<missao_id>/registrar")
+def registrar_progresso(missao_id):
     """Registra progresso em uma missão sem concluí-la."""
     from datetime import datetime
     
-    missoes = carregar_json(MISSOES_PATH)
+    # Adicionar novo registro com timestamp
+    timestamp = datetime.now().isoformat()
+    missao = repo.registrar_progresso(missao_id, {"data": timestamp})
     
-    if 0 <= i < len(missoes):
-        missao = missoes[i]
-        
-        # Criar array de registros se não existir
-        if "registros" not in missao:
-            missao["registros"] = []
-        
-        # Adicionar novo registro com timestamp
-        timestamp = datetime.now().isoformat()
-        missao["registros"].append({"data": timestamp})
-        
-        if salvar_json(MISSOES_PATH, missoes):
-            salvar_log("Registrou progresso", missao["titulo"])
-            novo_nivel, subiu = adicionar_xp(5)
-            msg = f"Progresso registrado! (+5 XP) Total: {len(missao['registros'])}x"
-            if subiu:
-                msg += f" SUBIU DE NÍVEL! {novo_nivel}!"
-            flash(msg, "success")
-        else:
-            flash("Erro ao registrar progresso", "error")
+    if missao is not None:
+        salvar_log("Registrou progresso", missao["titulo"])
+        novo_nivel, subiu = adicionar_xp(5)
+        msg = f"Progresso registrado! (+5 XP) Total: {missao['progresso']['total']}x"
+        if subiu:
+            msg += f" SUBIU DE NÍVEL! {novo_nivel}!"
+        flash(msg, "success")
     else:
         flash("Missão não encontrada", "error")
     
     return redirect(url_for("dashboard"))
 
 
-@app.route("/concluir/<int:i>")
-def concluir_missao(i):
+@app.route("/missao/<missao_id>/concluir")
+def concluir_missao(missao_id):
     """Marca uma missão como concluída."""
-    missoes = carregar_json(MISSOES_PATH)
+    missao = repo.obter_missao(missao_id)
     
-    if 0 <= i < len(missoes):
-        missao = missoes[i]
+    if missao is not None:
         if missao["status"] != "concluída":
-            missao["status"] = "concluída"
-            
-            if salvar_json(MISSOES_PATH, missoes):
+            if repo.atualizar_missao(missao_id, {"status": "concluída"}) is not None:
                 salvar_log("Concluiu missão", missao["titulo"])
                 novo_nivel, subiu = adicionar_xp(50)
                 adicionar_moedas(5)
@@ -207,13 +299,13 @@ def concluir_missao(i):
     return redirect(url_for("dashboard"))
 
 
-@app.route("/editar/<int:i>", methods=["GET", "POST"])
-def editar_missao(i):
+@app.route("/missao/<missao_id>/editar", methods=["GET", "POST"])
+def editar_missao(missao_id):
     """Edita o título de uma missão."""
-    missoes = carregar_json(MISSOES_PATH)
+    missao = repo.obter_missao(missao_id)
     
-    # Verificar se o índice é válido
-    if not (0 <= i < len(missoes)):
+    # Verificar se a missão existe
+    if missao is None:
         flash("Missão não encontrada", "error")
         return redirect(url_for("missoes"))
     
@@ -222,22 +314,17 @@ def editar_missao(i):
         tag_nome = request.form.get("tag_nome")
         tag_cor = request.form.get("tag_cor")
         
-        # Validar novo título
+        # Validar novo título e tag (None remove a tag se "Sem Tag" foi selecionado)
         is_valid, titulo_sanitizado, erro = validar_titulo(novo_titulo)
+        if is_valid:
+            is_valid, tag, erro = validar_tag_missao(
+                {"nome": tag_nome, "cor": tag_cor} if tag_nome and tag_cor else None
+            )
         
         if is_valid:
-            titulo_antigo = missoes[i]["titulo"]
-            missoes[i]["titulo"] = titulo_sanitizado
-            
-            # Atualizar tag
-            if tag_nome and tag_cor:
-                missoes[i]["tag"] = {"nome": tag_nome, "cor": tag_cor}
-            else:
-                # Remover tag se "Sem Tag" foi selecionado
-                if "tag" in missoes[i]:
-                    del missoes[i]["tag"]
+            titulo_antigo = missao["titulo"]
             
-            if salvar_json(MISSOES_PATH, missoes):
+            if repo.atualizar_missao(missao_id, {"titulo": titulo_sanitizado, "tag": tag}) is not None:
                 salvar_log("Editou missão", f"{titulo_antigo} → {titulo_sanitizado}")
                 flash("Missão editada com sucesso!", "success")
             else:
@@ -248,117 +335,186 @@ def editar_missao(i):
             flash(erro, "error")
     
     perfil = carregar_perfil()
-    return render_template("editar.html", missao=missoes[i], perfil=perfil, i=i)
+    return render_template("editar.html", missao=missao, perfil=perfil)
 
 
-@app.route("/apagar/<int:i>")
-def apagar_missao(i):
+@app.route("/missao/<missao_id>/apagar")
+def apagar_missao(missao_id):
     """Exclui uma missão."""
-    missoes = carregar_json(MISSOES_PATH)
+    missao = repo.remover_missao(missao_id)
     
-    if 0 <= i < len(missoes):
-        titulo = missoes[i]["titulo"]
-        del missoes[i]
-        
-        if salvar_json(MISSOES_PATH, missoes):
-            salvar_log("Excluiu missão", titulo)
-            flash("Missão excluída", "success")
-        else:
-            flash("Erro ao excluir missão", "error")
+    if missao is not None:
+        salvar_log("Excluiu missão", missao["titulo"])
+        flash("Missão excluída", "success")
     else:
         flash("Missão não encontrada", "error")
     
     return redirect(url_for("missoes"))
 
 
-@app.route("/mover/<int:i>/<direcao>")
-def mover_missao(i, direcao):
+@app.route("/missao/<missao_id>/mover/<direcao>")
+def mover_missao(missao_id, direcao):
     """Reordena missões (mover para cima ou baixo)."""
-    missoes = carregar_json(MISSOES_PATH)
-    
-    if direcao == "cima" and i > 0:
-        missoes[i], missoes[i - 1] = missoes[i - 1], missoes[i]
-        salvar_json(MISSOES_PATH, missoes)
-    elif direcao == "baixo" and i < len(missoes) - 1:
-        missoes[i], missoes[i + 1] = missoes[i + 1], missoes[i]
-        salvar_json(MISSOES_PATH, missoes)
-    else:
+    if not repo.mover_missao(missao_id, direcao):
         flash("Não é possível mover nessa direção", "warning")
     
     return redirect(url_for("missoes"))
 
 
-@app.route("/iniciar/<int:i>")
-def iniciar_missao(i):
+@app.route("/missao/<missao_id>/posicao", methods=["POST"])
+def posicionar_missao(missao_id):
+    """
+    Move uma missão direto para outra posição (arrastar e soltar).
+
+    Aceita um dos campos: `posicao` (0 = topo da lista completa),
+    `depois_de` ou `antes_de` (ID da missão vizinha no destino). Apenas a
+    missão movida é gravada.
+    """
+    atual = repo.posicao_da_missao(missao_id)
+    posicao = request.form.get("posicao", type=int)
+
+    for campo, deslocamento in (("depois_de", 1), ("antes_de", 0)):
+        vizinha = request.form.get(campo)
+        if vizinha and atual is not None:
+            ref = repo.posicao_da_missao(vizinha)
+            if ref is not None:
+                # Sem a missão movida, as posições abaixo dela sobem uma casa
+                posicao = ref + deslocamento - (1 if ref > atual else 0)
+
+    sucesso = atual is not None and posicao is not None and repo.posicionar_missao(missao_id, posicao)
+
+    if request.headers.get("X-Requested-With") == "fetch":
+        return ("", 204) if sucesso else ("Missão não encontrada", 404)
+    if not sucesso:
+        flash("Não foi possível mover a missão", "error")
+    return redirect(url_for("missoes"))
+
+
+@app.route("/missao/<missao_id>/iniciar")
+def iniciar_missao(missao_id):
     """Marca missão como em andamento."""
-    missoes = carregar_json(MISSOES_PATH)
+    missao = repo.atualizar_missao(missao_id, {"status": "em_andamento"})
     
-    if 0 <= i < len(missoes):
-        missoes[i]["status"] = "em_andamento"
-        if salvar_json(MISSOES_PATH, missoes):
-            salvar_log("Iniciou missão", missoes[i]["titulo"])
-            flash("Missão iniciada!", "success")
-        else:
-            flash("Erro ao atualizar missão", "error")
+    if missao is not None:
+        salvar_log("Iniciou missão", missao["titulo"])
+        flash("Missão iniciada!", "success")
     else:
         flash("Missão não encontrada", "error")
     
     return redirect(url_for("missoes"))
 
 
+# Rotas antigas por posição na lista: resolvem o ID e delegam para as rotas
+# acima. Mantidas para links e favoritos existentes.
+
+def _por_posicao(i, rota, *args):
+    """Resolve a posição i para o ID da missão e chama `rota`."""
+    missao_id = repo.id_na_posicao(i)
+    if missao_id is None:
+        flash("Missão não encontrada", "error")
+        return redirect(url_for("missoes"))
+    return rota(missao_id, *args)
+
+
+@app.route("/registrar/<int:i>")
+def registrar_progresso_posicao(i):
+    return _por_posicao(i, registrar_progresso)
+
+
+@app.route("/concluir/<int:i>")
+def concluir_missao_posicao(i):
+    return _por_posicao(i, concluir_missao)
+
+
+@app.route("/editar/<int:i>", methods=["GET", "POST"])
+def editar_missao_posicao(i):
+    return _por_posicao(i, editar_missao)
+
+
+@app.route("/apagar/<int:i>")
+def apagar_missao_posicao(i):
+    return _por_posicao(i, apagar_missao)
+
+
+@app.route("/mover/<int:i>/<direcao>")
+def mover_missao_posicao(i, direcao):
+    return _por_posicao(i, mover_missao, direcao)
+
+
+@app.route("/iniciar/<int:i>")
+def iniciar_missao_posicao(i):
+    return _por_posicao(i, iniciar_missao)
+
+
 @app.route("/tags/nova", methods=["POST"])
 def nova_tag():
     """Cria uma nova tag para as missões."""
-    nome = request.form.get("nome_tag", "").strip()
     cor = request.form.get("cor_tag", "#000000")
+    valida, nome, erro = validar_tag(request.form.get("nome_tag"), cor)
     
-    if not nome:
-        flash("Nome da tag é obrigatório!", "error")
+    if not valida:
+        flash(erro, "error")
         return redirect(url_for("dashboard"))
         
-    perfil = carregar_perfil()
-    if "tags" not in perfil:
-        perfil["tags"] = []
-    
     # Verificar duplicidade
-    if any(t["nome"] == nome for t in perfil["tags"]):
+    if repo.criar_tag(nome, cor) is None:
          flash("Tag já existe!", "error")
          return redirect(url_for("dashboard"))
 
-    perfil["tags"].append({"nome": nome, "cor": cor})
-    salvar_perfil(perfil)
     flash(f"Tag '{nome}' criada!", "success")
     return redirect(url_for("dashboard"))
 
 
-@app.route("/tags/deletar/<nome>")
-def deletar_tag(nome):
-    """Remove uma tag do perfil e de todas as missões."""
-    perfil = carregar_perfil()
-    missoes = carregar_json(MISSOES_PATH)
-    
-    if "tags" in perfil:
-        # Filtrar removendo a tag com o nome correspondente
-        original_len = len(perfil["tags"])
-        perfil["tags"] = [t for t in perfil["tags"] if t["nome"] != nome]
-        
-        if len(perfil["tags"]) < original_len:
-            # Remover a tag de todas as missões
-            missoes_afetadas = 0
-            for missao in missoes:
-                if "tag" in missao and missao["tag"]["nome"] == nome:
-                    del missao["tag"]
-                    missoes_afetadas += 1
-            
-            salvar_perfil(perfil)
-            salvar_json(MISSOES_PATH, missoes)
-            
-            if missoes_afetadas > 0:
-                flash(f"Tag '{nome}' removida de {missoes_afetadas} missão(ões).", "success")
-            else:
-                flash(f"Tag '{nome}' removida.", "success")
-        else:
-            flash("Tag não encontrada.", "error")
+@app.route("/tags/<tag_id>/editar", methods=["POST"])
+def editar_tag(tag_id):
+    """Renomeia e/ou troca a cor de uma tag (as missões não são regravadas)."""
+    tag = repo.obter_tag(tag_id)
+    if tag is None:
+        flash("Tag não encontrada.", "error")
+        return redirect(url_for("configuracoes"))
+
+    cor = request.form.get("cor_tag", tag["cor"])
+    valida, nome, erro = validar_tag(request.form.get("nome_tag", tag["nome"]), cor)
+    if not valida:
+        flash(erro, "error")
+        return redirect(url_for("configuracoes"))
+
+    if nome != tag["nome"] and repo.renomear_tag(tag_id, nome) is None:
+        flash(f"Já existe uma tag '{nome}'.", "error")
+        return redirect(url_for("configuracoes"))
+    if cor != tag["cor"]:
+        repo.recolorir_tag(tag_id, cor)
+
+    salvar_log("Editou tag", f"{tag['nome']} → {nome}" if nome != tag["nome"] else nome)
+    flash(f"Tag '{nome}' atualizada.", "success")
+    return redirect(url_for("configuracoes"))
+
+
+@app.route("/tags/<tag_id>/mesclar", methods=["POST"])
+def mesclar_tag(tag_id):
+    """Junta a tag a outra: as missões dela passam para a tag de destino."""
+    origem = repo.obter_tag(tag_id)
+    destino = repo.mesclar_tags(tag_id, request.form.get("destino", ""))
+    if origem is None or destino is None:
+        flash("Escolha duas tags diferentes para mesclar.", "error")
+    else:
+        salvar_log("Editou tag", f"{origem['nome']} mesclada em {destino['nome']}")
+        flash(f"Tag '{origem['nome']}' mesclada em '{destino['nome']}'.", "success")
+    return redirect(url_for("configuracoes"))
+
+
+@app.route("/tags/<tag_id>/deletar")
+def deletar_tag(tag_id):
+    """Apaga uma tag; as missões dela ficam sem tag."""
+    tag = repo.obter_tag(tag_id)
+    missoes_afetadas = repo.remover_tag(tag_id) if tag is not None else None
+
+    if missoes_afetadas is None:
+        flash("Tag não encontrada.", "error")
+    elif missoes_afetadas > 0:
+        flash(f"Tag '{tag['nome']}' removida de {missoes_afetadas} missão(ões).", "success")
+    else:
+        flash(f"Tag '{tag['nome']}' removida.", "success")
             
     return redirect(url_for("configuracoes"))
 
@@ -372,12 +528,9 @@ def configuracoes():
 
 @app.route("/tags/deletar-todas", methods=["POST"])
 def deletar_todas_tags():
-    """Deleta todas as tags do perfil."""
-    perfil = carregar_perfil()
-    if "tags" in perfil:
-        count = len(perfil["tags"])
-        perfil["tags"] = []
-        salvar_perfil(perfil)
+    """Deleta todas as tags (as missões ficam sem tag)."""
+    count = repo.limpar_tags()
+    if count:
         flash(f"{count} tag(s) deletada(s).", "success")
     else:
         flash("Nenhuma tag para deletar.", "error")
@@ -402,10 +555,10 @@ def resetar_progresso():
 def resetar_tudo():
     """Reseta missões e histórico, mas mantém progresso (XP, Nível, Moedas)."""
     # Resetar missões
-    salvar_json(MISSOES_PATH, [])
+    repo.limpar_missoes()
     
     # Resetar histórico
-    salvar_json(HISTORICO_PATH, [])
+    repo.limpar_historico()
     
     salvar_log("Resetou missões e histórico", "Manteve progresso")
     flash("🔄 Missões e histórico deletados! Seu progresso foi mantido.", "success")
@@ -416,15 +569,17 @@ def resetar_tudo():
 def deletar_tudo():
     """Deleta ABSOLUTAMENTE TUDO e recomeça do zero."""
     # Resetar missões
-    salvar_json(MISSOES_PATH, [])
+    repo.limpar_missoes()
     
     # Resetar histórico
-    salvar_json(HISTORICO_PATH, [])
+    repo.limpar_historico()
+    
+    # Resetar tags
+    repo.limpar_tags()
     
     # Resetar perfil para padrão
     from utils import inicializar_perfil
-    if os.path.exists(PERFIL_PATH):
-        os.remove(PERFIL_PATH)
+    apagar_perfil()
     inicializar_perfil()
     
     flash("💀 TUDO foi deletado! Começando do zero absoluto.", "success")
@@ -433,9 +588,36 @@ def deletar_tudo():
 
 @app.route("/historico")
 def historico():
-    """Visualiza histórico de ações."""
-    logs = carregar_json(HISTORICO_PATH)
-    return render_template("historico.html", logs=logs)
+    """Visualiza o histórico paginado, filtrado por tipo de ação e período."""
+    filtros = {
+        "tipos": [t for t in request.args.getlist("tipo") if t in TIPOS_HISTORICO],
+        "excluir": request.args.get("modo") == "excluir",
+        "de": request.args.get("de") or None,
+        "ate": request.args.get("ate") or None,
+    }
+    consulta = request.args.get("q", "").strip()
+    if consulta:
+        # Busca no índice textual (sem paginação: as mais recentes que casam)
+        logs, proximo = repo.buscar_historico(consulta, **filtros), None
+    else:
+        logs, proximo = repo.pagina_historico(cursor=request.args.get("cursor"), **filtros)
+
+    # Link da próxima página: mesmos filtros, novo cursor
+    proxima_url = None
+    if proximo:
+        args = request.args.to_dict(flat=False)
+        args["cursor"] = proximo
+        proxima_url = url_for("historico", **args)
+
+    return render_template(
+        "historico.html",
+        logs=logs,
+        tipos=TIPOS_HISTORICO,
+        filtros=filtros,
+        primeira_pagina=not request.args.get("cursor"),
+        proxima_url=proxima_url,
+        consulta=consulta,
+    )
 
 
 @app.route("/loja")
@@ -470,4 +652,4 @@ def equipar(item_id):
 
 
 if __name__ == "__main__":
-    app.run(debug=FLASK_DEBUG)
+    app.run(host=SERVIDOR_HOST, port=SERVIDOR_PORTA, debug=FLASK_DEBUG)
@@ -0,0 +1,125 @@
+"""Benchmark de Formatos de Arquivo - FuryCelula
+
+Compara, para cada formato de gravação disponível (ver FORMATO_ARQUIVOS),
+o tempo de salvar (utils.salvar_json, com fsync), o tempo de carregar
+(utils.desserializar, sem cache) e o tamanho em disco de uma lista sintética
+de missões. Também mede a compressão de um segmento do histórico.
+
+Uso: python benchmarks/bench_formatos.py [--missoes 100000] [--repeticoes 3]
+
+Tudo é gravado em um diretório temporário; data/ não é tocado.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+
+
+def gerar_missoes(quantidade, semente=42):
+    """Lista de missões no mesmo formato de data/missoes.json."""
+    aleatorio = random.Random(semente)
+    status = ["aberta", "em_andamento", "concluída"]
+    tags = [None, {"nome": "Trabalho", "cor": "#00ff00"}, {"nome": "Estudos", "cor": "#3366ff"}]
+    missoes = []
+    for i in range(quantidade):
+        missao = {
+            "id": f"{aleatorio.getrandbits(48):012x}",
+            "ordem": (i + 1) * 1024.0,
+            "titulo": f"Missão {i}: revisar o capítulo {aleatorio.randint(1, 40)} e anotar dúvidas",
+            "status": aleatorio.choice(status),
+            "data_criacao": f"2026-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d} 10:00:00",
+        }
+        tag = aleatorio.choice(tags)
+        if tag:
+            missao["tag"] = dict(tag)
+        if aleatorio.random() < 0.3:
+            total = aleatorio.randint(1, 3)
+            missao["progresso"] = {"total": total, "ultimo": "2026-02-01T09:30:00", "dias": {"2026-02-01": total}}
+        missoes.append(missao)
+    return missoes
+
+
+def gerar_historico(quantidade, semente=7):
+    aleatorio = random.Random(semente)
+    acoes = ["Criou missão", "Concluiu missão", "Editou missão", "Excluiu missão", "Comprou item"]
+    return [
+        {
+            "data": f"2026-02-{aleatorio.randint(1, 28):02d} {aleatorio.randint(0, 23):02d}:{aleatorio.randint(0, 59):02d}",
+            "acao": aleatorio.choice(acoes),
+            "resultado": f"Missão {aleatorio.randint(0, 99999)}",
+        }
+        for _ in range(quantidade)
+    ]
+
+
+def medir(funcao, repeticoes):
+    """Menor tempo (s) entre as repetições."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def bench_formatos(missoes, diretorio, repeticoes):
+    print(f"{'formato':16} {'salvar (s)':>11} {'carregar (s)':>13} {'tamanho (MB)':>13}")
+    for formato in utils.FORMATOS:
+        if utils.formato_efetivo(formato) != formato:
+            print(f"{formato:16} {'(biblioteca não instalada)':>39}")
+            continue
+        caminho = os.path.join(diretorio, f"missoes.{formato}")
+        t_salvar = medir(lambda: utils.salvar_json(caminho, missoes, formato), repeticoes)
+
+        def carregar():
+            with open(caminho, "rb") as f:
+                return utils.desserializar(f.read())
+
+        assert carregar() == missoes
+        t_carregar = medir(carregar, repeticoes)
+        tamanho = os.path.getsize(caminho) / 1e6
+        print(f"{formato:16} {t_salvar:11.3f} {t_carregar:13.3f} {tamanho:13.2f}")
+
+
+def bench_compressao(entradas, diretorio, repeticoes):
+    conteudo = b"".join(utils._linha_jsonl(e) for e in entradas)
+    print(f"\nHistórico: {len(entradas)} entradas, {len(conteudo) / 1e6:.2f} MB em JSON Lines")
+    print(f"{'compressão':16} {'comprimir (s)':>14} {'ler (s)':>10} {'tamanho (MB)':>13}")
+    for algoritmo in ("gzip", "zstd"):
+        comprimido, extensao = utils.comprimir(conteudo, algoritmo)
+        if algoritmo == "zstd" and extensao != ".zst":
+            print(f"{algoritmo:16} {'(zstandard não instalado)':>39}")
+            continue
+        caminho = os.path.join(diretorio, f"historico.000001.jsonl{extensao}")
+        with open(caminho, "wb") as f:
+            f.write(comprimido)
+        t_comprimir = medir(lambda: utils.comprimir(conteudo, algoritmo), repeticoes)
+        t_ler = medir(lambda: sum(1 for _ in utils.ler_jsonl_reverso(caminho)), repeticoes)
+        print(f"{algoritmo:16} {t_comprimir:14.3f} {t_ler:10.3f} {len(comprimido) / 1e6:13.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--missoes", type=int, default=100_000)
+    parser.add_argument("--historico", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix="fury_bench_")
+    try:
+        print(f"Gerando {args.missoes} missões...")
+        bench_formatos(gerar_missoes(args.missoes), diretorio, args.repeticoes)
+        bench_compressao(gerar_historico(args.historico), diretorio, args.repeticoes)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
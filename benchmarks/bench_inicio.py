@@ -0,0 +1,108 @@
+"""Benchmark de Inicialização - FuryCelula
+
+Mede o tempo entre lançar o app e a primeira resposta HTTP (200) em uma
+rota: inclui abrir o executável (e, no onefile, extraí-lo), importar os
+módulos, carregar os dados e renderizar a página. Os lançamentos usam uma
+cópia de data/ em uma pasta temporária (FURY_DATA_DIR) e uma porta livre
+(FURY_PORTA); o primeiro de cada comando não conta (migra os dados uma vez
+e aquece o cache de disco do sistema).
+
+Uso: python benchmarks/bench_inicio.py [--comando dist/v42_sistema]
+         [--comando dist/v42_sistema_rapido/v42_sistema_rapido]
+         [--repeticoes 5] [--rota /dashboard]
+
+Sem --comando, mede "python app.py". data/ não é alterado.
+"""
+import argparse
+import os
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_lancamento(comando, dados, rota, limite):
+    """
+    Lança `comando` e espera a primeira resposta 200 em `rota`.
+
+    Returns:
+        Segundos até a resposta
+
+    Raises:
+        RuntimeError: Se o processo terminar ou não responder em `limite` segundos
+    """
+    porta = porta_livre()
+    env = dict(os.environ, FURY_DATA_DIR=dados, FURY_PORTA=str(porta), FLASK_DEBUG="0")
+    url = f"http://127.0.0.1:{porta}{rota}"
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=limite) as resposta:
+                    if resposta.status == 200:
+                        return time.perf_counter() - inicio
+            except urllib.error.HTTPError as erro:
+                raise RuntimeError(f"{comando[0]}: HTTP {erro.code} em {rota}")
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if processo.poll() is not None:
+                raise RuntimeError(f"{comando[0]} terminou com código {processo.returncode}")
+            if time.perf_counter() - inicio > limite:
+                raise RuntimeError(f"{comando[0]} não respondeu em {limite} s")
+            time.sleep(0.005)
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--comando", action="append",
+                        help="comando a lançar (repetível); padrão: python app.py")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rota", default="/dashboard")
+    parser.add_argument("--limite", type=float, default=60.0, help="segundos por lançamento")
+    args = parser.parse_args()
+
+    comandos = args.comando or [f"{shlex.quote(sys.executable)} app.py"]
+    print(f"{'comando':50} {'mín (s)':>9} {'mediana (s)':>12} {'máx (s)':>9}")
+    for comando in comandos:
+        diretorio = tempfile.mkdtemp(prefix="fury_bench_inicio_")
+        dados = os.path.join(diretorio, "data")
+        if os.path.isdir(os.path.join(RAIZ, "data")):
+            shutil.copytree(os.path.join(RAIZ, "data"), dados)
+        try:
+            medir_lancamento(shlex.split(comando), dados, args.rota, args.limite)
+            tempos = [
+                medir_lancamento(shlex.split(comando), dados, args.rota, args.limite)
+                for _ in range(args.repeticoes)
+            ]
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+        print(f"{comando[-50:]:50} {min(tempos):9.3f} {statistics.median(tempos):12.3f} {max(tempos):9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Benchmark das Rotas - FuryCelula
+
+Gera dados sintéticos (missões, tags, histórico completo e perfil) em uma
+pasta temporária (FURY_DATA_DIR) e percorre as rotas mais usadas com o
+test client do Flask. Para cada rota: vazão (req/s), latência p50/p95/p99 e
+pico de memória alocada em uma requisição (tracemalloc, medido à parte).
+
+Cada combinação de tamanho e backend roda em um processo novo (config e
+repositório são lidos na importação). O resultado vai para um JSON de
+baseline; com --comparar, as latências são comparadas com um baseline
+anterior (ex: gerado em outro commit).
+
+Uso: python benchmarks/bench_rotas.py [--missoes 1000,10000,100000]
+         [--backends json,sqlite] [--requisicoes 50] [--tags 200]
+         [--saida benchmarks/baseline_rotas.json] [--comparar antigo.json]
+
+data/ não é tocado.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_formatos import gerar_historico, gerar_missoes  # noqa: E402
+
+
+# --- Dados sintéticos ---
+
+def gerar_dados(quantidade, n_tags, semente=42):
+    """
+    Popula FURY_DATA_DIR pelo repositório configurado.
+
+    Returns:
+        Dict com os IDs usados pelas rotas que alteram dados
+    """
+    from config import MAX_HISTORICO_ENTRIES
+    from database import get_repositorio
+    import utils
+
+    repo = get_repositorio()
+    aleatorio = random.Random(semente)
+    tags = [
+        repo.criar_tag(f"Tag {i:04d}", f"#{aleatorio.getrandbits(24):06x}")["id"]
+        for i in range(n_tags)
+    ]
+    missoes = gerar_missoes(quantidade, semente)
+    for missao in missoes:
+        if missao.pop("tag", None):
+            missao["tag"] = {"id": aleatorio.choice(tags)}
+    repo.adicionar_missoes(missoes)
+
+    # Histórico completo (além da retenção), em lotes como no uso normal
+    historico = gerar_historico(2 * MAX_HISTORICO_ENTRIES, semente)
+    for i in range(0, len(historico), 50):
+        repo.adicionar_logs(historico[i:i + 50])
+
+    perfil = utils.perfil_padrao()
+    perfil["moedas"] = 10 ** 9
+    repo.salvar_perfil(perfil)
+
+    abertas = [m["id"] for m in missoes if m["status"] != "concluída"]
+    aleatorio.shuffle(abertas)
+    return {"abertas": abertas, "ids": [m["id"] for m in missoes], "tags": tags}
+
+
+def rotas(dados):
+    """
+    (nome, método, função iteração → (url, form)) na ordem de execução:
+    primeiro as leituras, depois as que alteram dados.
+    """
+    abertas = iter(dados["abertas"])
+    tags = iter(dados["tags"])
+    ids = dados["ids"]
+    meio = len(ids) // 2
+    return [
+        ("dashboard", "get", lambda i: ("/dashboard", None)),
+        ("missoes", "get", lambda i: ("/missoes", None)),
+        ("missoes?status=aberta", "get", lambda i: ("/missoes?status=aberta", None)),
+        ("missoes?status=em_andamento", "get", lambda i: ("/missoes?status=em_andamento", None)),
+        ("missoes?status=concluída", "get", lambda i: ("/missoes?status=concluída", None)),
+        ("missoes?q", "get", lambda i: ("/missoes?q=capitulo", None)),
+        ("historico", "get", lambda i: ("/historico", None)),
+        ("loja", "get", lambda i: ("/loja", None)),
+        ("api/missoes", "get", lambda i: ("/api/missoes", None)),
+        ("criar", "post", lambda i: ("/dashboard", {"missao": f"Missão nova {i}", "tag_nome": "", "tag_cor": ""})),
+        ("registrar", "get", lambda i: (f"/missao/{ids[i % len(ids)]}/registrar", None)),
+        ("concluir", "get", lambda i: (f"/missao/{next(abertas)}/concluir", None)),
+        ("mover", "get", lambda i: (f"/missao/{ids[meio]}/mover/{'cima' if i % 2 else 'baixo'}", None)),
+        ("loja/comprar", "get", lambda i: ("/loja/comprar/mystery_box", None)),
+        ("tags/deletar", "get", lambda i: (f"/tags/{next(tags)}/deletar", None)),
+    ]
+
+
+# --- Medição ---
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por posição mais próxima de uma lista ordenada."""
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def executar(quantidade, n_tags, requisicoes, aquecimento):
+    """Gera os dados, mede as rotas e retorna o resultado (roda no processo filho)."""
+    inicio = time.perf_counter()
+    dados = gerar_dados(quantidade, n_tags)
+    geracao = time.perf_counter() - inicio
+    # concluir e tags/deletar consomem uma missão aberta / uma tag por requisição
+    necessarias = aquecimento + requisicoes + 1
+    if min(len(dados["abertas"]), len(dados["tags"])) < necessarias:
+        raise SystemExit(f"São necessárias ao menos {necessarias} tags e missões abertas")
+
+    from app import app
+    cliente = app.test_client()
+
+    def chamar(metodo, rota, i):
+        url, form = rota(i)
+        resposta = getattr(cliente, metodo)(url, data=form)
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{metodo.upper()} {url}: HTTP {resposta.status_code}")
+
+    resultado = {}
+    i = 0
+    for nome, metodo, rota in rotas(dados):
+        for _ in range(aquecimento):
+            chamar(metodo, rota, i)
+            i += 1
+        tempos = []
+        for _ in range(requisicoes):
+            t0 = time.perf_counter()
+            chamar(metodo, rota, i)
+            tempos.append(time.perf_counter() - t0)
+            i += 1
+        tracemalloc.start()
+        chamar(metodo, rota, i)
+        i += 1
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tempos.sort()
+        resultado[nome] = {
+            "req_s": round(len(tempos) / sum(tempos), 1),
+            "p50_ms": round(percentil(tempos, 50) * 1000, 2),
+            "p95_ms": round(percentil(tempos, 95) * 1000, 2),
+            "p99_ms": round(percentil(tempos, 99) * 1000, 2),
+            "memoria_pico_kb": round(pico / 1024, 1),
+        }
+        print(f"  {nome:28} {resultado[nome]['p50_ms']:9.2f} ms", file=sys.stderr)
+
+    rss = None
+    if resource is not None:
+        # ru_maxrss: KB no Linux, bytes no macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024
+    return {"geracao_s": round(geracao, 2), "rss_pico_mb": rss and round(rss, 1), "rotas": resultado}
+
+
+def medir_em_processo(quantidade, backend, args):
+    """Roda executar() em um processo novo com FURY_DATA_DIR temporário."""
+    diretorio = tempfile.mkdtemp(prefix="fury_bench_rotas_")
+    env = dict(os.environ, FURY_DATA_DIR=diretorio, FURY_STORAGE=backend)
+    try:
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--processo",
+             "--missoes", str(quantidade), "--tags", str(args.tags),
+             "--requisicoes", str(args.requisicoes), "--aquecimento", str(args.aquecimento)],
+            env=env, stdout=subprocess.PIPE, check=True, universal_newlines=True,
+        ).stdout
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    # O resultado é a última linha (o app pode imprimir avisos antes)
+    return json.loads(saida.splitlines()[-1])
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# --- Relatório ---
+
+def imprimir(execucao):
+    print(f"\n{execucao['backend']} - {execucao['missoes']} missões "
+          f"(geração {execucao['geracao_s']} s, RSS pico {execucao['rss_pico_mb']} MB)")
+    print(f"{'rota':28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mem KB':>9}")
+    for nome, r in execucao["rotas"].items():
+        print(f"{nome:28} {r['req_s']:9.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+              f"{r['p99_ms']:9.2f} {r['memoria_pico_kb']:9.1f}")
+
+
+def comparar(atual, caminho_anterior):
+    """Imprime a variação de p50/p95 em relação a um baseline anterior."""
+    with open(caminho_anterior, encoding="utf-8") as f:
+        anterior = json.load(f)
+    antigas = {(e["backend"], e["missoes"]): e for e in anterior["execucoes"]}
+    print(f"\nComparação com {caminho_anterior} (commit {anterior.get('commit')}):")
+    comuns = [
+        (execucao, antigas[(execucao["backend"], execucao["missoes"])])
+        for execucao in atual["execucoes"]
+        if (execucao["backend"], execucao["missoes"]) in antigas
+    ]
+    if not comuns:
+        print("Nenhuma combinação de backend e tamanho em comum.")
+        return
+    print(f"{'execução':18} {'rota':28} {'p50':>16} {'p95':>16}")
+    for execucao, antiga in comuns:
+        for nome, r in execucao["rotas"].items():
+            a = antiga["rotas"].get(nome)
+            if a is None:
+                continue
+            variacoes = [
+                f"{(r[campo] / a[campo] - 1) * 100:+7.1f}%" if a[campo] else "     n/d"
+                for campo in ("p50_ms", "p95_ms")
+            ]
+            rotulo = f"{execucao['backend']}/{execucao['missoes']}"
+            print(f"{rotulo:18} {nome:28} {variacoes[0]:>16} {variacoes[1]:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--missoes", default="1000,10000,100000")
+    parser.add_argument("--backends", default="json,sqlite")
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--requisicoes", type=int, default=50)
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--saida", default=os.path.join(RAIZ, "benchmarks", "baseline_rotas.json"))
+    parser.add_argument("--comparar")
+    parser.add_argument("--processo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.processo:
+        print(json.dumps(executar(int(args.missoes), args.tags, args.requisicoes, args.aquecimento)))
+        return
+
+    atual = {
+        "commit": commit_atual(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "requisicoes": args.requisicoes,
+        "execucoes": [],
+    }
+    for backend in args.backends.split(","):
+        for quantidade in (int(q) for q in args.missoes.split(",")):
+            print(f"{backend}: gerando {quantidade} missões...", file=sys.stderr)
+            execucao = {"backend": backend, "missoes": quantidade}
+            execucao.update(medir_em_processo(quantidade, backend, args))
+            atual["execucoes"].append(execucao)
+            imprimir(execucao)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(atual, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {args.saida}")
+    if args.comparar:
+        comparar(atual, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Busca Textual - FuryCelula
+
+Normalização de texto (sem acentos, sem maiúsculas) e um índice invertido
+em memória com busca por prefixo, usado pelo repositório JSON. O SQLite usa
+FTS5 com o tokenizador unicode61 (remove_diacritics) e as mesmas regras de
+consulta (ver consulta_fts).
+
+Uma consulta casa um documento quando TODOS os termos casam algum token dele
+como prefixo: "acao conc" encontra "Ação concluída".
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos: "Ação" → "acao"."""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+@lru_cache(maxsize=65536)
+def _normalizar_token(token):
+    return normalizar(token) if not token.isascii() else token
+
+
+def termos(texto):
+    """Tokens normalizados de um texto."""
+    # Tokeniza antes (texto em NFC) e normaliza cada token com cache: os
+    # mesmos termos se repetem muito entre títulos
+    return [_normalizar_token(t) for t in _TOKEN.findall(unicodedata.normalize("NFC", str(texto)).casefold())]
+
+
+def consulta_fts(consulta):
+    """
+    Converte a consulta do usuário em uma expressão MATCH do FTS5.
+
+    Cada termo vira um prefixo entre aspas ("acao"*), então caracteres
+    especiais da sintaxe FTS5 digitados pelo usuário não têm efeito.
+
+    Returns:
+        A expressão, ou "" se a consulta não tem termos
+    """
+    return " ".join(f'"{termo}"*' for termo in termos(consulta))
+
+
+def casa_prefixo(termo, texto):
+    """True se algum token de `texto` começa pelo termo (já normalizado)."""
+    return any(token.startswith(termo) for token in termos(texto))
+
+
+class IndiceInvertido:
+    """
+    Índice token → chaves dos documentos, com atualização incremental.
+
+    Os tokens distintos ficam também em uma lista ordenada (refeita só
+    quando surge um token novo) para achar os prefixos por busca binária.
+    Como até a busca altera o objeto, quem o compartilha entre threads
+    deve usá-lo sob uma trava.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._documentos = {}
+        self._ordenados = []
+        self._ordenados_validos = True
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def __contains__(self, chave):
+        return chave in self._documentos
+
+    def adicionar(self, chave, *textos):
+        """Indexa (ou reindexa) o documento `chave` com os textos informados."""
+        self.remover(chave)
+        tokens = set()
+        for texto in textos:
+            if texto:
+                tokens.update(termos(texto))
+        self._documentos[chave] = tokens
+        for token in tokens:
+            chaves = self._postings.get(token)
+            if chaves is None:
+                self._postings[token] = chaves = set()
+                self._ordenados_validos = False
+            chaves.add(chave)
+
+    def remover(self, chave):
+        """Tira o documento do índice (sem efeito se não estiver nele)."""
+        for token in self._documentos.pop(chave, ()):
+            chaves = self._postings[token]
+            chaves.discard(chave)
+            if not chaves:
+                del self._postings[token]
+                self._ordenados_validos = False
+
+    def _com_prefixo(self, prefixo):
+        """Chaves dos documentos com algum token começando por `prefixo`."""
+        if not self._ordenados_validos:
+            self._ordenados = sorted(self._postings)
+            self._ordenados_validos = True
+        encontradas = set()
+        i = bisect_left(self._ordenados, prefixo)
+        while i < len(self._ordenados) and self._ordenados[i].startswith(prefixo):
+            encontradas |= self._postings[self._ordenados[i]]
+            i += 1
+        return encontradas
+
+    def buscar(self, consulta, complemento=None):
+        """
+        Chaves dos documentos que casam todos os termos da consulta (prefixo).
+
+        Args:
+            consulta: Texto digitado pelo usuário
+            complemento: Função termo → chaves que também casam o termo sem
+                estar no índice (ex: missões cuja tag casa o termo)
+
+        Returns:
+            Set de chaves (vazio se a consulta não tem termos)
+        """
+        resultado = None
+        # Termos mais longos primeiro: costumam reduzir mais o conjunto
+        for termo in sorted(set(termos(consulta)), key=len, reverse=True):
+            encontradas = self._com_prefixo(termo)
+            if complemento is not None:
+                encontradas = encontradas | complemento(termo)
+            resultado = encontradas if resultado is None else resultado & encontradas
+            if not resultado:
+                return set()
+        return resultado or set()
@@ -3,13 +3,94 @@
 Centro de configuração para constantes e parâmetros do aplicativo.
 """
 import os
+import sys
 
 # Caminhos dos arquivos de dados
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+# No executável do PyInstaller, BASE_DIR é a pasta dos arquivos embutidos
+# (temporária no onefile): os dados ficam ao lado do executável
+_DATA_PADRAO = os.path.join(
+    os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else BASE_DIR, "data"
+)
+# FURY_DATA_DIR troca a pasta inteira (ex: benchmarks e testes em pasta temporária)
+DATA_DIR = os.environ.get("FURY_DATA_DIR") or _DATA_PADRAO
 MISSOES_PATH = os.path.join(DATA_DIR, "missoes.json")
 HISTORICO_PATH = os.path.join(DATA_DIR, "historico.json")
 PERFIL_PATH = os.path.join(DATA_DIR, "perfil.json")
+TAGS_PATH = os.path.join(DATA_DIR, "tags.json")
+DATABASE_PATH = os.path.join(DATA_DIR, "furycelula.db")
+
+# Backend de armazenamento: "json" (arquivos acima) ou "sqlite" (DATABASE_PATH)
+# Para migrar os dados existentes: python database.py migrar
+STORAGE_BACKEND = os.environ.get("FURY_STORAGE", "json").lower()
+
+# Cache em memória dos arquivos JSON decodificados (máximo de arquivos)
+CACHE_MAX_ARQUIVOS = 32
+
+# Cache de fragmentos de template ({% fragmento %}, ver fragmentos.py):
+# máximo de blocos renderizados mantidos em memória (0 = desativado)
+FRAGMENTOS_MAX = int(os.environ.get("FURY_FRAGMENTOS_MAX", "256"))
+
+# Bytecode dos templates Jinja compilados, reaproveitado entre execuções e
+# pré-gerado no build (python fragmentos.py compilar); "" = desativado
+TEMPLATES_CACHE_DIR = os.environ.get(
+    "FURY_TEMPLATES_CACHE", os.path.join(BASE_DIR, "__pycache__", "templates")
+)
+
+# Formato de gravação de missoes.json/perfil.json (a leitura detecta o formato):
+#   "json"           JSON compacto, sem indentação (padrão)
+#   "json_indentado" JSON com indent=2 (legível, maior e mais lento)
+#   "orjson"         JSON compacto via orjson, se instalado
+#   "msgpack"        binário via msgpack, se instalado
+# Sem a biblioteca opcional, grava em "json".
+FORMATO_ARQUIVOS = os.environ.get("FURY_FORMATO", "json").lower()
+
+# Compressão dos segmentos fechados do histórico: "" (nenhuma), "gzip" ou
+# "zstd" (requer o pacote zstandard; sem ele, usa gzip)
+COMPRESSAO_HISTORICO = os.environ.get("FURY_COMPRESSAO_HISTORICO", "").lower()
+
+# Listagens de arquivos JSON maiores que isto (e ainda fora do cache) são
+# lidas registro a registro, sem montar a lista inteira na memória
+JSON_STREAMING_MIN_BYTES = 1024 * 1024
+
+# Snapshots incrementais dos JSON (substituem o .bak copiado a cada gravação).
+# Entre snapshots só os blocos novos de cada gravação são guardados e a troca
+# na lista de blocos é anexada ao log.
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_INTERVALO_SEGUNDOS = 6 * 60 * 60  # Novo snapshot completo a cada 6h...
+SNAPSHOT_MAX_DELTAS = 500                  # ...ou após este número de gravações
+SNAPSHOT_RETENCAO = 10                     # Snapshots mantidos por arquivo
+
+# Trava entre processos (fcntl/msvcrt) mantida pelas requisições que alteram
+# dados, para rodar mais de um worker (ex: gunicorn -w 4) sem perder gravações
+TRAVA_PATH = os.path.join(DATA_DIR, ".furycelula.lock")
+
+# Servidor de produção (python -m furycelula serve): "gunicorn" (workers em
+# processos separados, POSIX), "waitress" (um processo, multiplataforma) ou
+# "auto" (gunicorn se instalado e fora do Windows, senão waitress)
+SERVIDOR = os.environ.get("FURY_SERVIDOR", "auto").lower()
+SERVIDOR_HOST = os.environ.get("FURY_HOST", "127.0.0.1")
+SERVIDOR_PORTA = int(os.environ.get("FURY_PORTA", "5000"))
+SERVIDOR_WORKERS = int(os.environ.get("FURY_WORKERS", "2"))
+SERVIDOR_THREADS = int(os.environ.get("FURY_THREADS", "4"))
+# Segundos para as requisições em andamento terminarem ao encerrar
+SERVIDOR_TEMPO_ENCERRAMENTO = int(os.environ.get("FURY_TEMPO_ENCERRAMENTO", "30"))
+
+# Write-behind do perfil: 0 = grava no fim de cada requisição (padrão); N > 0
+# acumula as alterações em memória e grava o estado mais recente a cada N
+# segundos e ao encerrar o processo (perda máxima em queda: N segundos).
+# O estado pendente só é visível no próprio processo: use com um worker.
+PERFIL_WRITE_BEHIND_SEGUNDOS = float(os.environ.get("FURY_PERFIL_WRITE_BEHIND", "0"))
+
+# Eventos ao vivo (GET /eventos, Server-Sent Events, ver eventos.py); FURY_EVENTOS=0
+# desativa. Cada aba conectada ocupa uma thread do servidor enquanto está
+# aberta: acima de EVENTOS_MAX_CONEXOES por processo (padrão: metade de
+# FURY_THREADS), as abas extras funcionam sem atualização ao vivo.
+EVENTOS_ATIVOS = os.environ.get("FURY_EVENTOS", "1") != "0"
+EVENTOS_MAX_CONEXOES = int(os.environ.get("FURY_EVENTOS_MAX", str(max(1, SERVIDOR_THREADS // 2))))
+EVENTOS_PING_SEGUNDOS = 15  # Comentário periódico: mantém a conexão e detecta abas fechadas
+EVENTOS_RECENTES = 256      # Eventos guardados para quem reconecta (Last-Event-ID)
+EVENTOS_FILA_MAX = 256      # Eventos pendentes por conexão; acima disso a aba recarrega
 
 # Itens da Loja (Hardcoded por enquanto)
 ITENS_LOJA = [
@@ -25,12 +106,68 @@ ITENS_LOJA = [
 # Limites de validação
 MAX_TITULO_LENGTH = 255
 MIN_TITULO_LENGTH = 3
+MAX_TAG_NOME_LENGTH = 40
 MAX_HISTORICO_ENTRIES = 1000  # Rotacionar após este número
+HISTORICO_POR_PAGINA = 50  # Entradas por página em /historico
+
+# Resultados por busca (/api/busca)
+BUSCA_LIMITE = 50
+
+# Tipos de ação filtráveis no histórico (prefixo do campo "acao")
+TIPOS_HISTORICO = ["Criou", "Concluiu", "Editou", "Excluiu", "Comprou"]
+
+# Histórico em JSON Lines segmentado (somente acréscimo). O segmento ativo
+# é fechado ao atingir HISTORICO_SEGMENTO_BYTES; segmentos antigos inteiros
+# são apagados quando os mais novos já cobrem MAX_HISTORICO_ENTRIES.
+HISTORICO_DIR = os.path.join(DATA_DIR, "historico")
+HISTORICO_SEGMENTO_BYTES = 64 * 1024
+
+# Registros de progresso ("✓ Registrar"): cada registro vai para um store
+# próprio, somente acréscimo (PROGRESSO_DIR no JSON, tabela progresso no
+# SQLite). A missão guarda só um resumo de tamanho fixo: total, último
+# registro e a contagem por dia dos PROGRESSO_DIAS_RESUMO dias mais recentes
+# com registro. Registros mais antigos que PROGRESSO_JANELA_DIAS são
+# compactados em contagens por dia (uma vez por dia, ao registrar).
+PROGRESSO_DIR = os.path.join(DATA_DIR, "progresso")
+PROGRESSO_EVENTOS_PATH = os.path.join(PROGRESSO_DIR, "eventos.jsonl")
+PROGRESSO_DIARIO_PATH = os.path.join(PROGRESSO_DIR, "diario.json")
+PROGRESSO_DIAS_RESUMO = 7
+PROGRESSO_JANELA_DIAS = int(os.environ.get("FURY_PROGRESSO_JANELA_DIAS", "30"))
+
+# Ordenação fracionária das missões: cada missão tem uma chave "ordem";
+# mover grava só a missão movida (média das chaves vizinhas). Quando duas
+# vizinhas ficam mais próximas que ORDEM_INTERVALO_MINIMO, a lista é renumerada.
+ORDEM_PASSO = 1024.0
+ORDEM_INTERVALO_MINIMO = 1e-6
+
+# Operações em lote (/missoes/lote e /api/missoes/lote)
+ACOES_LOTE = ["concluir", "iniciar", "tag", "apagar", "importar"]
+MAX_MISSOES_LOTE = 500
+
+# Importação/exportação (importacao.py): linhas validadas por bloco e
+# quantos erros por linha são relatados
+IMPORTACAO_LOTE = 1000
+IMPORTACAO_MAX_ERROS = 100
+
+# Métricas por processo (metricas.py): latência por rota e I/O de arquivos,
+# expostas em GET /metrics (formato do Prometheus) e no cabeçalho
+# Server-Timing de cada resposta. FURY_METRICAS=0 desativa.
+METRICAS_ATIVAS = os.environ.get("FURY_METRICAS", "1") != "0"
+# Limites (segundos) dos buckets do histograma de latência
+METRICAS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# cProfile opcional: endpoints separados por vírgula (ex: "dashboard,missoes")
+# cujas requisições são perfiladas, um .prof por requisição em PROFILE_DIR
+PROFILE_ROTAS = {
+    rota.strip() for rota in os.environ.get("FURY_PROFILE_ROTAS", "").split(",") if rota.strip()
+}
+PROFILE_DIR = os.environ.get("FURY_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
 
 # Status válidos para missões
 STATUS_VALIDOS = ["aberta", "em_andamento", "concluída"]
 STATUS_DEFAULT = "aberta"
 
-# Configurações do Flask
-FLASK_DEBUG = True
+# Configurações do Flask. Debug (reloader e depurador) só em
+# desenvolvimento: FLASK_DEBUG=1 python app.py
+FLASK_DEBUG = os.environ.get("FLASK_DEBUG", "0").lower() in ("1", "true")
 FLASK_SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-prod")
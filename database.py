@@ -0,0 +1,2603 @@
+"""Camada de Abstração do Banco de Dados - FuryCelula
+
+Repositórios intercambiáveis para missões, histórico e perfil. O backend é
+escolhido em config.STORAGE_BACKEND: "json" (arquivos em data/, padrão) ou
+"sqlite" (data/furycelula.db, uma linha alterada por operação).
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import chain, islice
+
+from config import (
+    DATABASE_PATH,
+    STORAGE_BACKEND,
+    MISSOES_PATH,
+    PERFIL_PATH,
+    TAGS_PATH,
+    MAX_HISTORICO_ENTRIES,
+    HISTORICO_POR_PAGINA,
+    JSON_STREAMING_MIN_BYTES,
+    ORDEM_PASSO,
+    BUSCA_LIMITE,
+    PROGRESSO_EVENTOS_PATH,
+    PROGRESSO_DIARIO_PATH,
+    PROGRESSO_DIAS_RESUMO,
+    PROGRESSO_JANELA_DIAS
+)
+import busca
+import metricas
+import utils
+
+
+class Contadores:
+    """
+    Contagem de missões por status e por tag, mantida a cada alteração.
+
+    Chaves: "total", "status:<status>" e "tag:<id da tag>". Chaves zeradas
+    são removidas, então o conteúdo é igual ao de uma contagem do zero.
+    """
+
+    def __init__(self, valores=None):
+        self.valores = Counter(valores or {})
+
+    @classmethod
+    def calcular(cls, missoes):
+        """Conta as missões do zero (O(n))."""
+        contadores = cls()
+        for missao in missoes:
+            contadores.contar(missao, 1)
+        return contadores
+
+    def contar(self, missao, delta):
+        """Soma `delta` (1 ao incluir, -1 ao retirar) nas chaves da missão."""
+        for chave in _chaves_contador(missao):
+            self.valores[chave] += delta
+            if not self.valores[chave]:
+                del self.valores[chave]
+
+    def como_dict(self):
+        return dict(self.valores)
+
+
+class IndicesMissoes:
+    """
+    Índices de uma lista de missões: id → missão, contadores e o índice
+    reverso tag → IDs.
+
+    Os da lista do cache são compartilhados entre requisições e não mudam
+    depois de publicados. A sessão que altera missões trabalha em uma cópia
+    (copiar), que guarda também a lista de origem (`base`), os IDs dos
+    registros já copiados e as alterações pendentes do índice de busca.
+    """
+
+    def __init__(self, lista, ids, contadores, tags, base=None):
+        self.lista = lista
+        self.ids = ids
+        self.contadores = contadores
+        self.tags = tags
+        self.base = base
+        self.copiados = set()
+        self.busca = []
+
+    @classmethod
+    def calcular(cls, missoes):
+        """Monta os índices do zero (O(n))."""
+        tags = {}
+        for missao in missoes:
+            if missao.get("tag_id"):
+                tags.setdefault(missao["tag_id"], set()).add(missao["id"])
+        ids = {m["id"]: m for m in missoes if "id" in m}
+        return cls(missoes, ids, Contadores.calcular(missoes), tags)
+
+    def copiar(self, lista):
+        """Cópia dos índices para `lista`, cópia rasa da lista deles."""
+        return IndicesMissoes(
+            lista,
+            dict(self.ids),
+            Contadores(self.contadores.valores),
+            {tag_id: set(ids) for tag_id, ids in self.tags.items()},
+            base=self.lista,
+        )
+
+
+# Store da sessão com os índices da cópia privada da lista de missões
+_INDICES_DA_SESSAO = "indices_missoes"
+
+
+class RepositorioJSON:
+    """Repositório baseado nos arquivos de data/ (JSON e histórico em JSON Lines)."""
+
+    def __init__(self):
+        # Índices da lista de missões do cache (ver _indices)
+        self._indices_publicados = None
+        self._indice_lock = threading.Lock()
+        # Índices id → tag e nome → tag da última lista de tags.json carregada
+        self._tags_lista = None
+        self._tags_ids = {}
+        self._tags_nomes = {}
+        # Índices de busca: missões (refeito quando a lista carregada muda,
+        # como _indice) e histórico (chave = (segmento, byte) da entrada)
+        self._busca_lista = None
+        self._busca_missoes = busca.IndiceInvertido()
+        self._busca_historico = busca.IndiceInvertido()
+        self._entradas_indexadas = {}
+        self._busca_lock = threading.Lock()
+        # Dia da última compactação do progresso neste processo
+        self._progresso_compactado_em = None
+        # Migrações sob a trava: vários processos podem iniciar juntos
+        with utils.trava_dados():
+            utils.migrar_historico_legado()
+            self.migrar_missoes()
+            self.migrar_tags()
+            self.migrar_progresso()
+
+    def _carregar_missoes(self):
+        """
+        Lista de missões (lida no máximo uma vez por requisição).
+
+        Na sessão que altera dados é uma cópia rasa da lista do cache (ver
+        _copiar_missoes); os registros são copiados antes de alterados
+        (_para_alterar).
+        """
+        return utils.carregar_em_sessao(
+            MISSOES_PATH, lambda: utils.carregar_json(MISSOES_PATH), copiar=self._copiar_missoes
+        )
+
+    def _copiar_missoes(self, missoes):
+        """
+        Cópia da lista do cache para a sessão exclusiva, com uma cópia dos
+        índices guardada na sessão (O(n), mas sem remontar nada).
+        """
+        privada = list(missoes)
+        indices = self._indices(missoes).copiar(privada)
+        utils.carregar_em_sessao(_INDICES_DA_SESSAO, lambda: indices, copiar=None)
+        return privada
+
+    def _salvar_missoes(self, missoes):
+        """Grava a lista de missões (no fim da requisição, se houver sessão)."""
+        indices = self._indices(missoes)
+        return utils.salvar_em_sessao(
+            MISSOES_PATH, missoes, lambda dados: self._gravar_missoes(dados, indices)
+        )
+
+    def _gravar_missoes(self, missoes, indices):
+        """
+        Grava a lista. Se é a cópia de uma sessão, os índices dela passam a
+        ser os publicados logo que o cache troca de lista (_publicar_indices).
+        """
+        if not utils.salvar_json(MISSOES_PATH, missoes):
+            return False
+        if indices.base is not None and indices.lista is missoes:
+            self._publicar_indices(indices)
+        return True
+
+    def _publicar_indices(self, indices):
+        """Publica os índices de uma sessão gravada e aplica as alterações de busca dela."""
+        base, alteracoes = indices.base, indices.busca
+        indices.base, indices.copiados, indices.busca = None, set(), []
+        with self._indice_lock:
+            self._indices_publicados = indices
+        with self._busca_lock:
+            if self._busca_lista is not base:
+                return
+            for missao, incluir in alteracoes:
+                if incluir:
+                    self._busca_missoes.adicionar(missao["id"], missao.get("titulo"))
+                else:
+                    self._busca_missoes.remover(missao["id"])
+            self._busca_lista = indices.lista
+
+    def _para_alterar(self, missoes, registros):
+        """
+        Registros de `missoes` prontos para alterar no lugar.
+
+        Na cópia de uma sessão, cada registro ainda compartilhado com a
+        lista do cache é trocado por uma cópia, na lista e no índice (cópia
+        na escrita): quem lê a lista do cache não vê a alteração antes da
+        gravação, nem depois de um descarte.
+        """
+        indices = self._indices(missoes)
+        if indices.base is None:
+            return registros
+        copias = {m["id"]: dict(m) for m in registros if m["id"] not in indices.copiados}
+        if copias:
+            for i, missao in enumerate(missoes):
+                copia = copias.get(missao.get("id"))
+                if copia is not None:
+                    missoes[i] = copia
+            indices.ids.update(copias)
+            indices.copiados.update(copias)
+        return [indices.ids[m["id"]] for m in registros]
+
+    def _registros_missoes(self, pular=0):
+        """
+        Missões para consultas que só leem, a partir da posição `pular`.
+
+        Usa a lista já carregada (sessão ou cache). Se ela ainda não está na
+        memória e o arquivo passa de JSON_STREAMING_MIN_BYTES, lê o arquivo
+        registro a registro (utils.ler_registros_json) em vez de montar e
+        guardar a lista inteira.
+        """
+        missoes = utils.dados_em_memoria(MISSOES_PATH)
+        if missoes is None:
+            try:
+                grande = os.path.getsize(MISSOES_PATH) >= JSON_STREAMING_MIN_BYTES
+            except OSError:
+                grande = False
+            if grande:
+                return utils.ler_registros_json(MISSOES_PATH, pular=pular)
+            missoes = self._carregar_missoes()
+        return islice(missoes, pular, None)
+
+    def _indices(self, missoes):
+        """
+        Retorna os índices (IndicesMissoes) da lista `missoes`.
+
+        A lista vem do cache de arquivos, então o mesmo objeto é reaproveitado
+        entre requisições enquanto o arquivo não muda: o índice, os
+        contadores e o índice reverso tag → missões só são reconstruídos
+        (O(n)) quando a lista carregada é outra. A cópia privada de uma
+        sessão usa os índices guardados na sessão.
+        """
+        with self._indice_lock:
+            publicados = self._indices_publicados
+            if publicados is not None and publicados.lista is missoes:
+                return publicados
+            sessao = utils.sessao_atual()
+            privados = sessao.carregado(_INDICES_DA_SESSAO) if sessao is not None else None
+            if privados is not None and privados.lista is missoes:
+                return privados
+            self._indices_publicados = IndicesMissoes.calcular(missoes)
+            return self._indices_publicados
+
+    def _indice(self, missoes):
+        """Retorna o índice id → missão para a lista `missoes` (ver _indices)."""
+        return self._indices(missoes).ids
+
+    def _contadores(self, missoes):
+        """Contadores da lista `missoes`, atualizados pelos métodos de alteração."""
+        return self._indices(missoes).contadores
+
+    def _contar(self, missoes, missao, delta):
+        """Atualiza contadores e índice reverso ao incluir (1) ou retirar (-1) uma missão."""
+        indices = self._indices(missoes)
+        indices.contadores.contar(missao, delta)
+        tag_id = missao.get("tag_id")
+        if not tag_id:
+            return
+        if delta > 0:
+            indices.tags.setdefault(tag_id, set()).add(missao["id"])
+        else:
+            ids = indices.tags.get(tag_id, set())
+            ids.discard(missao["id"])
+            if not ids:
+                indices.tags.pop(tag_id, None)
+
+    def _buscar_titulos(self, missoes, consulta, complemento=None):
+        """
+        IDs das missões de `missoes` cujo título casa a consulta, pelo índice
+        de busca da lista (montado na primeira busca sobre ela). O nome da
+        tag é comparado à parte (ver buscar_missoes), então renomear uma tag
+        não reindexa missões.
+
+        O índice compartilhado só é lido sob _busca_lock: as requisições que
+        só leem não têm a trava de data/ e correm junto com a publicação de
+        uma sessão gravada (e a busca ordena os tokens sob demanda).
+        """
+        if self._indices(missoes).base is not None:
+            # Cópia de uma sessão que altera missões: índice só dela
+            indice = busca.IndiceInvertido()
+            for missao in missoes:
+                indice.adicionar(missao["id"], missao.get("titulo"))
+            return indice.buscar(consulta, complemento=complemento)
+        with self._busca_lock:
+            if self._busca_lista is not missoes:
+                self._busca_missoes = busca.IndiceInvertido()
+                for missao in missoes:
+                    self._busca_missoes.adicionar(missao["id"], missao.get("titulo"))
+                self._busca_lista = missoes
+            return self._busca_missoes.buscar(consulta, complemento=complemento)
+
+    def _reindexar(self, missoes, alteradas=(), removidas=()):
+        """
+        Atualiza o índice de busca, se já existe para esta lista (incremental).
+        Na cópia de uma sessão, as alterações esperam a gravação.
+        """
+        indices = self._indices(missoes)
+        if indices.base is not None:
+            indices.busca.extend((missao, True) for missao in alteradas)
+            indices.busca.extend((missao, False) for missao in removidas)
+            return
+        with self._busca_lock:
+            if self._busca_lista is not missoes:
+                return
+            for missao in alteradas:
+                self._busca_missoes.adicionar(missao["id"], missao.get("titulo"))
+            for missao in removidas:
+                self._busca_missoes.remover(missao["id"])
+
+    def migrar_missoes(self):
+        """
+        Completa missões gravadas por versões antigas: ID estável e chave de ordem.
+
+        Também garante que o arquivo está ordenado pela chave "ordem".
+
+        Returns:
+            True se o arquivo precisou ser regravado
+        """
+        missoes = utils.carregar_json(MISSOES_PATH)
+        alterou = False
+        for missao in missoes:
+            if not missao.get("id"):
+                missao["id"] = utils.gerar_id_missao()
+                alterou = True
+        if any("ordem" not in m for m in missoes):
+            # Sem chave de ordem: a posição atual na lista define a ordem
+            utils.rebalancear_ordem(missoes)
+            alterou = True
+        elif any(a["ordem"] > b["ordem"] for a, b in zip(missoes, missoes[1:])):
+            missoes.sort(key=lambda m: m["ordem"])
+            alterou = True
+        if alterou:
+            utils.salvar_json(MISSOES_PATH, missoes)
+        return alterou
+
+    def migrar_tags(self):
+        """
+        Normaliza as tags em data/tags.json, referenciadas pelas missões por ID.
+
+        Na primeira execução cria tags.json com as tags de perfil.json e as
+        embutidas nas missões ({nome, cor} em cada missão), que passam a
+        guardar só "tag_id". Depois, só compacta: missões de tags apagadas
+        perdem o tag_id, as de tags mescladas passam a apontar para o
+        destino, e os registros de mesclagem são descartados.
+
+        Returns:
+            True se algum arquivo precisou ser regravado
+        """
+        existia = os.path.exists(TAGS_PATH)
+        tags = utils.carregar_json(TAGS_PATH)
+        alterou_tags = not existia
+        perfil = utils.carregar_json_dict(PERFIL_PATH) if os.path.exists(PERFIL_PATH) else {}
+        if "tags" in perfil:
+            por_nome = {t["nome"] for t in tags if "nome" in t}
+            for tag in perfil.pop("tags") or []:
+                if tag.get("nome") and tag["nome"] not in por_nome:
+                    tags.append({"id": utils.gerar_id_tag(), "nome": tag["nome"], "cor": tag.get("cor") or "#000000"})
+                    por_nome.add(tag["nome"])
+            utils.salvar_json(PERFIL_PATH, perfil)
+            alterou_tags = True
+
+        por_id, por_nome = self._indices_tags(tags)
+        missoes = utils.carregar_json(MISSOES_PATH)
+        alterou_missoes = False
+        for missao in missoes:
+            if "tag" in missao:
+                # Formato antigo: tag embutida na missão
+                tag = missao.pop("tag") or {}
+                if tag.get("nome") and tag["nome"] not in por_nome:
+                    novo = {"id": utils.gerar_id_tag(), "nome": tag["nome"], "cor": tag.get("cor") or "#000000"}
+                    tags.append(novo)
+                    por_id[novo["id"]] = por_nome[novo["nome"]] = novo
+                    alterou_tags = True
+                if tag.get("nome"):
+                    missao["tag_id"] = por_nome[tag["nome"]]["id"]
+                alterou_missoes = True
+            elif missao.get("tag_id"):
+                atual = _resolver_tag(missao["tag_id"], por_id)
+                if atual is None:
+                    del missao["tag_id"]
+                    alterou_missoes = True
+                elif atual["id"] != missao["tag_id"]:
+                    missao["tag_id"] = atual["id"]
+                    alterou_missoes = True
+
+        if alterou_missoes:
+            utils.salvar_json(MISSOES_PATH, missoes)
+        if any("mesclada_em" in t for t in tags):
+            tags = [t for t in tags if "mesclada_em" not in t]
+            alterou_tags = True
+        if alterou_tags:
+            utils.salvar_json(TAGS_PATH, tags)
+        return alterou_tags or alterou_missoes
+
+    def migrar_progresso(self):
+        """
+        Move os registros de progresso que versões antigas gravavam na
+        própria missão (lista "registros") para o store de progresso; a
+        missão fica só com o resumo.
+
+        Returns:
+            True se missoes.json precisou ser regravado
+        """
+        missoes = utils.carregar_json(MISSOES_PATH)
+        if not any("registros" in m for m in missoes):
+            return False
+        eventos = []
+        for missao in missoes:
+            eventos.extend({"missao": missao["id"], "data": d} for d in _extrair_registros(missao))
+        # Registros antes das missões: uma falha no meio não perde registros
+        if eventos and utils.anexar_jsonl(PROGRESSO_EVENTOS_PATH, eventos) is None:
+            return False
+        return utils.salvar_json(MISSOES_PATH, missoes)
+
+    # --- Tags ---
+
+    def _carregar_tags(self):
+        """Lista de tags.json (lida no máximo uma vez por requisição)."""
+        return utils.carregar_em_sessao(TAGS_PATH, lambda: utils.carregar_json(TAGS_PATH))
+
+    def _salvar_tags(self, tags):
+        """Grava tags.json (no fim da requisição, se houver sessão)."""
+        return utils.salvar_em_sessao(
+            TAGS_PATH, tags, lambda dados: utils.salvar_json(TAGS_PATH, dados)
+        )
+
+    @staticmethod
+    def _indices_tags(tags):
+        por_id = {t["id"]: t for t in tags if "id" in t}
+        por_nome = {t["nome"]: t for t in tags if "nome" in t and "mesclada_em" not in t}
+        return por_id, por_nome
+
+    def _tags(self):
+        """
+        Tags carregadas e seus índices (id → tag, nome → tag).
+
+        Os índices são refeitos só quando a lista carregada é outra (como
+        _indice); os métodos de alteração os mantêm em dia.
+
+        Returns:
+            Tupla (tags, por_id, por_nome)
+        """
+        tags = self._carregar_tags()
+        with self._indice_lock:
+            if self._tags_lista is not tags:
+                self._tags_ids, self._tags_nomes = self._indices_tags(tags)
+                self._tags_lista = tags
+            return tags, self._tags_ids, self._tags_nomes
+
+    def listar_tags(self):
+        """Retorna as tags ({id, nome, cor}) na ordem de criação."""
+        tags, _, _ = self._tags()
+        return [dict(t) for t in tags if "mesclada_em" not in t]
+
+    def obter_tag(self, tag_id):
+        """Retorna a tag com o ID informado (seguindo mesclagens) ou None."""
+        _, por_id, _ = self._tags()
+        tag = _resolver_tag(tag_id, por_id)
+        return dict(tag) if tag is not None else None
+
+    def tag_por_nome(self, nome):
+        """Retorna a tag com o nome informado ou None."""
+        _, _, por_nome = self._tags()
+        tag = por_nome.get(nome)
+        return dict(tag) if tag is not None else None
+
+    def criar_tag(self, nome, cor):
+        """Cria uma tag. Retorna a tag criada ou None se o nome já existe."""
+        tags, por_id, por_nome = self._tags()
+        if nome in por_nome:
+            return None
+        tag = {"id": utils.gerar_id_tag(), "nome": nome, "cor": cor}
+        tags.append(tag)
+        por_id[tag["id"]] = por_nome[nome] = tag
+        self._salvar_tags(tags)
+        return dict(tag)
+
+    def renomear_tag(self, tag_id, nome):
+        """
+        Renomeia uma tag. Só tags.json é regravado: as missões guardam o ID.
+
+        Returns:
+            A tag alterada, ou None se não existe ou o nome já é de outra tag
+        """
+        tags, por_id, por_nome = self._tags()
+        tag = _resolver_tag(tag_id, por_id)
+        if tag is None or por_nome.get(nome, tag) is not tag:
+            return None
+        del por_nome[tag["nome"]]
+        tag["nome"] = nome
+        por_nome[nome] = tag
+        self._salvar_tags(tags)
+        return dict(tag)
+
+    def recolorir_tag(self, tag_id, cor):
+        """Troca a cor de uma tag (só tags.json é regravado). Retorna a tag ou None."""
+        tags, por_id, _ = self._tags()
+        tag = _resolver_tag(tag_id, por_id)
+        if tag is None:
+            return None
+        tag["cor"] = cor
+        self._salvar_tags(tags)
+        return dict(tag)
+
+    def mesclar_tags(self, origem_id, destino_id):
+        """
+        Junta a tag `origem_id` à `destino_id`: as missões de uma passam a
+        ser da outra.
+
+        A origem vira um registro {"id", "mesclada_em"} em tags.json, então
+        nenhuma missão é regravada; migrar_tags troca os IDs das missões na
+        próxima inicialização.
+
+        Returns:
+            A tag de destino, ou None se alguma não existe ou são a mesma
+        """
+        tags, por_id, por_nome = self._tags()
+        origem = _resolver_tag(origem_id, por_id)
+        destino = _resolver_tag(destino_id, por_id)
+        if origem is None or destino is None or origem is destino:
+            return None
+        del por_nome[origem["nome"]]
+        id_origem = origem["id"]
+        origem.clear()
+        origem.update({"id": id_origem, "mesclada_em": destino["id"]})
+        for tag in tags:
+            if tag.get("mesclada_em") == origem["id"]:
+                tag["mesclada_em"] = destino["id"]
+        self._salvar_tags(tags)
+        return dict(destino)
+
+    def remover_tag(self, tag_id):
+        """
+        Apaga uma tag; as missões dela (pelo índice reverso) perdem o
+        tag_id na mesma sessão, o que também zera a chave "tag:<id>" dos
+        contadores.
+
+        Returns:
+            Quantas missões tinham a tag, ou None se a tag não existe
+        """
+        tags, por_id, _ = self._tags()
+        tag = _resolver_tag(tag_id, por_id)
+        if tag is None:
+            return None
+        afetadas = self.ids_missoes_da_tag(tag["id"])
+        removidos = {tag["id"]} | {t["id"] for t in tags if t.get("mesclada_em") == tag["id"]}
+        tags[:] = [t for t in tags if t["id"] not in removidos]
+        with self._indice_lock:
+            self._tags_lista = None
+        self._salvar_tags(tags)
+        if afetadas:
+            self.atualizar_missoes(afetadas, {"tag_id": None})
+        return len(afetadas)
+
+    def limpar_tags(self):
+        """Apaga todas as tags (as missões ficam sem tag). Retorna quantas havia."""
+        tags, _, _ = self._tags()
+        total = sum(1 for t in tags if "mesclada_em" not in t)
+        tags[:] = []
+        with self._indice_lock:
+            self._tags_lista = None
+        self._salvar_tags(tags)
+        return total
+
+    def ids_missoes_da_tag(self, tag_id):
+        """IDs das missões com a tag (pelo índice reverso, sem percorrer a lista)."""
+        tags, por_id, _ = self._tags()
+        tag = _resolver_tag(tag_id, por_id)
+        if tag is None:
+            return set()
+        chaves = [tag["id"]] + [t["id"] for t in tags if t.get("mesclada_em") == tag["id"]]
+        indice_tags = self._indices(self._carregar_missoes()).tags
+        ids = set()
+        for chave in chaves:
+            ids |= indice_tags.get(chave, set())
+        return ids
+
+    def _publica(self, missao, por_id=None):
+        """
+        Missão como vista fora do repositório: "tag" com {id, nome, cor}
+        atuais no lugar de "tag_id" (cópia rasa; sem tag, a própria missão).
+        """
+        if "tag_id" not in missao:
+            return missao
+        if por_id is None:
+            _, por_id, _ = self._tags()
+        publica = {k: v for k, v in missao.items() if k != "tag_id"}
+        tag = _resolver_tag(missao["tag_id"], por_id)
+        if tag is not None:
+            publica["tag"] = dict(tag)
+        return publica
+
+    def _id_da_tag(self, tag):
+        """
+        ID da tag informada ({id} ou {nome, cor}), criando-a pelo nome se
+        ainda não existe e nome e cor passam em utils.validar_tag (quem
+        recebe a tag já a valida com utils.validar_tag_missao). None se
+        `tag` é vazia ou inválida.
+        """
+        if not tag:
+            return None
+        _, por_id, por_nome = self._tags()
+        existente = _resolver_tag(tag.get("id"), por_id) or por_nome.get(tag.get("nome"))
+        if existente is not None:
+            return existente["id"]
+        valida, nome, _ = utils.validar_tag(tag.get("nome"), tag.get("cor"))
+        if not valida:
+            return None
+        existente = por_nome.get(nome)
+        return existente["id"] if existente is not None else self.criar_tag(nome, tag["cor"])["id"]
+
+    def _para_registro(self, missao):
+        """
+        Missão recebida (com "tag" {nome, cor}) no formato gravado (com
+        "tag_id"). Registros de progresso recebidos em "registros" (ex:
+        importação) vão para o store de progresso.
+        """
+        registro = {k: v for k, v in missao.items() if k != "tag"}
+        tag_id = self._id_da_tag(missao.get("tag"))
+        if tag_id:
+            registro["tag_id"] = tag_id
+        datas = _extrair_registros(registro)
+        if datas:
+            self._anexar_progresso([{"missao": registro["id"], "data": d} for d in datas])
+        return registro
+
+    def _campos_registro(self, campos):
+        """Converte "tag" em "tag_id" nos campos de uma atualização."""
+        if "tag" not in campos:
+            return campos
+        campos = dict(campos)
+        campos["tag_id"] = self._id_da_tag(campos.pop("tag"))
+        return campos
+
+    # --- Missões ---
+
+    def listar_missoes(self, status=None, tag=None):
+        """
+        Retorna as missões na ordem de exibição, opcionalmente filtradas por
+        status e/ou tag (ID; pelo índice reverso, sem percorrer a lista).
+        """
+        _, por_id, _ = self._tags()
+        if tag:
+            indice = self._indice(self._carregar_missoes())
+            selecionadas = sorted((indice[i] for i in self.ids_missoes_da_tag(tag)), key=lambda m: m["ordem"])
+            return [self._publica(m, por_id) for m in selecionadas if not status or m.get("status") == status]
+        try:
+            return [self._publica(m, por_id) for m in self._registros_missoes() if not status or m.get("status") == status]
+        except json.JSONDecodeError:
+            # Arquivo corrompido: carregar_json recupera dos snapshots
+            missoes = self._carregar_missoes()
+            return [self._publica(m, por_id) for m in missoes if not status or m.get("status") == status]
+
+    def iterar_missoes(self, status=None):
+        """
+        Percorre as missões na ordem (opcionalmente só as de um status) sem
+        montar uma lista nova: exportação e a página de missões.
+        """
+        registros = self._registros_missoes()
+        try:
+            primeira = next(registros, None)
+        except json.JSONDecodeError:
+            # Arquivo corrompido: carregar_json recupera dos snapshots
+            registros = iter(self._carregar_missoes())
+            primeira = next(registros, None)
+        if primeira is not None:
+            _, por_id, _ = self._tags()
+            for missao in chain((primeira,), registros):
+                if not status or missao.get("status") == status:
+                    yield self._publica(missao, por_id)
+
+    def obter_missao(self, missao_id):
+        """Retorna a missão com o ID informado ou None (O(1) pelo índice)."""
+        missao = self._indice(self._carregar_missoes()).get(missao_id)
+        return self._publica(missao) if missao is not None else None
+
+    def id_na_posicao(self, i):
+        """Retorna o ID da missão exibida na posição i (rotas antigas) ou None."""
+        if i < 0:
+            return None
+        try:
+            missao = next(self._registros_missoes(pular=i), None)
+        except json.JSONDecodeError:
+            missoes = self._carregar_missoes()
+            missao = missoes[i] if i < len(missoes) else None
+        return missao.get("id") if missao is not None else None
+
+    def estatisticas(self):
+        """Retorna as métricas do dashboard a partir dos contadores (O(1))."""
+        _, por_id, _ = self._tags()
+        nomes = {}
+        for tag_id in por_id:
+            tag = _resolver_tag(tag_id, por_id)
+            if tag is not None:
+                nomes[tag_id] = tag["nome"]
+        return _montar_estatisticas(self._contadores(self._carregar_missoes()).valores, nomes)
+
+    def verificar_contadores(self, corrigir=False):
+        """
+        Recalcula do zero os contadores que este processo mantém e compara.
+
+        Confere os índices publicados contra a própria lista deles, sem
+        recarregar missoes.json: recarregar recalcularia os contadores da
+        lista nova e nunca acharia divergência. Os contadores do JSON só
+        existem na memória, então um processo que ainda não leu as missões
+        (ex: a linha de comando) não tem o que conferir.
+
+        Args:
+            corrigir: Substitui os contadores mantidos pelos recalculados
+
+        Returns:
+            Dict {chave: {"mantido": x, "real": y}} só com as chaves divergentes
+        """
+        with self._indice_lock:
+            publicados = self._indices_publicados
+        if publicados is None:
+            return {}
+        reais = Contadores.calcular(publicados.lista)
+        divergencias = _divergencias(publicados.contadores.valores, reais.valores)
+        if divergencias and corrigir:
+            with self._indice_lock:
+                publicados.contadores.valores = reais.valores
+        return divergencias
+
+    def adicionar_missao(self, missao):
+        """Acrescenta uma missão ao fim da lista. Retorna True se salvou."""
+        missoes = self._carregar_missoes()
+        indice = self._indice(missoes)
+        missao = self._para_registro(missao)
+        missao["ordem"] = utils.ordem_entre(missoes[-1]["ordem"] if missoes else None, None)
+        missoes.append(missao)
+        indice[missao["id"]] = missao
+        self._contar(missoes, missao, 1)
+        self._reindexar(missoes, alteradas=[missao])
+        return self._salvar_missoes(missoes)
+
+    def atualizar_missao(self, missao_id, campos):
+        """
+        Atualiza campos de uma missão.
+
+        Args:
+            missao_id: ID da missão
+            campos: Dict de campos; valor None remove o campo (ex: tag)
+
+        Returns:
+            A missão atualizada ou None se não existir / falhar ao salvar
+        """
+        missoes = self._carregar_missoes()
+        missao = self._indice(missoes).get(missao_id)
+        if missao is None:
+            return None
+        [missao] = self._para_alterar(missoes, [missao])
+        self._contar(missoes, missao, -1)
+        _aplicar_campos(missao, self._campos_registro(campos))
+        self._contar(missoes, missao, 1)
+        self._reindexar(missoes, alteradas=[missao])
+        if not self._salvar_missoes(missoes):
+            return None
+        _publicar_status([missao], campos)
+        return self._publica(missao)
+
+    def registrar_progresso(self, missao_id, registro):
+        """
+        Registra progresso ({"data": ISO}) na missão: o registro vai para o
+        store de progresso e a missão guarda só o resumo atualizado.
+
+        Returns:
+            A missão ou None se não existir / falhar ao salvar
+        """
+        missoes = self._carregar_missoes()
+        missao = self._indice(missoes).get(missao_id)
+        if missao is None:
+            return None
+        [missao] = self._para_alterar(missoes, [missao])
+        missao["progresso"] = utils.somar_progresso(missao.get("progresso"), [registro["data"]])
+        self._anexar_progresso([{"missao": missao_id, "data": registro["data"]}])
+        if not self._salvar_missoes(missoes):
+            return None
+        # Compacta só depois que a sessão gravar: diario.json e eventos.jsonl
+        # não são stores da sessão e um descarte não os desfaria
+        utils.apos_sessao(self._compactar_progresso_do_dia)
+        return self._publica(missao)
+
+    def remover_missao(self, missao_id):
+        """Remove uma missão. Retorna a missão removida ou None."""
+        missoes = self._carregar_missoes()
+        indice = self._indice(missoes)
+        missao = indice.pop(missao_id, None)
+        if missao is None:
+            return None
+        missoes.remove(missao)
+        self._contar(missoes, missao, -1)
+        self._reindexar(missoes, removidas=[missao])
+        if not self._salvar_missoes(missoes):
+            return None
+        return self._publica(missao)
+
+    def buscar_missoes(self, consulta, limite=BUSCA_LIMITE, status=None, tag=None):
+        """
+        Missões cujo título ou tag casam a consulta (prefixo, sem acentos).
+
+        Cada termo casa o índice de títulos ou o nome de alguma tag; nesse
+        caso entram as missões da tag (índice reverso).
+
+        Returns:
+            Até `limite` missões (opcionalmente só com `status` e/ou `tag`),
+            na ordem da lista
+        """
+        missoes = self._carregar_missoes()
+        tags, por_id, _ = self._tags()
+
+        def missoes_da_tag(termo):
+            ids = set()
+            for t in tags:
+                if "mesclada_em" not in t and busca.casa_prefixo(termo, t["nome"]):
+                    ids |= self.ids_missoes_da_tag(t["id"])
+            return ids
+
+        chaves = self._buscar_titulos(missoes, consulta, complemento=missoes_da_tag)
+        if tag:
+            chaves &= self.ids_missoes_da_tag(tag)
+        indice = self._indice(missoes)
+        encontradas = [
+            indice[c] for c in chaves
+            if c in indice and (not status or indice[c].get("status") == status)
+        ]
+        encontradas.sort(key=lambda m: m["ordem"])
+        return [self._publica(m, por_id) for m in encontradas[:limite]]
+
+    # --- Operações em lote (uma leitura e uma gravação para N missões) ---
+
+    def obter_missoes(self, ids):
+        """Retorna as missões com os IDs informados (na ordem de `ids`), ignorando as inexistentes."""
+        return [self._publica(m) for m in self._registros_por_ids(ids)]
+
+    def _registros_por_ids(self, ids):
+        indice = self._indice(self._carregar_missoes())
+        return [indice[i] for i in ids if i in indice]
+
+    def adicionar_missoes(self, novas):
+        """Acrescenta várias missões (qualquer iterável) ao fim da lista. Retorna True se salvou."""
+        missoes = self._carregar_missoes()
+        indice = self._indice(missoes)
+        inicio = len(missoes)
+        for missao in novas:
+            missao = self._para_registro(missao)
+            missao["ordem"] = utils.ordem_entre(missoes[-1]["ordem"] if missoes else None, None)
+            missoes.append(missao)
+            indice[missao["id"]] = missao
+            self._contar(missoes, missao, 1)
+        self._reindexar(missoes, alteradas=missoes[inicio:])
+        return self._salvar_missoes(missoes)
+
+    def atualizar_missoes(self, ids, campos):
+        """
+        Aplica os mesmos `campos` a várias missões.
+
+        Returns:
+            Lista das missões atualizadas (vazia se nenhuma existe ou se
+            falhou ao salvar)
+        """
+        missoes = self._carregar_missoes()
+        alvo = self._para_alterar(missoes, self._registros_por_ids(ids))
+        campos = self._campos_registro(campos)
+        for missao in alvo:
+            self._contar(missoes, missao, -1)
+            _aplicar_campos(missao, campos)
+            self._contar(missoes, missao, 1)
+        self._reindexar(missoes, alteradas=alvo)
+        if alvo and not self._salvar_missoes(missoes):
+            return []
+        _publicar_status(alvo, campos)
+        _, por_id, _ = self._tags()
+        return [self._publica(m, por_id) for m in alvo]
+
+    def remover_missoes(self, ids):
+        """Remove várias missões de uma vez. Retorna a lista das removidas."""
+        missoes = self._carregar_missoes()
+        indice = self._indice(missoes)
+        removidas = [indice.pop(i) for i in dict.fromkeys(ids) if i in indice]
+        if not removidas:
+            return []
+        # Mesmo objeto de lista: o índice (por identidade) continua válido
+        alvo = {m["id"] for m in removidas}
+        missoes[:] = [m for m in missoes if m.get("id") not in alvo]
+        for missao in removidas:
+            self._contar(missoes, missao, -1)
+        self._reindexar(missoes, removidas=removidas)
+        if not self._salvar_missoes(missoes):
+            return []
+        _, por_id, _ = self._tags()
+        return [self._publica(m, por_id) for m in removidas]
+
+    def posicao_da_missao(self, missao_id):
+        """Retorna a posição (0 = topo) da missão na lista completa, ou None."""
+        missoes = self._carregar_missoes()
+        missao = self._indice(missoes).get(missao_id)
+        return missoes.index(missao) if missao is not None else None
+
+    def posicionar_missao(self, missao_id, posicao):
+        """
+        Move a missão para a posição informada alterando só a chave dela.
+
+        A nova chave é a média das vizinhas no destino; se estiverem
+        próximas demais, a lista inteira é renumerada (rebalanceamento).
+
+        Args:
+            missao_id: ID da missão
+            posicao: Posição final desejada (0 = topo), limitada à lista
+
+        Returns:
+            True se a missão existe (e foi gravada), False caso contrário
+        """
+        missoes = self._carregar_missoes()
+        missao = self._indice(missoes).get(missao_id)
+        if missao is None:
+            return False
+        [missao] = self._para_alterar(missoes, [missao])
+        atual = missoes.index(missao)
+        posicao = max(0, min(posicao, len(missoes) - 1))
+        if posicao == atual:
+            return True
+
+        missoes.pop(atual)
+        anterior = missoes[posicao - 1]["ordem"] if posicao > 0 else None
+        proxima = missoes[posicao]["ordem"] if posicao < len(missoes) else None
+        missoes.insert(posicao, missao)
+
+        nova_ordem = utils.ordem_entre(anterior, proxima)
+        if nova_ordem is None:
+            self._para_alterar(missoes, missoes)
+            utils.rebalancear_ordem(missoes)
+        else:
+            missao["ordem"] = nova_ordem
+        return self._salvar_missoes(missoes)
+
+    def mover_missao(self, missao_id, direcao):
+        """Move a missão uma posição para cima ou para baixo. Retorna True se moveu."""
+        posicao = self.posicao_da_missao(missao_id)
+        destino = _destino_por_direcao(posicao, direcao)
+        if destino is None or destino >= len(self._carregar_missoes()):
+            return False
+        return self.posicionar_missao(missao_id, destino)
+
+    def limpar_missoes(self):
+        """Apaga todas as missões (e o progresso registrado nelas)."""
+        with utils.trava_dados():
+            for caminho in (PROGRESSO_EVENTOS_PATH, PROGRESSO_DIARIO_PATH):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+        return self._salvar_missoes([])
+
+    # --- Progresso (eventos em JSON Lines + contagens diárias compactadas) ---
+
+    def _anexar_progresso(self, eventos):
+        """Acrescenta eventos {missao, data} ao store (no fim da requisição, se houver sessão)."""
+        pendentes = utils.carregar_em_sessao(PROGRESSO_EVENTOS_PATH, list, copiar=None)
+        pendentes.extend(eventos)
+        return utils.salvar_em_sessao(
+            PROGRESSO_EVENTOS_PATH, pendentes,
+            lambda dados: utils.anexar_jsonl(PROGRESSO_EVENTOS_PATH, dados) is not None,
+        )
+
+    def _carregar_diario(self):
+        """Contagens compactadas: {missao_id: {dia: quantidade}}."""
+        if not os.path.exists(PROGRESSO_DIARIO_PATH):
+            return {}
+        return utils.carregar_json_dict(PROGRESSO_DIARIO_PATH)
+
+    def progresso_da_missao(self, missao_id):
+        """
+        Progresso completo de uma missão: contagem por dia de todo o período
+        (compactada + recente) e os registros ainda não compactados.
+
+        Returns:
+            Dict {"total", "ultimo", "dias", "recentes"} ou None se a missão
+            não existe
+        """
+        missao = self._indice(self._carregar_missoes()).get(missao_id)
+        if missao is None:
+            return None
+        recentes = [
+            e["data"] for e in utils.ler_jsonl(PROGRESSO_EVENTOS_PATH)
+            if e.get("missao") == missao_id
+        ]
+        return _progresso_completo(missao.get("progresso"), self._carregar_diario().get(missao_id, {}), recentes)
+
+    def compactar_progresso(self, hoje=None):
+        """
+        Troca os registros mais antigos que PROGRESSO_JANELA_DIAS por
+        contagens por dia (diario.json) e descarta os de missões apagadas.
+
+        Returns:
+            Número de registros compactados ou descartados
+        """
+        limite = ((hoje or date.today()) - timedelta(days=PROGRESSO_JANELA_DIAS)).isoformat()
+        with utils.trava_dados():
+            ids = self._indice(self._carregar_missoes())
+            eventos = list(utils.ler_jsonl(PROGRESSO_EVENTOS_PATH))
+            mantidos = [e for e in eventos if e.get("missao") in ids and e.get("data", "")[:10] >= limite]
+            diario = self._carregar_diario()
+            sobras = [i for i in diario if i not in ids]
+            if len(mantidos) == len(eventos) and not sobras:
+                return 0
+
+            diario = {i: dict(dias) for i, dias in diario.items() if i in ids}
+            for evento in eventos:
+                if evento.get("missao") in ids and evento.get("data", "")[:10] < limite:
+                    dias = diario.setdefault(evento["missao"], {})
+                    dia = evento["data"][:10]
+                    dias[dia] = dias.get(dia, 0) + 1
+            # Contagens antes: se a reescrita dos eventos falhar, a próxima
+            # compactação contaria os mesmos eventos de novo
+            if not utils.salvar_json(PROGRESSO_DIARIO_PATH, diario):
+                return 0
+            if not utils.reescrever_jsonl(PROGRESSO_EVENTOS_PATH, mantidos):
+                return 0
+            return len(eventos) - len(mantidos)
+
+    def _compactar_progresso_do_dia(self):
+        """Compacta o progresso na primeira vez que é registrado em cada dia."""
+        hoje = date.today()
+        if self._progresso_compactado_em != hoje:
+            self._progresso_compactado_em = hoje
+            self.compactar_progresso(hoje)
+
+    # --- Histórico ---
+
+    def adicionar_logs(self, entradas):
+        """Acrescenta entradas ao histórico (JSON Lines, somente acréscimo)."""
+        sucesso = utils.anexar_historico(entradas)
+        if sucesso and self._entradas_indexadas:
+            # Índice já montado: indexa só as entradas novas
+            self._sincronizar_busca_historico()
+        return sucesso
+
+    def _sincronizar_busca_historico(self):
+        """
+        Traz o índice do histórico em dia lendo só o que foi anexado desde a
+        última vez: percorre do mais recente até achar uma entrada já
+        indexada. Entradas de segmentos apagados (rotação) saem do índice.
+        """
+        with self._busca_lock:
+            numeros = utils.numeros_segmentos_historico()
+            indexadas = self._entradas_indexadas
+            if indexadas and (not numeros or max(indexadas)[0] > numeros[-1]):
+                # Histórico apagado e recomeçado: as chaves voltaram a 1
+                indexadas.clear()
+                self._busca_historico = busca.IndiceInvertido()
+
+            for cursor, entrada in utils.ler_historico_a_partir():
+                chave = tuple(int(parte) for parte in cursor.split(":"))
+                if chave in indexadas:
+                    break
+                indexadas[chave] = entrada
+                self._busca_historico.adicionar(chave, entrada.get("acao"), entrada.get("resultado"))
+
+            primeiro = numeros[0] if numeros else None
+            for chave in [c for c in indexadas if primeiro is None or c[0] < primeiro]:
+                del indexadas[chave]
+                self._busca_historico.remover(chave)
+
+    def buscar_historico(self, consulta, limite=BUSCA_LIMITE,
+                         tipos=None, excluir=False, de=None, ate=None):
+        """
+        Entradas do histórico cuja ação ou resultado casam a consulta, mais
+        recentes primeiro. Filtros como em pagina_historico.
+        """
+        self._sincronizar_busca_historico()
+        filtro = _filtro_historico(tipos, excluir, de, ate)
+        # Sob a trava: outra thread pode estar sincronizando o índice
+        with self._busca_lock:
+            entradas = (
+                self._entradas_indexadas[c]
+                for c in sorted(self._busca_historico.buscar(consulta), reverse=True)
+            )
+            return list(islice(filter(filtro, entradas), limite))
+
+    def listar_historico(self, limite=MAX_HISTORICO_ENTRIES):
+        """Retorna o histórico, do mais recente para o mais antigo."""
+        return list(islice(utils.ler_historico(), limite))
+
+    def pagina_historico(self, cursor=None, limite=HISTORICO_POR_PAGINA,
+                         tipos=None, excluir=False, de=None, ate=None):
+        """
+        Uma página do histórico, do mais recente para o mais antigo.
+
+        Lê os segmentos de trás para frente a partir do cursor e para assim
+        que a página enche (ou ao passar de `de`, já que as entradas estão em
+        ordem cronológica).
+
+        Args:
+            cursor: Cursor devolvido pela página anterior (None = mais recentes)
+            limite: Entradas por página
+            tipos: Prefixos de ação (ver TIPOS_HISTORICO); vazio = todos
+            excluir: Inverte o filtro de tipos (mostra os demais)
+            de, ate: Datas "AAAA-MM-DD" (inclusivas) ou None
+
+        Returns:
+            Tupla (entradas, cursor da próxima página ou None)
+        """
+        inicio, fim = _intervalo_datas(de, ate)
+        entradas = []
+        for proximo, entrada in utils.ler_historico_a_partir(cursor):
+            data = entrada.get("data", "")
+            if inicio and data < inicio:
+                break
+            if fim and data >= fim:
+                continue
+            if tipos and entrada.get("acao", "").startswith(tuple(tipos)) == excluir:
+                continue
+            if len(entradas) == limite:
+                return entradas, cursor
+            entradas.append(entrada)
+            cursor = proximo
+        return entradas, None
+
+    def limpar_historico(self):
+        """Apaga todo o histórico."""
+        with self._busca_lock:
+            self._entradas_indexadas.clear()
+            self._busca_historico = busca.IndiceInvertido()
+        return utils.limpar_historico()
+
+    # --- Perfil ---
+
+    def carregar_perfil(self):
+        """Carrega o perfil, criando o padrão se não existir."""
+        if not os.path.exists(PERFIL_PATH):
+            perfil = utils.perfil_padrao()
+            utils.salvar_json(PERFIL_PATH, perfil)
+            return perfil
+        return utils.carregar_json_dict(PERFIL_PATH)
+
+    def salvar_perfil(self, perfil):
+        """Salva o perfil inteiro."""
+        return utils.salvar_json(PERFIL_PATH, perfil)
+
+    def apagar_perfil(self):
+        """Remove o perfil; o próximo carregamento recria o padrão."""
+        if os.path.exists(PERFIL_PATH):
+            os.remove(PERFIL_PATH)
+
+    # --- Versões ---
+
+    def versoes(self):
+        """Versões dos dados (cache de fragmentos): a assinatura de cada arquivo."""
+        return {
+            "missoes": _assinatura(MISSOES_PATH),
+            "tags": _assinatura(TAGS_PATH),
+            "perfil": _assinatura(PERFIL_PATH),
+            "historico": utils.versao_historico(),
+        }
+
+    def fechar(self):
+        """Nada a fechar: os arquivos são abertos só durante cada operação."""
+
+
+# Versões do schema SQLite (PRAGMA user_version). Novas alterações de schema
+# entram no fim da lista e são aplicadas uma única vez em init_db().
+_MIGRACOES = [
+    """
+    CREATE TABLE IF NOT EXISTS missoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        posicao INTEGER NOT NULL,
+        titulo TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'aberta',
+        data_criacao TEXT,
+        tag_nome TEXT,
+        tag_cor TEXT,
+        registros TEXT NOT NULL DEFAULT '[]'
+    );
+    CREATE INDEX IF NOT EXISTS idx_missoes_posicao ON missoes(posicao);
+    CREATE INDEX IF NOT EXISTS idx_missoes_status ON missoes(status);
+    CREATE INDEX IF NOT EXISTS idx_missoes_tag ON missoes(tag_nome);
+
+    CREATE TABLE IF NOT EXISTS historico (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT NOT NULL,
+        acao TEXT NOT NULL,
+        resultado TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_historico_data ON historico(data DESC);
+
+    CREATE TABLE IF NOT EXISTS perfil (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    );
+    """,
+    # 2: ID estável (uid) exposto nas rotas; o id inteiro continua interno
+    """
+    ALTER TABLE missoes ADD COLUMN uid TEXT;
+    UPDATE missoes SET uid = lower(hex(randomblob(6))) WHERE uid IS NULL;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_missoes_uid ON missoes(uid);
+    """,
+    # 3: posicao passa a ser chave de ordem fracionária (afinidade INTEGER
+    # mantém valores REAL não inteiros), espaçada por ORDEM_PASSO
+    f"""
+    UPDATE missoes SET posicao = posicao * {ORDEM_PASSO};
+    """,
+    # 4: contadores por status/tag mantidos por triggers (dashboard em O(1))
+    """
+    CREATE TABLE IF NOT EXISTS contadores (
+        chave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_contadores_insert AFTER INSERT ON missoes
+    BEGIN
+        INSERT INTO contadores (chave, valor)
+        SELECT chave, 1 FROM (
+            SELECT 'total' AS chave
+            UNION ALL SELECT 'status:' || NEW.status
+            UNION ALL SELECT 'tag:' || NEW.tag_nome WHERE NEW.tag_nome <> ''
+        ) WHERE true
+        ON CONFLICT(chave) DO UPDATE SET valor = valor + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_contadores_delete AFTER DELETE ON missoes
+    BEGIN
+        UPDATE contadores SET valor = valor - 1
+        WHERE chave IN ('total', 'status:' || OLD.status, 'tag:' || OLD.tag_nome);
+        DELETE FROM contadores WHERE valor <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_contadores_update AFTER UPDATE OF status, tag_nome ON missoes
+    WHEN OLD.status IS NOT NEW.status OR OLD.tag_nome IS NOT NEW.tag_nome
+    BEGIN
+        UPDATE contadores SET valor = valor - 1
+        WHERE chave IN ('status:' || OLD.status, 'tag:' || OLD.tag_nome);
+        INSERT INTO contadores (chave, valor)
+        SELECT chave, 1 FROM (
+            SELECT 'status:' || NEW.status AS chave
+            UNION ALL SELECT 'tag:' || NEW.tag_nome WHERE NEW.tag_nome <> ''
+        ) WHERE true
+        ON CONFLICT(chave) DO UPDATE SET valor = valor + 1;
+        DELETE FROM contadores WHERE valor <= 0;
+    END;
+
+    DELETE FROM contadores;
+    INSERT INTO contadores (chave, valor)
+    SELECT 'total', COUNT(*) FROM missoes HAVING COUNT(*) > 0;
+    INSERT INTO contadores (chave, valor)
+    SELECT 'status:' || status, COUNT(*) FROM missoes GROUP BY status;
+    INSERT INTO contadores (chave, valor)
+    SELECT 'tag:' || tag_nome, COUNT(*) FROM missoes WHERE tag_nome <> '' GROUP BY tag_nome;
+    """,
+    # 5: filtro do histórico por tipo de ação e período (/historico paginado)
+    """
+    CREATE INDEX IF NOT EXISTS idx_historico_acao_data ON historico(acao, data);
+    """,
+    # 6: tags normalizadas (tabela tags, missoes.tag_id). Vêm da chave 'tags'
+    # do perfil e das tags embutidas nas missões; contadores e busca passam
+    # a usar o ID (renomear/recolorir altera só a linha da tag)
+    """
+    CREATE TABLE IF NOT EXISTS tags (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE,
+        cor TEXT NOT NULL
+    );
+    ALTER TABLE missoes ADD COLUMN tag_id TEXT;
+
+    INSERT OR IGNORE INTO tags (id, nome, cor)
+    SELECT lower(hex(randomblob(6))), json_extract(t.value, '$.nome'),
+           COALESCE(json_extract(t.value, '$.cor'), '#000000')
+    FROM perfil, json_each(perfil.valor) AS t
+    WHERE perfil.chave = 'tags' AND json_valid(perfil.valor)
+      AND json_extract(t.value, '$.nome') <> '';
+    INSERT OR IGNORE INTO tags (id, nome, cor)
+    SELECT lower(hex(randomblob(6))), tag_nome, COALESCE(MAX(tag_cor), '#000000')
+    FROM missoes WHERE tag_nome <> '' GROUP BY tag_nome ORDER BY MIN(posicao);
+    DELETE FROM perfil WHERE chave = 'tags';
+
+    DROP TRIGGER IF EXISTS trg_contadores_insert;
+    DROP TRIGGER IF EXISTS trg_contadores_delete;
+    DROP TRIGGER IF EXISTS trg_contadores_update;
+    DROP TRIGGER IF EXISTS trg_missoes_fts_insert;
+    DROP TRIGGER IF EXISTS trg_missoes_fts_delete;
+    DROP TRIGGER IF EXISTS trg_missoes_fts_update;
+    DROP TRIGGER IF EXISTS trg_historico_fts_insert;
+    DROP TRIGGER IF EXISTS trg_historico_fts_delete;
+    DROP TABLE IF EXISTS missoes_fts;
+    DROP TABLE IF EXISTS historico_fts;
+
+    UPDATE missoes SET tag_id = (SELECT id FROM tags WHERE tags.nome = missoes.tag_nome)
+    WHERE tag_nome <> '';
+    UPDATE missoes SET tag_nome = NULL, tag_cor = NULL;
+    DROP INDEX IF EXISTS idx_missoes_tag;
+    CREATE INDEX IF NOT EXISTS idx_missoes_tag_id ON missoes(tag_id);
+
+    CREATE TRIGGER trg_contadores_insert AFTER INSERT ON missoes
+    BEGIN
+        INSERT INTO contadores (chave, valor)
+        SELECT chave, 1 FROM (
+            SELECT 'total' AS chave
+            UNION ALL SELECT 'status:' || NEW.status
+            UNION ALL SELECT 'tag:' || NEW.tag_id WHERE NEW.tag_id <> ''
+        ) WHERE true
+        ON CONFLICT(chave) DO UPDATE SET valor = valor + 1;
+    END;
+
+    CREATE TRIGGER trg_contadores_delete AFTER DELETE ON missoes
+    BEGIN
+        UPDATE contadores SET valor = valor - 1
+        WHERE chave IN ('total', 'status:' || OLD.status, 'tag:' || OLD.tag_id);
+        DELETE FROM contadores WHERE valor <= 0;
+    END;
+
+    CREATE TRIGGER trg_contadores_update AFTER UPDATE OF status, tag_id ON missoes
+    WHEN OLD.status IS NOT NEW.status OR OLD.tag_id IS NOT NEW.tag_id
+    BEGIN
+        UPDATE contadores SET valor = valor - 1
+        WHERE chave IN ('status:' || OLD.status, 'tag:' || OLD.tag_id);
+        INSERT INTO contadores (chave, valor)
+        SELECT chave, 1 FROM (
+            SELECT 'status:' || NEW.status AS chave
+            UNION ALL SELECT 'tag:' || NEW.tag_id WHERE NEW.tag_id <> ''
+        ) WHERE true
+        ON CONFLICT(chave) DO UPDATE SET valor = valor + 1;
+        DELETE FROM contadores WHERE valor <= 0;
+    END;
+
+    DELETE FROM contadores WHERE chave GLOB 'tag:*';
+    INSERT INTO contadores (chave, valor)
+    SELECT 'tag:' || tag_id, COUNT(*) FROM missoes WHERE tag_id <> '' GROUP BY tag_id;
+    """,
+    # 7: versão de cada área, incrementada por triggers a cada linha
+    # alterada (chave do cache de fragmentos, válida entre processos)
+    """
+    CREATE TABLE IF NOT EXISTS versoes (
+        area TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO versoes (area) VALUES ('missoes'), ('tags'), ('perfil'), ('historico');
+
+    CREATE TRIGGER trg_versao_missoes_insert AFTER INSERT ON missoes
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'missoes'; END;
+    CREATE TRIGGER trg_versao_missoes_update AFTER UPDATE ON missoes
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'missoes'; END;
+    CREATE TRIGGER trg_versao_missoes_delete AFTER DELETE ON missoes
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'missoes'; END;
+    CREATE TRIGGER trg_versao_tags_insert AFTER INSERT ON tags
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'tags'; END;
+    CREATE TRIGGER trg_versao_tags_update AFTER UPDATE ON tags
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'tags'; END;
+    CREATE TRIGGER trg_versao_tags_delete AFTER DELETE ON tags
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'tags'; END;
+    CREATE TRIGGER trg_versao_perfil_insert AFTER INSERT ON perfil
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'perfil'; END;
+    CREATE TRIGGER trg_versao_perfil_update AFTER UPDATE ON perfil
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'perfil'; END;
+    CREATE TRIGGER trg_versao_perfil_delete AFTER DELETE ON perfil
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'perfil'; END;
+    CREATE TRIGGER trg_versao_historico_insert AFTER INSERT ON historico
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'historico'; END;
+    CREATE TRIGGER trg_versao_historico_update AFTER UPDATE ON historico
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'historico'; END;
+    CREATE TRIGGER trg_versao_historico_delete AFTER DELETE ON historico
+    BEGIN UPDATE versoes SET valor = valor + 1 WHERE area = 'historico'; END;
+    """,
+    # 8: registros de progresso em tabela própria (somente acréscimo), com
+    # contagens diárias para os compactados; a missão guarda só o resumo
+    # (coluna progresso, JSON de tamanho fixo) e registros deixa de ser usada
+    f"""
+    CREATE TABLE IF NOT EXISTS progresso (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        missao_uid TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_progresso_missao ON progresso(missao_uid, data);
+    CREATE TABLE IF NOT EXISTS progresso_diario (
+        missao_uid TEXT NOT NULL,
+        dia TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        PRIMARY KEY (missao_uid, dia)
+    ) WITHOUT ROWID;
+    ALTER TABLE missoes ADD COLUMN progresso TEXT;
+
+    INSERT INTO progresso (missao_uid, data)
+    SELECT m.uid, json_extract(r.value, '$.data')
+    FROM missoes m, json_each(m.registros) AS r
+    WHERE json_valid(m.registros) AND json_extract(r.value, '$.data') IS NOT NULL
+    ORDER BY m.id, r.key;
+    UPDATE missoes SET progresso = (
+        SELECT json_object(
+            'total', COUNT(*),
+            'ultimo', MAX(p.data),
+            'dias', json((
+                SELECT json_group_object(dia, n) FROM (
+                    SELECT dia, n FROM (
+                        SELECT substr(q.data, 1, 10) AS dia, COUNT(*) AS n
+                        FROM progresso q WHERE q.missao_uid = missoes.uid
+                        GROUP BY dia ORDER BY dia DESC LIMIT {PROGRESSO_DIAS_RESUMO}
+                    ) ORDER BY dia
+                )
+            ))
+        )
+        FROM progresso p WHERE p.missao_uid = missoes.uid
+    )
+    WHERE uid IN (SELECT missao_uid FROM progresso);
+    UPDATE missoes SET registros = '[]' WHERE registros <> '[]';
+
+    CREATE TRIGGER trg_progresso_delete AFTER DELETE ON missoes
+    BEGIN
+        DELETE FROM progresso WHERE missao_uid = OLD.uid;
+        DELETE FROM progresso_diario WHERE missao_uid = OLD.uid;
+    END;
+    """,
+]
+
+# Busca textual (FTS5, tabelas de conteúdo externo mantidas por triggers).
+# Fora de _MIGRACOES porque nem todo SQLite é compilado com FTS5: sem ele a
+# busca cai para o índice em memória (ver RepositorioSQLite._busca_sem_fts).
+# Só o título é indexado: o nome da tag é comparado na tabela tags (ver
+# buscar_missoes), então renomear uma tag não reindexa as missões dela.
+_SCRIPT_BUSCA = """
+CREATE VIRTUAL TABLE missoes_fts USING fts5(
+    titulo, content='missoes', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER trg_missoes_fts_insert AFTER INSERT ON missoes
+BEGIN
+    INSERT INTO missoes_fts (rowid, titulo) VALUES (NEW.id, NEW.titulo);
+END;
+
+CREATE TRIGGER trg_missoes_fts_delete AFTER DELETE ON missoes
+BEGIN
+    INSERT INTO missoes_fts (missoes_fts, rowid, titulo) VALUES ('delete', OLD.id, OLD.titulo);
+END;
+
+CREATE TRIGGER trg_missoes_fts_update AFTER UPDATE OF titulo ON missoes
+BEGIN
+    INSERT INTO missoes_fts (missoes_fts, rowid, titulo) VALUES ('delete', OLD.id, OLD.titulo);
+    INSERT INTO missoes_fts (rowid, titulo) VALUES (NEW.id, NEW.titulo);
+END;
+
+CREATE VIRTUAL TABLE historico_fts USING fts5(
+    acao, resultado, content='historico', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER trg_historico_fts_insert AFTER INSERT ON historico
+BEGIN
+    INSERT INTO historico_fts (rowid, acao, resultado) VALUES (NEW.id, NEW.acao, NEW.resultado);
+END;
+
+CREATE TRIGGER trg_historico_fts_delete AFTER DELETE ON historico
+BEGIN
+    INSERT INTO historico_fts (historico_fts, rowid, acao, resultado)
+    VALUES ('delete', OLD.id, OLD.acao, OLD.resultado);
+END;
+
+INSERT INTO missoes_fts (missoes_fts) VALUES ('rebuild');
+INSERT INTO historico_fts (historico_fts) VALUES ('rebuild');
+"""
+
+_COLUNAS_MISSAO = "uid, titulo, status, data_criacao, tag_id, progresso"
+_INSERIR_MISSAO = f"INSERT INTO missoes (posicao, {_COLUNAS_MISSAO}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+# Missão com a tag atual (nome e cor vêm da tabela tags)
+_SELECT_MISSAO = """
+SELECT m.*, t.nome AS nome_tag, t.cor AS cor_tag
+FROM missoes m LEFT JOIN tags t ON t.id = m.tag_id
+"""
+
+# Conexões herdadas de um fork (ver RepositorioSQLite._apos_fork)
+_conexoes_herdadas = []
+
+
+class RepositorioSQLite:
+    """Repositório SQLite: cada rota altera apenas as linhas envolvidas."""
+
+    def __init__(self, db_path=DATABASE_PATH):
+        """
+        Inicializa o repositório e garante o schema.
+
+        Args:
+            db_path: Caminho do arquivo do banco de dados
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        # Dia da última compactação do progresso neste processo
+        self._progresso_compactado_em = None
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.init_db()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._apos_fork)
+
+    def _apos_fork(self):
+        """
+        No processo filho (ex: workers do gunicorn), abandona as conexões
+        herdadas: uma conexão SQLite não pode ser usada dos dois lados de
+        um fork. Também não é fechada, porque fechar no filho pode apagar o
+        WAL que o pai ainda usa; fica guardada até o processo terminar.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            _conexoes_herdadas.append(conn)
+        self._local = threading.local()
+
+    def fechar(self):
+        """Fecha a conexão da thread atual (reaberta no próximo uso)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def _conexao(self):
+        """Retorna a conexão da thread atual (uma por thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def get_connection(self):
+        """
+        Context manager transacional: commit ao sair, rollback em erro.
+
+        Yields:
+            sqlite3.Connection: Conexão com o banco
+        """
+        conn = self._conexao()
+        with metricas.medir_io("banco"):
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def init_db(self):
+        """Aplica as migrações de schema pendentes."""
+        with utils.trava_dados(), self.get_connection() as conn:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero, script in enumerate(_MIGRACOES[versao:], start=versao + 1):
+                conn.executescript(script)
+                conn.execute(f"PRAGMA user_version = {numero}")
+            self.fts = self._preparar_busca(conn)
+
+    def _preparar_busca(self, conn):
+        """Cria as tabelas FTS5 na primeira vez. Retorna False se não há FTS5."""
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'missoes_fts'"
+        ).fetchone()
+        if existe:
+            return True
+        try:
+            conn.executescript(_SCRIPT_BUSCA)
+        except sqlite3.OperationalError as e:
+            # "no such module: fts5" (ou remove_diacritics 2 em SQLite < 3.27)
+            print(f"Busca sem FTS5: {e}")
+            return False
+        return True
+
+    # --- Missões ---
+
+    def _obter(self, conn, missao_id):
+        row = conn.execute(f"{_SELECT_MISSAO} WHERE m.uid = ?", (missao_id,)).fetchone()
+        return _linha_para_missao(row) if row else None
+
+    def listar_missoes(self, status=None, tag=None):
+        """
+        Retorna as missões na ordem de exibição, opcionalmente filtradas por
+        status e/ou tag (ID; pelo índice idx_missoes_tag_id).
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"""
+                {_SELECT_MISSAO}
+                WHERE (? IS NULL OR m.status = ?) AND (? IS NULL OR m.tag_id = ?)
+                ORDER BY m.posicao
+                """,
+                (status or None, status or None, tag or None, tag or None),
+            )
+            return [_linha_para_missao(r) for r in rows]
+
+    def buscar_missoes(self, consulta, limite=BUSCA_LIMITE, status=None, tag=None):
+        """
+        Missões cujo título ou tag casam a consulta (prefixo, sem acentos).
+
+        Cada termo casa o título (FTS5) ou o nome de alguma tag (comparado
+        em Python: são poucas); nesse caso entram as missões da tag.
+
+        Returns:
+            Até `limite` missões (opcionalmente só com `status` e/ou `tag`),
+            na ordem da lista
+        """
+        termos = busca.termos(consulta)
+        if not termos:
+            return []
+        if not self.fts:
+            missoes = (
+                m for m in self.iterar_missoes()
+                if (not status or m["status"] == status) and (not tag or (m.get("tag") or {}).get("id") == tag)
+            )
+            return self._busca_sem_fts(missoes, consulta, limite, _textos_busca)
+        with self.get_connection() as conn:
+            tags = conn.execute("SELECT id, nome FROM tags").fetchall()
+            condicoes, parametros = [], []
+            for termo in set(termos):
+                ids_tags = [t["id"] for t in tags if busca.casa_prefixo(termo, t["nome"])]
+                condicao = "m.id IN (SELECT rowid FROM missoes_fts WHERE missoes_fts MATCH ?)"
+                parametros.append(f'"{termo}"*')
+                if ids_tags:
+                    condicao = f"({condicao} OR m.tag_id IN ({', '.join('?' for _ in ids_tags)}))"
+                    parametros.extend(ids_tags)
+                condicoes.append(condicao)
+            rows = conn.execute(
+                f"""
+                {_SELECT_MISSAO}
+                WHERE {' AND '.join(condicoes)}
+                  AND (? IS NULL OR m.status = ?) AND (? IS NULL OR m.tag_id = ?)
+                ORDER BY m.posicao LIMIT ?
+                """,
+                parametros + [status or None, status or None, tag or None, tag or None, limite],
+            )
+            return [_linha_para_missao(r) for r in rows]
+
+    def _busca_sem_fts(self, registros, consulta, limite, textos):
+        """Busca por varredura com as mesmas regras de busca.IndiceInvertido."""
+        indice = busca.IndiceInvertido()
+        registros = list(registros)
+        for i, registro in enumerate(registros):
+            indice.adicionar(i, *textos(registro))
+        return [registros[i] for i in sorted(indice.buscar(consulta))[:limite]]
+
+    def iterar_missoes(self, status=None):
+        """
+        Percorre as missões na ordem (opcionalmente só as de um status),
+        linha a linha: exportação e a página de missões.
+
+        Usa uma conexão própria: o gerador pode ser consumido depois do fim
+        da requisição, e a leitura enxerga um retrato consistente (WAL).
+        """
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                f"{_SELECT_MISSAO} WHERE (? IS NULL OR m.status = ?) ORDER BY m.posicao",
+                (status or None, status or None),
+            )
+            for row in rows:
+                yield _linha_para_missao(row)
+        finally:
+            conn.close()
+
+    def obter_missao(self, missao_id):
+        """Retorna a missão com o ID informado ou None."""
+        with self.get_connection() as conn:
+            return self._obter(conn, missao_id)
+
+    def id_na_posicao(self, i):
+        """Retorna o ID da missão exibida na posição i (rotas antigas) ou None."""
+        if i < 0:
+            return None
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT uid FROM missoes ORDER BY posicao LIMIT 1 OFFSET ?", (i,)
+            ).fetchone()
+        return row["uid"] if row else None
+
+    def estatisticas(self):
+        """Retorna as métricas do dashboard a partir da tabela contadores."""
+        with self.get_connection() as conn:
+            nomes = {r["id"]: r["nome"] for r in conn.execute("SELECT id, nome FROM tags")}
+            return _montar_estatisticas(self._contadores_mantidos(conn), nomes)
+
+    def _contadores_mantidos(self, conn):
+        return {r["chave"]: r["valor"] for r in conn.execute("SELECT chave, valor FROM contadores")}
+
+    def verificar_contadores(self, corrigir=False):
+        """
+        Recalcula os contadores do zero e compara com a tabela contadores.
+
+        Args:
+            corrigir: Regrava a tabela com os valores recalculados
+
+        Returns:
+            Dict {chave: {"mantido": x, "real": y}} só com as chaves divergentes
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute("SELECT status, tag_id FROM missoes")
+            reais = Contadores.calcular(dict(r) for r in rows).valores
+            divergencias = _divergencias(self._contadores_mantidos(conn), reais)
+            if divergencias and corrigir:
+                conn.execute("DELETE FROM contadores")
+                conn.executemany(
+                    "INSERT INTO contadores (chave, valor) VALUES (?, ?)", reais.items()
+                )
+        return divergencias
+
+    def adicionar_missao(self, missao):
+        """Insere uma missão no fim da ordem. Retorna True se salvou."""
+        missao = dict(missao)
+        datas = _extrair_registros(missao)
+        with self.get_connection() as conn:
+            ultima = conn.execute("SELECT MAX(posicao) FROM missoes").fetchone()[0]
+            parametros = _missao_para_parametros(missao, self._id_da_tag(conn, missao.get("tag")))
+            conn.execute(_INSERIR_MISSAO, (utils.ordem_entre(ultima, None),) + parametros)
+            conn.executemany(
+                "INSERT INTO progresso (missao_uid, data) VALUES (?, ?)",
+                [(parametros[0], d) for d in datas],
+            )
+        return True
+
+    def atualizar_missao(self, missao_id, campos):
+        """
+        Atualiza campos de uma missão com um único UPDATE.
+
+        Args:
+            missao_id: ID da missão
+            campos: Dict de campos; valor None remove o campo (ex: tag)
+
+        Returns:
+            A missão atualizada ou None se não existir
+        """
+        with self.get_connection() as conn:
+            colunas, params = _colunas_atualizacao(self._campos_registro(conn, campos))
+            if colunas:
+                conn.execute(
+                    f"UPDATE missoes SET {', '.join(colunas)} WHERE uid = ?",
+                    params + [missao_id],
+                )
+            missao = self._obter(conn, missao_id)
+        if missao is not None:
+            _publicar_status([missao], campos)
+        return missao
+
+    def registrar_progresso(self, missao_id, registro):
+        """
+        Registra progresso ({"data": ISO}) na missão: uma linha na tabela
+        progresso e o resumo da missão atualizado, na mesma transação.
+
+        Returns:
+            A missão ou None se não existir
+        """
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT progresso FROM missoes WHERE uid = ?", (missao_id,)).fetchone()
+            if row is None:
+                return None
+            progresso = utils.somar_progresso(json.loads(row["progresso"] or "null"), [registro["data"]])
+            conn.execute(
+                "INSERT INTO progresso (missao_uid, data) VALUES (?, ?)", (missao_id, registro["data"])
+            )
+            conn.execute(
+                "UPDATE missoes SET progresso = ? WHERE uid = ?",
+                (json.dumps(progresso, ensure_ascii=False), missao_id),
+            )
+            missao = self._obter(conn, missao_id)
+        self._compactar_progresso_do_dia()
+        return missao
+
+    def remover_missao(self, missao_id):
+        """Remove uma missão. Retorna a missão removida ou None."""
+        with self.get_connection() as conn:
+            missao = self._obter(conn, missao_id)
+            if missao is not None:
+                conn.execute("DELETE FROM missoes WHERE uid = ?", (missao_id,))
+            return missao
+
+    # --- Operações em lote (uma transação para N missões) ---
+
+    def obter_missoes(self, ids):
+        """Retorna as missões com os IDs informados (na ordem de `ids`), ignorando as inexistentes."""
+        with self.get_connection() as conn:
+            missoes = (self._obter(conn, i) for i in ids)
+            return [m for m in missoes if m is not None]
+
+    def adicionar_missoes(self, novas):
+        """Insere várias missões (qualquer iterável) no fim da ordem, em uma transação."""
+        with self.get_connection() as conn:
+            ultima = conn.execute("SELECT MAX(posicao) FROM missoes").fetchone()[0]
+            ids_tags = {}
+            progresso = []
+
+            def linhas():
+                # Gerador: `novas` pode ser um iterável longo, consumido aos poucos
+                ordem = ultima
+                for missao in novas:
+                    missao = dict(missao)
+                    datas = _extrair_registros(missao)
+                    ordem = utils.ordem_entre(ordem, None)
+                    tag_id = self._id_da_tag(conn, missao.get("tag"), ids_tags)
+                    parametros = _missao_para_parametros(missao, tag_id)
+                    progresso.extend((parametros[0], d) for d in datas)
+                    yield (ordem,) + parametros
+
+            conn.executemany(
+                _INSERIR_MISSAO,
+                linhas(),
+            )
+            conn.executemany("INSERT INTO progresso (missao_uid, data) VALUES (?, ?)", progresso)
+        return True
+
+    def atualizar_missoes(self, ids, campos):
+        """Aplica os mesmos `campos` a várias missões. Retorna as missões atualizadas."""
+        with self.get_connection() as conn:
+            colunas, params = _colunas_atualizacao(self._campos_registro(conn, campos))
+            if colunas:
+                conn.executemany(
+                    f"UPDATE missoes SET {', '.join(colunas)} WHERE uid = ?",
+                    [params + [i] for i in ids],
+                )
+            missoes = [m for m in (self._obter(conn, i) for i in ids) if m is not None]
+        _publicar_status(missoes, campos)
+        return missoes
+
+    def remover_missoes(self, ids):
+        """Remove várias missões de uma vez. Retorna a lista das removidas."""
+        with self.get_connection() as conn:
+            removidas = [m for m in (self._obter(conn, i) for i in dict.fromkeys(ids)) if m is not None]
+            conn.executemany(
+                "DELETE FROM missoes WHERE uid = ?", [(m["id"],) for m in removidas]
+            )
+            return removidas
+
+    def posicao_da_missao(self, missao_id):
+        """Retorna a posição (0 = topo) da missão na lista completa, ou None."""
+        with self.get_connection() as conn:
+            return self._posicao(conn, missao_id)
+
+    def _posicao(self, conn, missao_id):
+        row = conn.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM missoes WHERE posicao < m.posicao)
+            FROM missoes m WHERE m.uid = ?
+            """,
+            (missao_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def posicionar_missao(self, missao_id, posicao):
+        """
+        Move a missão para a posição informada com um único UPDATE.
+
+        A nova chave é a média das vizinhas no destino; se estiverem
+        próximas demais, a tabela é renumerada antes (rebalanceamento).
+
+        Args:
+            missao_id: ID da missão
+            posicao: Posição final desejada (0 = topo), limitada à lista
+
+        Returns:
+            True se a missão existe, False caso contrário
+        """
+        with self.get_connection() as conn:
+            atual = self._posicao(conn, missao_id)
+            if atual is None:
+                return False
+            total = conn.execute("SELECT COUNT(*) FROM missoes").fetchone()[0]
+            posicao = max(0, min(posicao, total - 1))
+            if posicao == atual:
+                return True
+
+            for _ in range(2):
+                # Vizinhas no destino, desconsiderando a própria missão
+                vizinhas = [
+                    r[0] for r in conn.execute(
+                        "SELECT posicao FROM missoes WHERE uid != ? ORDER BY posicao LIMIT ? OFFSET ?",
+                        (missao_id, 2 if posicao > 0 else 1, max(posicao - 1, 0)),
+                    )
+                ]
+                if posicao == 0:
+                    anterior, proxima = None, vizinhas[0]
+                else:
+                    anterior = vizinhas[0]
+                    proxima = vizinhas[1] if len(vizinhas) > 1 else None
+                nova_ordem = utils.ordem_entre(anterior, proxima)
+                if nova_ordem is not None:
+                    break
+                self._rebalancear(conn)
+
+            conn.execute(
+                "UPDATE missoes SET posicao = ? WHERE uid = ?", (nova_ordem, missao_id)
+            )
+            return True
+
+    def _rebalancear(self, conn):
+        """Renumera todas as chaves de ordem com intervalos de ORDEM_PASSO."""
+        ids = [r[0] for r in conn.execute("SELECT id FROM missoes ORDER BY posicao")]
+        conn.executemany(
+            "UPDATE missoes SET posicao = ? WHERE id = ?",
+            [(n * ORDEM_PASSO, missao_id) for n, missao_id in enumerate(ids, start=1)],
+        )
+
+    def mover_missao(self, missao_id, direcao):
+        """Move a missão uma posição para cima ou para baixo. Retorna True se moveu."""
+        with self.get_connection() as conn:
+            posicao = self._posicao(conn, missao_id)
+            total = conn.execute("SELECT COUNT(*) FROM missoes").fetchone()[0]
+        destino = _destino_por_direcao(posicao, direcao)
+        if destino is None or destino >= total:
+            return False
+        return self.posicionar_missao(missao_id, destino)
+
+    def limpar_missoes(self):
+        """Apaga todas as missões (e, pelo trigger, o progresso registrado nelas)."""
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM missoes")
+        return True
+
+    # --- Progresso (tabela progresso + contagens em progresso_diario) ---
+
+    def progresso_da_missao(self, missao_id):
+        """
+        Progresso completo de uma missão: contagem por dia de todo o período
+        (compactada + recente) e os registros ainda não compactados.
+
+        Returns:
+            Dict {"total", "ultimo", "dias", "recentes"} ou None se a missão
+            não existe
+        """
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT progresso FROM missoes WHERE uid = ?", (missao_id,)).fetchone()
+            if row is None:
+                return None
+            dias = conn.execute(
+                "SELECT dia, quantidade FROM progresso_diario WHERE missao_uid = ?", (missao_id,)
+            ).fetchall()
+            recentes = conn.execute(
+                "SELECT data FROM progresso WHERE missao_uid = ? ORDER BY data, id", (missao_id,)
+            ).fetchall()
+        return _progresso_completo(
+            json.loads(row["progresso"] or "null"),
+            {r["dia"]: r["quantidade"] for r in dias},
+            [r["data"] for r in recentes],
+        )
+
+    def compactar_progresso(self, hoje=None):
+        """
+        Troca os registros mais antigos que PROGRESSO_JANELA_DIAS por
+        contagens por dia (progresso_diario).
+
+        Returns:
+            Número de registros compactados
+        """
+        limite = ((hoje or date.today()) - timedelta(days=PROGRESSO_JANELA_DIAS)).isoformat()
+        with self.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO progresso_diario (missao_uid, dia, quantidade)
+                SELECT missao_uid, substr(data, 1, 10), COUNT(*) FROM progresso
+                WHERE data < ? GROUP BY missao_uid, substr(data, 1, 10)
+                ON CONFLICT(missao_uid, dia) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+                """,
+                (limite,),
+            )
+            return conn.execute("DELETE FROM progresso WHERE data < ?", (limite,)).rowcount
+
+    def _compactar_progresso_do_dia(self):
+        """Compacta o progresso na primeira vez que é registrado em cada dia."""
+        hoje = date.today()
+        if self._progresso_compactado_em != hoje:
+            self._progresso_compactado_em = hoje
+            self.compactar_progresso(hoje)
+
+    # --- Tags ---
+
+    def listar_tags(self):
+        """Retorna as tags ({id, nome, cor}) na ordem de criação."""
+        with self.get_connection() as conn:
+            return [dict(r) for r in conn.execute("SELECT id, nome, cor FROM tags ORDER BY rowid")]
+
+    def obter_tag(self, tag_id):
+        """Retorna a tag com o ID informado ou None."""
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT id, nome, cor FROM tags WHERE id = ?", (tag_id,)).fetchone()
+            return dict(row) if row else None
+
+    def tag_por_nome(self, nome):
+        """Retorna a tag com o nome informado ou None."""
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT id, nome, cor FROM tags WHERE nome = ?", (nome,)).fetchone()
+            return dict(row) if row else None
+
+    def criar_tag(self, nome, cor):
+        """Cria uma tag. Retorna a tag criada ou None se o nome já existe."""
+        with self.get_connection() as conn:
+            return self._criar_tag(conn, nome, cor)
+
+    def _criar_tag(self, conn, nome, cor):
+        tag = {"id": utils.gerar_id_tag(), "nome": nome, "cor": cor}
+        try:
+            conn.execute("INSERT INTO tags (id, nome, cor) VALUES (:id, :nome, :cor)", tag)
+        except sqlite3.IntegrityError:
+            return None
+        return tag
+
+    def renomear_tag(self, tag_id, nome):
+        """
+        Renomeia uma tag com um UPDATE na linha dela (as missões guardam o ID).
+
+        Returns:
+            A tag alterada, ou None se não existe ou o nome já é de outra tag
+        """
+        with self.get_connection() as conn:
+            try:
+                conn.execute("UPDATE tags SET nome = ? WHERE id = ?", (nome, tag_id))
+            except sqlite3.IntegrityError:
+                return None
+            row = conn.execute("SELECT id, nome, cor FROM tags WHERE id = ?", (tag_id,)).fetchone()
+            return dict(row) if row else None
+
+    def recolorir_tag(self, tag_id, cor):
+        """Troca a cor de uma tag (um UPDATE na linha dela). Retorna a tag ou None."""
+        with self.get_connection() as conn:
+            conn.execute("UPDATE tags SET cor = ? WHERE id = ?", (cor, tag_id))
+            row = conn.execute("SELECT id, nome, cor FROM tags WHERE id = ?", (tag_id,)).fetchone()
+            return dict(row) if row else None
+
+    def mesclar_tags(self, origem_id, destino_id):
+        """
+        Junta a tag `origem_id` à `destino_id` e apaga a origem. Só as missões
+        da origem são alteradas (pelo índice idx_missoes_tag_id).
+
+        Returns:
+            A tag de destino, ou None se alguma não existe ou são a mesma
+        """
+        with self.get_connection() as conn:
+            existentes = {
+                r["id"]: dict(r) for r in conn.execute(
+                    "SELECT id, nome, cor FROM tags WHERE id IN (?, ?)", (origem_id, destino_id)
+                )
+            }
+            if origem_id == destino_id or len(existentes) != 2:
+                return None
+            conn.execute("UPDATE missoes SET tag_id = ? WHERE tag_id = ?", (destino_id, origem_id))
+            conn.execute("DELETE FROM tags WHERE id = ?", (origem_id,))
+            return existentes[destino_id]
+
+    def remover_tag(self, tag_id):
+        """
+        Apaga uma tag; as missões dela (pelo índice) ficam sem tag.
+
+        Returns:
+            Quantas missões tinham a tag, ou None se a tag não existe
+        """
+        with self.get_connection() as conn:
+            if conn.execute("DELETE FROM tags WHERE id = ?", (tag_id,)).rowcount == 0:
+                return None
+            return conn.execute(
+                "UPDATE missoes SET tag_id = NULL WHERE tag_id = ?", (tag_id,)
+            ).rowcount
+
+    def limpar_tags(self):
+        """Apaga todas as tags (as missões ficam sem tag). Retorna quantas havia."""
+        with self.get_connection() as conn:
+            conn.execute("UPDATE missoes SET tag_id = NULL WHERE tag_id IS NOT NULL")
+            return conn.execute("DELETE FROM tags").rowcount
+
+    def ids_missoes_da_tag(self, tag_id):
+        """IDs das missões com a tag (pelo índice idx_missoes_tag_id)."""
+        with self.get_connection() as conn:
+            return {r[0] for r in conn.execute("SELECT uid FROM missoes WHERE tag_id = ?", (tag_id,))}
+
+    def _id_da_tag(self, conn, tag, cache=None):
+        """
+        ID da tag informada ({id} ou {nome, cor}), criando-a pelo nome se
+        ainda não existe e nome e cor passam em utils.validar_tag (quem
+        recebe a tag já a valida com utils.validar_tag_missao). None se
+        `tag` é vazia ou inválida.
+
+        Args:
+            cache: Dict opcional para reaproveitar as consultas em um lote
+        """
+        if not tag:
+            return None
+        chave = (tag.get("id"), tag.get("nome"))
+        if cache is not None and chave in cache:
+            return cache[chave]
+        row = conn.execute(
+            "SELECT id FROM tags WHERE id = ? OR nome = ? ORDER BY id = ? DESC LIMIT 1",
+            (tag.get("id"), tag.get("nome"), tag.get("id")),
+        ).fetchone()
+        valida, nome, _ = utils.validar_tag(tag.get("nome"), tag.get("cor"))
+        if row:
+            tag_id = row["id"]
+        elif valida:
+            row = conn.execute("SELECT id FROM tags WHERE nome = ?", (nome,)).fetchone()
+            tag_id = row["id"] if row else self._criar_tag(conn, nome, tag["cor"])["id"]
+        else:
+            tag_id = None
+        if cache is not None:
+            cache[chave] = tag_id
+        return tag_id
+
+    def _campos_registro(self, conn, campos):
+        """Converte "tag" em "tag_id" nos campos de uma atualização."""
+        if "tag" not in campos:
+            return campos
+        campos = dict(campos)
+        campos["tag_id"] = self._id_da_tag(conn, campos.pop("tag"))
+        return campos
+
+    # --- Histórico ---
+
+    def adicionar_logs(self, entradas):
+        """Insere entradas no histórico e descarta as excedentes mais antigas."""
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO historico (data, acao, resultado) VALUES (?, ?, ?)",
+                [(e["data"], e["acao"], e["resultado"]) for e in entradas],
+            )
+            ultimo = conn.execute("SELECT MAX(id) FROM historico").fetchone()[0] or 0
+            conn.execute(
+                "DELETE FROM historico WHERE id <= ?",
+                (ultimo - MAX_HISTORICO_ENTRIES,),
+            )
+        return True
+
+    def buscar_historico(self, consulta, limite=BUSCA_LIMITE,
+                         tipos=None, excluir=False, de=None, ate=None):
+        """
+        Entradas do histórico cuja ação ou resultado casam a consulta, mais
+        recentes primeiro. Filtros como em pagina_historico.
+        """
+        expressao = busca.consulta_fts(consulta)
+        if not expressao:
+            return []
+        if not self.fts:
+            filtro = _filtro_historico(tipos, excluir, de, ate)
+            return self._busca_sem_fts(filter(filtro, self.listar_historico()), consulta, limite,
+                                       lambda e: (e["acao"], e["resultado"]))
+        condicoes, parametros = _condicoes_historico(tipos, excluir, de, ate)
+        condicoes.insert(0, "id IN (SELECT rowid FROM historico_fts WHERE historico_fts MATCH ?)")
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT data, acao, resultado FROM historico WHERE {' AND '.join(condicoes)} "
+                "ORDER BY id DESC LIMIT ?",
+                [expressao] + parametros + [limite],
+            )
+            return [dict(r) for r in rows]
+
+    def listar_historico(self, limite=MAX_HISTORICO_ENTRIES):
+        """Retorna o histórico, do mais recente para o mais antigo."""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                "SELECT data, acao, resultado FROM historico ORDER BY id DESC LIMIT ?",
+                (limite,),
+            )
+            return [dict(r) for r in rows]
+
+    def pagina_historico(self, cursor=None, limite=HISTORICO_POR_PAGINA,
+                         tipos=None, excluir=False, de=None, ate=None):
+        """
+        Uma página do histórico por keyset (id < cursor), sem OFFSET.
+
+        Os filtros de tipo (GLOB por prefixo) e de data usam os índices
+        idx_historico_acao_data e idx_historico_data.
+
+        Args: ver RepositorioJSON.pagina_historico
+
+        Returns:
+            Tupla (entradas, cursor da próxima página ou None)
+        """
+        condicoes, parametros = _condicoes_historico(tipos, excluir, de, ate)
+        if cursor:
+            try:
+                parametros.append(int(cursor))
+                condicoes.append("id < ?")
+            except ValueError:
+                pass
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, data, acao, resultado FROM historico {where} "
+                "ORDER BY id DESC LIMIT ?",
+                parametros + [limite + 1],
+            ).fetchall()
+        proximo = str(rows[limite - 1]["id"]) if len(rows) > limite else None
+        return [
+            {"data": r["data"], "acao": r["acao"], "resultado": r["resultado"]}
+            for r in rows[:limite]
+        ], proximo
+
+    def limpar_historico(self):
+        """Apaga todo o histórico."""
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM historico")
+        return True
+
+    # --- Perfil ---
+
+    def carregar_perfil(self):
+        """Carrega o perfil (chave → valor JSON), criando o padrão se vazio."""
+        with self.get_connection() as conn:
+            rows = conn.execute("SELECT chave, valor FROM perfil").fetchall()
+            if rows:
+                return {r["chave"]: json.loads(r["valor"]) for r in rows}
+            perfil = utils.perfil_padrao()
+            conn.executemany(
+                "INSERT INTO perfil (chave, valor) VALUES (?, ?)",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in perfil.items()],
+            )
+            return perfil
+
+    def salvar_perfil(self, perfil):
+        """Grava apenas as chaves do perfil que mudaram (uma linha por chave)."""
+        with self.get_connection() as conn:
+            atuais = {
+                r["chave"]: r["valor"]
+                for r in conn.execute("SELECT chave, valor FROM perfil")
+            }
+            alteradas = []
+            for chave, valor in perfil.items():
+                serializado = json.dumps(valor, ensure_ascii=False)
+                if atuais.get(chave) != serializado:
+                    alteradas.append((chave, serializado))
+            conn.executemany(
+                "INSERT INTO perfil (chave, valor) VALUES (?, ?) "
+                "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+                alteradas,
+            )
+            removidas = [(c,) for c in atuais if c not in perfil]
+            conn.executemany("DELETE FROM perfil WHERE chave = ?", removidas)
+        return True
+
+    def apagar_perfil(self):
+        """Remove o perfil; o próximo carregamento recria o padrão."""
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM perfil")
+
+    # --- Versões ---
+
+    def versoes(self):
+        """Versões dos dados (cache de fragmentos), mantidas pela migração 7."""
+        with self.get_connection() as conn:
+            return {r["area"]: r["valor"] for r in conn.execute("SELECT area, valor FROM versoes")}
+
+
+def _assinatura(caminho):
+    """Assinatura do arquivo (ver utils.CacheArquivos), ou () se não existe."""
+    try:
+        return utils.CacheArquivos.assinatura(caminho)
+    except FileNotFoundError:
+        return ()
+
+
+def _extrair_registros(missao):
+    """
+    Tira da missão os registros de progresso no formato antigo ("registros":
+    [{"data": ...}]) e os soma ao resumo "progresso" (utils.somar_progresso).
+
+    Returns:
+        Lista das datas dos registros, para o store de progresso
+    """
+    registros = missao.pop("registros", None) or []
+    datas = [r["data"] for r in registros if isinstance(r, dict) and r.get("data")]
+    if datas:
+        missao["progresso"] = utils.somar_progresso(missao.get("progresso"), datas)
+    return datas
+
+
+def _progresso_completo(resumo, dias, recentes):
+    """Junta as contagens compactadas e os registros recentes de uma missão."""
+    resumo = resumo or {}
+    dias = dict(dias)
+    for data in recentes:
+        dias[data[:10]] = dias.get(data[:10], 0) + 1
+    return {
+        "total": resumo.get("total", 0),
+        "ultimo": resumo.get("ultimo"),
+        "dias": dict(sorted(dias.items())),
+        "recentes": recentes,
+    }
+
+
+def _chaves_contador(missao):
+    """Chaves de contador às quais uma missão (como gravada, com tag_id) contribui."""
+    chaves = ["total", f"status:{missao.get('status', 'aberta')}"]
+    if missao.get("tag_id"):
+        chaves.append(f"tag:{missao['tag_id']}")
+    return chaves
+
+
+def _resolver_tag(tag_id, por_id):
+    """Registro atual da tag `tag_id`, seguindo mesclagens; None se não existe."""
+    tag = por_id.get(tag_id)
+    while tag is not None and "mesclada_em" in tag:
+        tag = por_id.get(tag["mesclada_em"])
+    return tag
+
+
+def _divergencias(mantidos, reais):
+    """Compara dois mapeamentos chave → contagem; retorna só as diferenças."""
+    return {
+        chave: {"mantido": mantidos.get(chave, 0), "real": reais.get(chave, 0)}
+        for chave in sorted(set(mantidos) | set(reais))
+        if mantidos.get(chave, 0) != reais.get(chave, 0)
+    }
+
+
+def _intervalo_datas(de, ate):
+    """
+    Converte datas "AAAA-MM-DD" inclusivas em limites [inicio, fim) comparáveis
+    com o campo "data" das entradas ("AAAA-MM-DD HH:MM"). Datas inválidas são
+    ignoradas.
+    """
+    def converter(valor):
+        try:
+            return date.fromisoformat(valor) if valor else None
+        except ValueError:
+            return None
+
+    inicio, fim = converter(de), converter(ate)
+    return (
+        inicio.isoformat() if inicio else None,
+        (fim + timedelta(days=1)).isoformat() if fim else None,
+    )
+
+
+def _textos_busca(missao):
+    """Campos buscáveis de uma missão (com a tag resolvida): título e nome da tag."""
+    return missao.get("titulo"), (missao.get("tag") or {}).get("nome")
+
+
+def _filtro_historico(tipos, excluir, de, ate):
+    """Predicado com os filtros de tipo e período de pagina_historico."""
+    inicio, fim = _intervalo_datas(de, ate)
+
+    def passa(entrada):
+        data = entrada.get("data", "")
+        if (inicio and data < inicio) or (fim and data >= fim):
+            return False
+        return not (tipos and entrada.get("acao", "").startswith(tuple(tipos)) == excluir)
+
+    return passa
+
+
+def _condicoes_historico(tipos, excluir, de, ate):
+    """Cláusulas WHERE (e parâmetros) com os filtros de tipo e período do histórico."""
+    condicoes, parametros = [], []
+    if tipos:
+        globs = " OR ".join("acao GLOB ?" for _ in tipos)
+        condicoes.append(f"NOT ({globs})" if excluir else f"({globs})")
+        parametros.extend(f"{t}*" for t in tipos)
+    inicio, fim = _intervalo_datas(de, ate)
+    if inicio:
+        condicoes.append("data >= ?")
+        parametros.append(inicio)
+    if fim:
+        condicoes.append("data < ?")
+        parametros.append(fim)
+    return condicoes, parametros
+
+
+def _montar_estatisticas(contadores, nomes_tags):
+    """
+    Monta o dict de métricas exibido no dashboard a partir dos contadores.
+
+    Args:
+        contadores: Dict chave → contagem (ver Contadores)
+        nomes_tags: Dict id da tag → nome; por_tag é agrupado por nome e
+            ignora IDs de tags apagadas
+    """
+    total = contadores.get("total", 0)
+    concluidas = contadores.get("status:concluída", 0)
+    por_tag = Counter()
+    for chave, valor in contadores.items():
+        if chave.startswith("tag:") and chave[4:] in nomes_tags:
+            por_tag[nomes_tags[chave[4:]]] += valor
+    return {
+        "total": total,
+        "concluidas": concluidas,
+        "abertas": total - concluidas,
+        "percentual": round((concluidas / total) * 100, 1) if total > 0 else 0,
+        "por_status": {
+            k.split(":", 1)[1]: v for k, v in contadores.items() if k.startswith("status:")
+        },
+        "por_tag": dict(por_tag),
+    }
+
+
+def _destino_por_direcao(posicao, direcao):
+    """Posição vizinha para "cima"/"baixo", ou None se não houver."""
+    if posicao is None:
+        return None
+    destino = posicao - 1 if direcao == "cima" else posicao + 1 if direcao == "baixo" else -1
+    return destino if destino >= 0 else None
+
+
+def _publicar_status(missoes, campos):
+    """Publica (eventos ao vivo) o status das missões se `campos` o altera."""
+    if "status" in campos and missoes:
+        utils.publicar_evento(
+            "missoes", [{"id": m["id"], "status": m["status"]} for m in missoes]
+        )
+
+
+def _aplicar_campos(missao, campos):
+    """Aplica `campos` em uma missão (dict); valor None remove a chave."""
+    for campo, valor in campos.items():
+        if valor is None:
+            missao.pop(campo, None)
+        else:
+            missao[campo] = valor
+
+
+def _colunas_atualizacao(campos):
+    """
+    Converte `campos` nas atribuições do UPDATE de missoes e seus parâmetros.
+
+    A tag já deve vir como "tag_id" (ver RepositorioSQLite._id_da_tag).
+    """
+    colunas = []
+    params = []
+    for campo, valor in campos.items():
+        if campo == "tag_id":
+            colunas.append("tag_id = ?")
+            params.append(valor)
+        elif campo == "progresso":
+            colunas.append("progresso = ?")
+            params.append(json.dumps(valor, ensure_ascii=False) if valor else None)
+        elif campo in ("titulo", "status", "data_criacao"):
+            colunas.append(f"{campo} = ?")
+            params.append(valor)
+    return colunas, params
+
+
+def _linha_para_missao(row):
+    """Converte uma linha de _SELECT_MISSAO no dict usado pelos templates."""
+    missao = {
+        "id": row["uid"],
+        "ordem": row["posicao"],
+        "titulo": row["titulo"],
+        "status": row["status"],
+        "data_criacao": row["data_criacao"],
+    }
+    if row["nome_tag"]:
+        missao["tag"] = {"id": row["tag_id"], "nome": row["nome_tag"], "cor": row["cor_tag"]}
+    if row["progresso"]:
+        missao["progresso"] = json.loads(row["progresso"])
+    return missao
+
+
+def _missao_para_parametros(missao, tag_id):
+    """Converte um dict de missão (e o ID da sua tag) nos parâmetros do INSERT."""
+    return (
+        missao.get("id") or utils.gerar_id_missao(),
+        missao["titulo"],
+        missao.get("status", "aberta"),
+        missao.get("data_criacao"),
+        tag_id,
+        json.dumps(missao["progresso"], ensure_ascii=False) if missao.get("progresso") else None,
+    )
+
+
+_repositorio = None
+_repositorio_lock = threading.Lock()
+
+
+def get_repositorio():
+    """
+    Retorna instância singleton do repositório configurado.
+
+    Returns:
+        RepositorioJSON ou RepositorioSQLite, conforme STORAGE_BACKEND
+    """
+    global _repositorio
+    if _repositorio is None:
+        with _repositorio_lock:
+            if _repositorio is None:
+                if STORAGE_BACKEND == "sqlite":
+                    _repositorio = RepositorioSQLite()
+                else:
+                    _repositorio = RepositorioJSON()
+    return _repositorio
+
+
+def migrar_json_para_sqlite(db_path=DATABASE_PATH, substituir=False):
+    """
+    Copia missões, tags, progresso, histórico e perfil dos arquivos JSON para o SQLite.
+
+    Operação única: recusa sobrescrever um banco que já tem missões, a menos
+    que `substituir` seja True. Tudo acontece em uma única transação.
+
+    Args:
+        db_path: Caminho do banco de destino
+        substituir: Apaga os dados existentes no banco antes de importar
+
+    Returns:
+        Dict com a quantidade de missões, tags, registros de progresso, logs
+        e chaves de perfil migradas
+    """
+    origem = RepositorioJSON()
+    destino = RepositorioSQLite(db_path)
+
+    missoes = origem.listar_missoes()
+    tags = origem.listar_tags()
+    logs = origem.listar_historico()
+    perfil = utils.carregar_json_dict(PERFIL_PATH) if os.path.exists(PERFIL_PATH) else {}
+    ids = {m["id"] for m in missoes}
+    eventos = [
+        (e["missao"], e["data"]) for e in utils.ler_jsonl(PROGRESSO_EVENTOS_PATH)
+        if e.get("missao") in ids and e.get("data")
+    ]
+    diario = [
+        (missao_id, dia, quantidade)
+        for missao_id, dias in origem._carregar_diario().items() if missao_id in ids
+        for dia, quantidade in dias.items()
+    ]
+
+    with destino.get_connection() as conn:
+        ja_tem = conn.execute("SELECT COUNT(*) FROM missoes").fetchone()[0]
+        if ja_tem and not substituir:
+            raise RuntimeError(
+                f"{db_path} já contém {ja_tem} missões; use substituir=True para sobrescrever"
+            )
+        conn.execute("DELETE FROM missoes")
+        conn.execute("DELETE FROM tags")
+        conn.execute("DELETE FROM historico")
+        conn.execute("DELETE FROM perfil")
+
+        conn.executemany("INSERT INTO tags (id, nome, cor) VALUES (:id, :nome, :cor)", tags)
+        conn.executemany(
+            _INSERIR_MISSAO,
+            [
+                (m.get("ordem", pos * ORDEM_PASSO),) + _missao_para_parametros(m, (m.get("tag") or {}).get("id"))
+                for pos, m in enumerate(missoes, start=1)
+            ],
+        )
+        conn.executemany("INSERT INTO progresso (missao_uid, data) VALUES (?, ?)", eventos)
+        conn.executemany(
+            "INSERT INTO progresso_diario (missao_uid, dia, quantidade) VALUES (?, ?, ?)", diario
+        )
+        # O JSON guarda o mais recente primeiro; no banco o id cresce com o tempo
+        conn.executemany(
+            "INSERT INTO historico (data, acao, resultado) VALUES (?, ?, ?)",
+            [(l.get("data", ""), l.get("acao", ""), l.get("resultado", "")) for l in reversed(logs)],
+        )
+        conn.executemany(
+            "INSERT INTO perfil (chave, valor) VALUES (?, ?)",
+            [(k, json.dumps(v, ensure_ascii=False)) for k, v in perfil.items()],
+        )
+
+    return {
+        "missoes": len(missoes), "tags": len(tags), "progresso": len(eventos),
+        "historico": len(logs), "perfil": len(perfil),
+    }
+
+
+if __name__ == "__main__":
+    # Uso: python database.py migrar [--substituir]
+    #      python database.py contadores [--corrigir]
+    #      python database.py progresso
+    if len(sys.argv) >= 2 and sys.argv[1] == "contadores":
+        corrigir = "--corrigir" in sys.argv
+        repositorio = get_repositorio()
+        if isinstance(repositorio, RepositorioJSON):
+            # Sem estado mantido neste processo: só o servidor pode conferir
+            # os seus (verificar_contadores)
+            print("No JSON os contadores ficam na memória do servidor e são "
+                  "recalculados ao carregar missoes.json; nada a conferir aqui.")
+            sys.exit(0)
+        divergencias = repositorio.verificar_contadores(corrigir=corrigir)
+        if not divergencias:
+            print("Contadores consistentes.")
+        for chave, valores in divergencias.items():
+            print(f"{chave}: mantido={valores['mantido']} real={valores['real']}")
+        if divergencias:
+            print("Contadores corrigidos." if corrigir else "Use --corrigir para recalcular.")
+            sys.exit(0 if corrigir else 1)
+    elif len(sys.argv) >= 2 and sys.argv[1] == "progresso":
+        with utils.unidade_de_trabalho():
+            compactados = get_repositorio().compactar_progresso()
+        print(f"{compactados} registro(s) de progresso compactado(s) em contagens diárias.")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "migrar":
+        try:
+            resultado = migrar_json_para_sqlite(substituir="--substituir" in sys.argv)
+        except RuntimeError as e:
+            print(f"Erro: {e}")
+            sys.exit(1)
+        print(
+            f"Migrados: {resultado['missoes']} missões, {resultado['tags']} tags, "
+            f"{resultado['progresso']} registros de progresso, "
+            f"{resultado['historico']} entradas de histórico, "
+            f"{resultado['perfil']} chaves de perfil → {DATABASE_PATH}"
+        )
+        print("Defina FURY_STORAGE=sqlite para usar o banco.")
+    else:
+        print("Uso: python database.py migrar [--substituir] | contadores [--corrigir] | progresso")
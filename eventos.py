@@ -0,0 +1,278 @@
+"""Eventos ao Vivo - FuryCelula
+
+Hub pub/sub em memória e GET /eventos (Server-Sent Events): as abas abertas
+recebem as alterações assim que são gravadas e atualizam a página sem
+recarregar.
+
+- perfil: só os campos de CAMPOS_PERFIL que mudaram, mais "subiu_nivel"
+  quando o nível aumenta.
+- estatisticas: contadores do dashboard, após requisições que alteram dados.
+- missoes: [{"id", "status"}] das missões que mudaram de status.
+- historico: cada nova entrada do log.
+
+utils publica no fim da unidade de trabalho, depois que as gravações deram
+certo (fora de uma sessão, na hora). O hub é do processo: com vários workers
+do gunicorn, cada aba só recebe o que foi gravado no worker em que está
+conectada. Quem reconecta (Last-Event-ID) recebe os eventos perdidos, se
+ainda estiverem entre os EVENTOS_RECENTES; senão, um "recarregar".
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from flask import Response, request
+
+from config import (
+    EVENTOS_ATIVOS,
+    EVENTOS_MAX_CONEXOES,
+    EVENTOS_PING_SEGUNDOS,
+    EVENTOS_RECENTES,
+    EVENTOS_FILA_MAX
+)
+
+CAMPOS_PERFIL = ("nivel", "xp", "xp_proximo_nivel", "moedas")
+CAMPOS_ESTATISTICAS = ("total", "concluidas", "abertas", "percentual")
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão; esvazia e marca `atrasada` se encher."""
+
+    def __init__(self, limite):
+        self._eventos = deque()
+        self._cond = threading.Condition()
+        self._limite = limite
+        self.atrasada = False
+        self.encerrada = False
+
+    def entregar(self, evento):
+        with self._cond:
+            if len(self._eventos) >= self._limite:
+                # Cliente lento: em vez de acumular, manda recarregar a página
+                self._eventos.clear()
+                self.atrasada = True
+            elif not self.atrasada:
+                self._eventos.append(evento)
+            self._cond.notify()
+
+    def encerrar(self):
+        with self._cond:
+            self.encerrada = True
+            self._cond.notify()
+
+    def proximos(self, espera):
+        """Eventos pendentes, esperando até `espera` segundos se não houver."""
+        with self._cond:
+            if not self._eventos and not self.atrasada and not self.encerrada:
+                self._cond.wait(espera)
+            eventos = list(self._eventos)
+            self._eventos.clear()
+            return eventos
+
+
+class Hub:
+    """
+    Distribui eventos (id, tipo, dados) às assinaturas abertas.
+
+    Os IDs são "<época>-<n>": a época muda a cada processo, então um
+    Last-Event-ID de outro processo (reinício, outro worker) não é
+    confundido com um deste.
+    """
+
+    def __init__(self, recentes=EVENTOS_RECENTES):
+        self._tamanho_recentes = recentes
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Estado vazio e nova época (no processo filho após um fork)."""
+        self._lock = threading.Lock()
+        self._assinaturas = set()
+        self._recentes = deque(maxlen=self._tamanho_recentes)
+        self._estados = {}
+        self._epoca = f"{os.getpid():x}{int(time.time() * 1000):x}"
+        self._ultimo = 0
+
+    def ha_assinantes(self):
+        return bool(self._assinaturas)
+
+    def assinar(self, ultimo_id=None, maximo=EVENTOS_MAX_CONEXOES, limite=EVENTOS_FILA_MAX):
+        """
+        Abre uma assinatura.
+
+        Args:
+            ultimo_id: Last-Event-ID enviado pelo navegador ao reconectar
+            maximo: Assinaturas abertas ao mesmo tempo
+            limite: Eventos pendentes por assinatura
+
+        Returns:
+            (assinatura, eventos perdidos desde `ultimo_id`, ou None se não
+            dá para saber quais foram e a página precisa recarregar), ou
+            None se já há `maximo` assinaturas
+        """
+        assinatura = Assinatura(limite)
+        with self._lock:
+            if len(self._assinaturas) >= maximo:
+                return None
+            self._assinaturas.add(assinatura)
+            perdidos = self._desde(ultimo_id) if ultimo_id else []
+        return assinatura, perdidos
+
+    def _desde(self, ultimo_id):
+        epoca, _, numero = ultimo_id.partition("-")
+        if epoca != self._epoca or not numero.isdigit():
+            return None
+        numero = int(numero)
+        if numero == self._ultimo:
+            return []
+        if not self._recentes or numero < self._recentes[0][0] - 1 or numero > self._ultimo:
+            return None
+        return [evento for evento in self._recentes if evento[0] > numero]
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def encerrar(self):
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura.encerrar()
+
+    def publicar(self, tipo, dados):
+        """Entrega um evento a todas as assinaturas (sem assinantes, não faz nada)."""
+        if not self._assinaturas:
+            return
+        with self._lock:
+            self._ultimo += 1
+            evento = (self._ultimo, tipo, dados)
+            self._recentes.append(evento)
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura.entregar(evento)
+
+    def atualizar_estado(self, tipo, valores):
+        """
+        Guarda o último estado de `tipo` (mesmo sem assinantes: o primeiro
+        evento depois de uma conexão ainda é um delta).
+
+        Returns:
+            (estado anterior, dict só com os valores que mudaram)
+        """
+        with self._lock:
+            anterior = self._estados.get(tipo, {})
+            self._estados[tipo] = dict(valores)
+        return anterior, {k: v for k, v in valores.items() if anterior.get(k) != v}
+
+    def id_evento(self, numero):
+        return f"{self._epoca}-{numero}"
+
+
+_hub = Hub()
+if hasattr(os, "register_at_fork"):
+    # Workers do gunicorn (preload): cada um começa com o próprio hub
+    os.register_at_fork(after_in_child=_hub.reiniciar)
+
+
+def ha_assinantes():
+    """True se há alguma aba conectada a este processo."""
+    return EVENTOS_ATIVOS and _hub.ha_assinantes()
+
+
+def encerrar():
+    """
+    Fecha os fluxos abertos (servidor saindo): sem isso cada aba conectada
+    prende o encerramento até o tempo limite. Os navegadores reconectam.
+    """
+    _hub.encerrar()
+
+
+def publicar(tipo, dados):
+    """Publica um evento para as abas conectadas (sem efeito se desativado)."""
+    if EVENTOS_ATIVOS:
+        _hub.publicar(tipo, dados)
+
+
+def publicar_perfil(perfil):
+    """Publica o delta dos campos do perfil exibidos nas páginas."""
+    if not EVENTOS_ATIVOS:
+        return
+    anterior, delta = _hub.atualizar_estado(
+        "perfil", {campo: perfil.get(campo) for campo in CAMPOS_PERFIL}
+    )
+    if not delta:
+        return
+    if anterior.get("nivel") is not None and (delta.get("nivel") or 0) > anterior["nivel"]:
+        delta["subiu_nivel"] = True
+    _hub.publicar("perfil", delta)
+
+
+def publicar_estatisticas(estatisticas):
+    """Publica o delta dos contadores do dashboard."""
+    if not EVENTOS_ATIVOS:
+        return
+    _, delta = _hub.atualizar_estado(
+        "estatisticas", {campo: estatisticas.get(campo) for campo in CAMPOS_ESTATISTICAS}
+    )
+    if delta:
+        _hub.publicar("estatisticas", delta)
+
+
+# --- Server-Sent Events ---
+
+def _formatar(evento):
+    numero, tipo, dados = evento
+    return (
+        f"id: {_hub.id_evento(numero)}\nevent: {tipo}\n"
+        f"data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+    )
+
+
+def _fluxo(assinatura, perdidos):
+    try:
+        # Se a conexão cair, o navegador reconecta depois de 2 s
+        yield "retry: 2000\n\n"
+        if perdidos is None:
+            yield "event: recarregar\ndata: {}\n\n"
+            return
+        for evento in perdidos:
+            yield _formatar(evento)
+        while True:
+            eventos = assinatura.proximos(EVENTOS_PING_SEGUNDOS)
+            if assinatura.atrasada:
+                yield "event: recarregar\ndata: {}\n\n"
+                return
+            if assinatura.encerrada:
+                return
+            if not eventos:
+                # Comentário: mantém proxies abertos e detecta a aba fechada
+                # (a escrita falha e o servidor fecha o gerador)
+                yield ": ping\n\n"
+            for evento in eventos:
+                yield _formatar(evento)
+    finally:
+        _hub.cancelar(assinatura)
+
+
+def _rota_eventos():
+    """GET /eventos: fluxo text/event-stream com os eventos deste processo."""
+    aberta = _hub.assinar(request.headers.get("Last-Event-ID"))
+    if aberta is None:
+        # Cada conexão prende uma thread do servidor; a aba segue sem ao vivo
+        return Response(
+            "Conexões de eventos esgotadas\n", status=503, mimetype="text/plain",
+            headers={"Retry-After": "60"},
+        )
+    assinatura, perdidos = aberta
+    return Response(
+        _fluxo(assinatura, perdidos),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def configurar(app):
+    """Registra GET /eventos e expõe `eventos_ativos` aos templates."""
+    app.jinja_env.globals["eventos_ativos"] = EVENTOS_ATIVOS
+    if EVENTOS_ATIVOS:
+        app.add_url_rule("/eventos", "eventos", _rota_eventos)
@@ -0,0 +1,211 @@
+"""Cache de Templates - FuryCelula
+
+Duas camadas para não refazer trabalho de template a cada requisição:
+
+- Fragmentos: {% fragmento "nome", chave1, chave2... %}...{% endfragmento %}
+  guarda em memória o HTML renderizado do bloco. As chaves são versões dos
+  dados que o bloco lê (ver utils.versoes_dados) ou os próprios valores
+  lidos; quando mudam, o bloco é renderizado de novo. Uma chave None
+  (alteração ainda não gravada) faz o bloco ser renderizado sem cache.
+- Bytecode: os templates compilados ficam em TEMPLATES_CACHE_DIR e são
+  reaproveitados entre execuções; o build pode gerá-los antes
+  (python fragmentos.py compilar), então nem a primeira requisição compila.
+
+Uso: python fragmentos.py compilar
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from config import BASE_DIR, FRAGMENTOS_MAX, TEMPLATES_CACHE_DIR
+
+
+class CacheFragmentos:
+    """HTML de fragmentos renderizados, por chave, limitado a `max_entradas` (LRU)."""
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave):
+        """Retorna o HTML guardado em `chave`, ou None."""
+        with self._lock:
+            html = self._entradas.get(chave)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.hits += 1
+            return html
+
+    def guardar(self, chave, html):
+        """Guarda o HTML de um fragmento, descartando os menos usados."""
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[chave] = html
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self):
+        """Esvazia o cache."""
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """Retorna dict com hits, misses, taxa de acerto e ocupação."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+            }
+
+
+def _congelar(valor):
+    """Torna uma parte da chave hashable (listas → tuplas, dicts → tuplas ordenadas)."""
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    return valor
+
+
+class ExtensaoFragmentos(Extension):
+    """Tag {% fragmento %} do Jinja (o cache fica em environment.cache_fragmentos)."""
+
+    tags = {"fragmento"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(cache_fragmentos=CacheFragmentos(FRAGMENTOS_MAX))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            partes.append(parser.parse_expression())
+        corpo = parser.parse_statements(("name:endfragmento",), drop_needle=True)
+        chamada = self.call_method("_renderizar", [nodes.Const(parser.name), nodes.List(partes)])
+        return nodes.CallBlock(chamada, [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, template, partes, caller):
+        if any(parte is None for parte in partes):
+            return caller()
+        chave = (template,) + _congelar(partes)
+        cache = self.environment.cache_fragmentos
+        html = cache.obter(chave)
+        if html is None:
+            html = caller()
+            cache.guardar(chave, html)
+        return html
+
+
+class Adiado:
+    """
+    Sequência calculada só no primeiro uso (iteração, len, bool...).
+
+    Passada a um template no lugar de uma lista: se o bloco que a percorre
+    vem do cache de fragmentos, a consulta aos dados nem acontece.
+
+    Com `uma_passada`, iterar consome o gerador de `funcao` direto, sem
+    guardar a lista (para um único {% for %} sobre muitos registros); len e
+    índice ainda montam a lista.
+    """
+
+    def __init__(self, funcao, uma_passada=False):
+        self._funcao = funcao
+        self._uma_passada = uma_passada
+        self._valor = None
+
+    def _obter(self):
+        if self._valor is None:
+            self._valor = list(self._funcao())
+        return self._valor
+
+    def __iter__(self):
+        if self._uma_passada and self._valor is None:
+            return iter(self._funcao())
+        return iter(self._obter())
+
+    def __len__(self):
+        return len(self._obter())
+
+    def __getitem__(self, i):
+        return self._obter()[i]
+
+
+class CacheBytecode(FileSystemBytecodeCache):
+    """
+    Bytecode dos templates em disco, indexado só pelo nome do template.
+
+    O FileSystemBytecodeCache padrão inclui o caminho absoluto na chave;
+    sem ele o cache gerado no build continua valendo onde o executável for
+    extraído (o checksum do código-fonte ainda invalida templates alterados).
+    Falhas de gravação (ex: pasta somente leitura) só deixam de cachear.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name)
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def configurar(app):
+    """Ativa o cache de fragmentos e o de bytecode no ambiente Jinja do app."""
+    app.jinja_env.add_extension(ExtensaoFragmentos)
+    if TEMPLATES_CACHE_DIR:
+        try:
+            os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+        except OSError:
+            return
+        app.jinja_env.bytecode_cache = CacheBytecode(TEMPLATES_CACHE_DIR)
+
+
+def compilar(ambiente):
+    """
+    Compila todos os templates, gravando o bytecode no cache.
+
+    Returns:
+        Número de templates compilados
+    """
+    nomes = ambiente.list_templates(extensions=["html"])
+    for nome in nomes:
+        ambiente.get_template(nome)
+    return len(nomes)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["compilar"]:
+        if not TEMPLATES_CACHE_DIR:
+            print("Cache de bytecode desativado (FURY_TEMPLATES_CACHE vazio).")
+            sys.exit(1)
+        from flask import Flask
+        # Pelo módulo importado, não por __main__: o bytecode referencia a
+        # extensão pelo nome qualificado ("fragmentos.ExtensaoFragmentos")
+        from fragmentos import compilar, configurar
+
+        # Mesmo ambiente Jinja do app (extensões, autoescape), sem carregar dados
+        app_templates = Flask("app", root_path=BASE_DIR)
+        configurar(app_templates)
+        # Recompila tudo: bytecode antigo com checksum válido seria reaproveitado
+        app_templates.jinja_env.bytecode_cache.clear()
+        total = compilar(app_templates.jinja_env)
+        print(f"{total} template(s) compilado(s) em {TEMPLATES_CACHE_DIR}")
+    else:
+        print("Uso: python fragmentos.py compilar")
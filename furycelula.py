@@ -0,0 +1,189 @@
+"""Servidor de Produção - FuryCelula
+
+Serve o app com um servidor WSGI de produção em vez do servidor de
+desenvolvimento do Flask (python app.py):
+
+- gunicorn: FURY_WORKERS processos com FURY_THREADS threads cada. O app e
+  os dados (missões, tags, perfil, templates compilados) são carregados uma
+  vez no processo principal antes do fork e compartilhados com os workers.
+- waitress: um processo com FURY_THREADS threads (funciona no Windows).
+
+As requisições que alteram dados mantêm a trava de data/ (TRAVA_PATH)
+durante todo o ciclo ler-alterar-gravar, então workers concorrentes não
+perdem gravações. As que só leem não esperam a trava: leem os dados
+publicados no cache, que as sessões exclusivas nunca alteram (trabalham em
+cópias, publicadas só depois de gravadas). SIGTERM/SIGINT param de aceitar conexões, esperam as
+requisições em andamento (no gunicorn, até FURY_TEMPO_ENCERRAMENTO
+segundos) e gravam o que estiver pendente antes de sair.
+
+Uso: python -m furycelula serve [--host H] [--porta P] [--workers N]
+         [--threads N] [--servidor gunicorn|waitress]
+"""
+import argparse
+import gc
+import importlib.util
+import os
+import signal
+import sys
+
+import eventos
+from config import (
+    FLASK_SECRET_KEY,
+    PERFIL_WRITE_BEHIND_SEGUNDOS,
+    SERVIDOR,
+    SERVIDOR_HOST,
+    SERVIDOR_PORTA,
+    SERVIDOR_WORKERS,
+    SERVIDOR_THREADS,
+    SERVIDOR_TEMPO_ENCERRAMENTO
+)
+
+
+def escolher_servidor(preferido=SERVIDOR):
+    """
+    Servidor a usar: o pedido, ou em "auto" o gunicorn se estiver instalado
+    (e não for Windows), senão o waitress.
+
+    Raises:
+        SystemExit: Se o servidor necessário não está instalado
+    """
+    if preferido == "auto":
+        if os.name != "nt" and importlib.util.find_spec("gunicorn") is not None:
+            return "gunicorn"
+        preferido = "waitress"
+    if preferido not in ("gunicorn", "waitress"):
+        raise SystemExit(f"Servidor desconhecido: {preferido} (use gunicorn ou waitress)")
+    if importlib.util.find_spec(preferido) is None:
+        raise SystemExit(f"{preferido} não está instalado: pip install {preferido}")
+    return preferido
+
+
+def carregar_app():
+    """
+    Importa o app e deixa na memória o que todas as requisições usam:
+    missões (e seus índices), tags, perfil e templates compilados.
+
+    Returns:
+        O app Flask
+    """
+    from app import app, repo
+    from fragmentos import compilar
+    import utils
+
+    repo.listar_tags()
+    repo.listar_missoes()
+    repo.estatisticas()
+    utils.carregar_perfil()
+    compilar(app.jinja_env)
+    return app
+
+
+def encerrar():
+    """Grava o perfil pendente (write-behind) e fecha a conexão do banco."""
+    from database import get_repositorio
+    import utils
+
+    utils.descarregar_perfil()
+    get_repositorio().fechar()
+
+
+def _preparar_worker(worker):
+    """SIGTERM no worker do gunicorn: fecha os fluxos de eventos antes de sair."""
+    sair = worker.handle_exit
+
+    def ao_encerrar(sinal, quadro):
+        eventos.encerrar()
+        sair(sinal, quadro)
+
+    signal.signal(signal.SIGTERM, ao_encerrar)
+
+
+def servir_gunicorn(app, host, porta, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class AplicacaoGunicorn(BaseApplication):
+        """App já carregado (preload): os workers herdam a memória do processo principal."""
+
+        def load_config(self):
+            opcoes = {
+                "bind": f"{host}:{porta}",
+                "workers": workers,
+                "threads": threads,
+                "worker_class": "gthread" if threads > 1 else "sync",
+                "preload_app": True,
+                "graceful_timeout": SERVIDOR_TEMPO_ENCERRAMENTO,
+                "post_worker_init": _preparar_worker,
+                "worker_exit": lambda servidor, worker: encerrar(),
+            }
+            for chave, valor in opcoes.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            return app
+
+    # Nada de conexão SQLite aberta atravessando o fork
+    from database import get_repositorio
+    get_repositorio().fechar()
+    # Objetos carregados ficam fora do GC: os workers não tocam nessas
+    # páginas e elas continuam compartilhadas (copy-on-write)
+    gc.freeze()
+    AplicacaoGunicorn().run()
+
+
+def servir_waitress(app, host, porta, threads):
+    import waitress
+
+    # SIGTERM vira SystemExit: o waitress espera as requisições em
+    # andamento (os fluxos de eventos são fechados) e retorna, e os dados
+    # pendentes são gravados
+    def ao_encerrar(*_):
+        eventos.encerrar()
+        sys.exit(0)
+
+    if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, ao_encerrar)
+    try:
+        waitress.serve(app, host=host, port=porta, threads=threads)
+    finally:
+        encerrar()
+
+
+def serve(host, porta, workers, threads, servidor):
+    """Sobe o servidor de produção (bloqueia até o encerramento)."""
+    servidor = escolher_servidor(servidor)
+    if servidor == "gunicorn" and workers > 1 and PERFIL_WRITE_BEHIND_SEGUNDOS > 0:
+        # O perfil pendente fica na memória de um worker: os outros não o veem
+        raise SystemExit("FURY_PERFIL_WRITE_BEHIND exige um único worker (FURY_WORKERS=1)")
+    if FLASK_SECRET_KEY == "dev-secret-key-change-in-prod":
+        print("Aviso: defina SECRET_KEY (a chave de desenvolvimento é pública)")
+
+    app = carregar_app()
+    if servidor == "gunicorn":
+        print(f"gunicorn em http://{host}:{porta} ({workers} worker(s) x {threads} thread(s))")
+        servir_gunicorn(app, host, porta, workers, threads)
+    else:
+        if workers > 1:
+            print("waitress usa um único processo: FURY_WORKERS ignorado")
+        print(f"waitress em http://{host}:{porta} ({threads} thread(s))")
+        servir_waitress(app, host, porta, threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FuryCelula")
+    comandos = parser.add_subparsers(dest="comando")
+    serve_parser = comandos.add_parser("serve", help="servidor WSGI de produção")
+    serve_parser.add_argument("--host", default=SERVIDOR_HOST)
+    serve_parser.add_argument("--porta", type=int, default=SERVIDOR_PORTA)
+    serve_parser.add_argument("--workers", type=int, default=SERVIDOR_WORKERS)
+    serve_parser.add_argument("--threads", type=int, default=SERVIDOR_THREADS)
+    serve_parser.add_argument("--servidor", default=SERVIDOR)
+    args = parser.parse_args()
+
+    if args.comando != "serve":
+        parser.print_help()
+        sys.exit(1)
+    serve(args.host, args.porta, max(1, args.workers), max(1, args.threads), args.servidor.lower())
+
+
+if __name__ == "__main__":
+    main()
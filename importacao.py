@@ -0,0 +1,278 @@
+"""Importação e Exportação - FuryCelula
+
+Importa missões de CSV ou JSON Lines e exporta missões e histórico nos
+mesmos formatos, sempre em streaming: a entrada é lida e validada em blocos
+de IMPORTACAO_LOTE linhas e a saída é gerada linha a linha, sem montar a
+lista inteira na memória.
+
+Uso: python importacao.py importar <arquivo.csv|arquivo.jsonl> [--estrito]
+     python importacao.py exportar missoes|historico [--formato csv|jsonl]
+"""
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from config import IMPORTACAO_LOTE, IMPORTACAO_MAX_ERROS, PROGRESSO_DIAS_RESUMO
+from database import get_repositorio
+import utils
+
+FORMATOS_TRANSFERENCIA = ("csv", "jsonl")
+
+CAMPOS_MISSAO = ["id", "titulo", "status", "tag_nome", "tag_cor", "data_criacao", "progresso"]
+CAMPOS_HISTORICO = ["data", "acao", "resultado"]
+
+# Entradas do histórico lidas por página na exportação
+_PAGINA_EXPORTACAO = 500
+
+
+def formato_do_arquivo(nome, padrao="csv"):
+    """Formato ("csv" ou "jsonl") pela extensão do arquivo."""
+    extensao = os.path.splitext(nome or "")[1].lower().lstrip(".")
+    if extensao in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extensao == "csv":
+        return "csv"
+    return padrao
+
+
+# --- Importação ---
+
+def ler_linhas(arquivo, formato):
+    """
+    Percorre um arquivo texto de missões linha a linha.
+
+    Yields:
+        Tuple (numero_linha, registro: dict ou None, erro: str ou None)
+    """
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        if not leitor.fieldnames or "titulo" not in leitor.fieldnames:
+            yield 1, None, "Cabeçalho CSV sem a coluna 'titulo'"
+            return
+        for registro in leitor:
+            yield leitor.line_num, registro, None
+        return
+
+    for numero, linha in enumerate(arquivo, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Linha não é um objeto JSON"
+            continue
+        yield numero, registro, None
+
+
+def registro_para_missao(registro):
+    """
+    Valida um registro importado (título, status, tag, progresso).
+
+    O progresso vem como resumo ("progresso", como na exportação) ou, no
+    formato antigo, como a lista "registros" ([{"data": ...}]), que o
+    repositório leva para o store de progresso.
+
+    Returns:
+        Tuple (missao: dict ou None, erro: str)
+    """
+    tag = registro.get("tag")
+    if not isinstance(tag, dict):
+        nome, cor = registro.get("tag_nome"), registro.get("tag_cor")
+        tag = {"nome": nome, "cor": cor} if nome and cor else None
+    elif not (tag.get("nome") and tag.get("cor")):
+        tag = None
+
+    sucesso, missao, erro = utils.criar_missao(str(registro.get("titulo") or "").strip(), tag)
+    if not sucesso:
+        return None, erro
+
+    if registro.get("status"):
+        valido, status = utils.validar_status(registro["status"])
+        if not valido:
+            return None, f"Status inválido: {registro['status']}"
+        missao["status"] = status
+    if registro.get("data_criacao"):
+        missao["data_criacao"] = str(registro["data_criacao"])
+
+    for campo, tipo, nome_tipo in (("progresso", dict, "um objeto"), ("registros", list, "uma lista")):
+        valor = registro.get(campo)
+        if isinstance(valor, str) and valor.strip():
+            try:
+                valor = json.loads(valor)
+            except json.JSONDecodeError:
+                return None, f"Coluna '{campo}' não é JSON válido"
+        if not valor:
+            continue
+        if not isinstance(valor, tipo):
+            return None, f"'{campo}' deve ser {nome_tipo}"
+        missao[campo] = valor
+
+    progresso = missao.get("progresso")
+    if progresso is not None:
+        dias = progresso.get("dias") or {}
+        if (
+            not isinstance(progresso.get("total"), int) or progresso["total"] < 0
+            or not isinstance(dias, dict)
+            or not all(isinstance(n, int) and n > 0 for n in dias.values())
+        ):
+            return None, "'progresso' inválido (esperado {total, ultimo, dias})"
+        missao["progresso"] = {
+            "total": progresso["total"],
+            "ultimo": str(progresso.get("ultimo") or ""),
+            "dias": {str(dia)[:10]: n for dia, n in sorted(dias.items())[-PROGRESSO_DIAS_RESUMO:]},
+        }
+    return missao, ""
+
+
+def _validar_em_blocos(arquivo, formato, resultado, tamanho_lote):
+    """Gera as missões válidas, bloco a bloco, anotando os erros em `resultado`."""
+    linhas = ler_linhas(arquivo, formato)
+    while True:
+        bloco = list(islice(linhas, tamanho_lote))
+        if not bloco:
+            return
+        for numero, registro, erro in bloco:
+            if erro is None:
+                missao, erro = registro_para_missao(registro)
+            if erro:
+                resultado["total_erros"] += 1
+                if len(resultado["erros"]) < IMPORTACAO_MAX_ERROS:
+                    resultado["erros"].append({"linha": numero, "erro": erro})
+                continue
+            resultado["importadas"] += 1
+            yield missao
+
+
+def importar_missoes(arquivo, formato, estrito=False, tamanho_lote=IMPORTACAO_LOTE, origem=""):
+    """
+    Importa missões de um arquivo texto (CSV ou JSON Lines) já aberto.
+
+    As linhas válidas são gravadas de uma vez (uma transação no SQLite; uma
+    gravação de missoes.json no fim da sessão), sem XP: é uma migração, não
+    trabalho feito. As missões recebem IDs novos. Deve rodar dentro de uma
+    sessão exclusiva (requisição que altera dados ou unidade_de_trabalho).
+
+    Args:
+        arquivo: Arquivo texto aberto (seekable se `estrito`)
+        formato: "csv" ou "jsonl"
+        estrito: Não grava nada se alguma linha tiver erro (lê o arquivo
+            duas vezes: valida tudo antes de gravar)
+        tamanho_lote: Linhas validadas por bloco
+        origem: Nome do arquivo, para o histórico
+
+    Returns:
+        Dict {"importadas", "total_erros", "erros": [{"linha", "erro"}]}
+        (no máximo IMPORTACAO_MAX_ERROS erros listados)
+    """
+    if formato not in FORMATOS_TRANSFERENCIA:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+    if estrito:
+        verificacao = {"importadas": 0, "total_erros": 0, "erros": []}
+        for _ in _validar_em_blocos(arquivo, formato, verificacao, tamanho_lote):
+            pass
+        if verificacao["total_erros"]:
+            verificacao["importadas"] = 0
+            return verificacao
+        arquivo.seek(0)
+
+    resultado = {"importadas": 0, "total_erros": 0, "erros": []}
+    get_repositorio().adicionar_missoes(_validar_em_blocos(arquivo, formato, resultado, tamanho_lote))
+    if resultado["importadas"]:
+        detalhe = f"{resultado['importadas']} missão(ões)"
+        utils.salvar_log("Criou missões (importação)", f"{detalhe} de {origem}" if origem else detalhe)
+    return resultado
+
+
+# --- Exportação ---
+
+def _linhas_csv(registros, campos, converter):
+    """Gera o CSV linha a linha (cabeçalho primeiro)."""
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=campos, extrasaction="ignore")
+    escritor.writeheader()
+    for registro in registros:
+        escritor.writerow(converter(registro))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Arquivo vazio ainda leva o cabeçalho
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _linhas_jsonl(registros):
+    for registro in registros:
+        yield json.dumps(registro, ensure_ascii=False) + "\n"
+
+
+def _missao_para_csv(missao):
+    tag = missao.get("tag") or {}
+    return {
+        "id": missao.get("id", ""),
+        "titulo": missao.get("titulo", ""),
+        "status": missao.get("status", ""),
+        "tag_nome": tag.get("nome", ""),
+        "tag_cor": tag.get("cor", ""),
+        "data_criacao": missao.get("data_criacao", ""),
+        "progresso": json.dumps(missao["progresso"], ensure_ascii=False) if missao.get("progresso") else "",
+    }
+
+
+def exportar_missoes(formato="csv"):
+    """Gera a exportação das missões (na ordem da lista) em pedaços de texto."""
+    missoes = get_repositorio().iterar_missoes()
+    if formato == "jsonl":
+        return _linhas_jsonl(missoes)
+    return _linhas_csv(missoes, CAMPOS_MISSAO, _missao_para_csv)
+
+
+def iterar_historico():
+    """Percorre o histórico inteiro, do mais recente ao mais antigo, página a página."""
+    repo = get_repositorio()
+    cursor = None
+    while True:
+        logs, cursor = repo.pagina_historico(cursor=cursor, limite=_PAGINA_EXPORTACAO)
+        yield from logs
+        if not cursor:
+            return
+
+
+def exportar_historico(formato="csv"):
+    """Gera a exportação do histórico em pedaços de texto."""
+    if formato == "jsonl":
+        return _linhas_jsonl(iterar_historico())
+    return _linhas_csv(iterar_historico(), CAMPOS_HISTORICO, dict)
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if comando == "importar" and len(sys.argv) >= 3:
+        caminho = sys.argv[2]
+        with open(caminho, encoding="utf-8-sig", newline="") as f, utils.unidade_de_trabalho():
+            resultado = importar_missoes(
+                f, formato_do_arquivo(caminho), estrito="--estrito" in sys.argv,
+                origem=os.path.basename(caminho),
+            )
+        for erro in resultado["erros"]:
+            print(f"Linha {erro['linha']}: {erro['erro']}")
+        if resultado["total_erros"] > len(resultado["erros"]):
+            print(f"... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s)")
+        print(f"{resultado['importadas']} missão(ões) importada(s), {resultado['total_erros']} linha(s) com erro.")
+        sys.exit(1 if resultado["total_erros"] else 0)
+    elif comando == "exportar" and len(sys.argv) >= 3 and sys.argv[2] in ("missoes", "historico"):
+        formato = sys.argv[sys.argv.index("--formato") + 1] if "--formato" in sys.argv[:-1] else "csv"
+        exportar = exportar_missoes if sys.argv[2] == "missoes" else exportar_historico
+        for pedaco in exportar(formato):
+            sys.stdout.write(pedaco)
+    else:
+        print(
+            "Uso: python importacao.py importar <arquivo.csv|arquivo.jsonl> [--estrito]\n"
+            "     python importacao.py exportar missoes|historico [--formato csv|jsonl]"
+        )
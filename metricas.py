@@ -0,0 +1,307 @@
+"""Métricas e Profiling - FuryCelula
+
+Instrumentação das requisições e do I/O de arquivos, por processo (com
+vários workers, cada um tem os seus contadores):
+
+- Latência por rota: histograma por endpoint e método (METRICAS_BUCKETS).
+- I/O: operações, tempo e bytes de leituras (carregar_json, histórico),
+  gravações (salvar_json, JSON Lines) e backups (snapshots), medidos em
+  utils com medir_io; no backend SQLite, o tempo das transações ("banco",
+  sem bytes).
+- GET /metrics: tudo acima no formato texto do Prometheus, mais os caches
+  de arquivos e de fragmentos.
+- Server-Timing: cada resposta informa o tempo total e o de cada tipo de
+  I/O da própria requisição (aba Network/Timing do navegador).
+- cProfile opcional das rotas em PROFILE_ROTAS (FURY_PROFILE_ROTAS): um
+  .prof por requisição em PROFILE_DIR, para abrir com pstats ou snakeviz.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Response, current_app, g, request
+
+from config import METRICAS_ATIVAS, METRICAS_BUCKETS, PROFILE_DIR, PROFILE_ROTAS
+
+TIPOS_IO = ("leitura", "gravacao", "backup", "banco")
+
+_lock = threading.Lock()
+_latencias = {}                                   # (rota, método) → Histograma
+_io = {tipo: [0, 0.0, 0] for tipo in TIPOS_IO}    # tipo → [operações, segundos, bytes]
+
+# I/O da requisição em andamento (para o Server-Timing) e medição aberta
+_io_requisicao = contextvars.ContextVar("io_requisicao", default=None)
+_medicao_atual = contextvars.ContextVar("medicao_atual", default=None)
+
+# Só um cProfile pode estar ativo por vez no processo
+_lock_profile = threading.Lock()
+
+
+class Histograma:
+    """Contagens por bucket, soma e total de observações (em segundos)."""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+    def acumulados(self):
+        """Pares (limite, observações <= limite), no formato dos buckets do Prometheus."""
+        pares = []
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            pares.append((limite, acumulado))
+        return pares
+
+
+class Medicao:
+    """Bytes transferidos por uma operação medida com medir_io."""
+
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+# --- I/O ---
+
+def registrar_io(tipo, segundos, nbytes=0):
+    """Soma uma operação de I/O aos totais do processo e aos da requisição atual."""
+    if not METRICAS_ATIVAS:
+        return
+    with _lock:
+        totais = _io[tipo]
+        totais[0] += 1
+        totais[1] += segundos
+        totais[2] += nbytes
+    requisicao = _io_requisicao.get()
+    if requisicao is not None:
+        parcial = requisicao.setdefault(tipo, [0, 0.0, 0])
+        parcial[0] += 1
+        parcial[1] += segundos
+        parcial[2] += nbytes
+
+
+@contextmanager
+def medir_io(tipo):
+    """
+    Mede o bloco como uma operação de I/O do tipo informado.
+
+    Os bytes vêm de medicao.bytes (atribuído pelo bloco) somados aos
+    informados com somar_bytes por código chamado dentro do bloco.
+
+    Uso:
+        with medir_io("leitura") as medicao:
+            conteudo = f.read()
+            medicao.bytes = len(conteudo)
+    """
+    medicao = Medicao()
+    if not METRICAS_ATIVAS:
+        yield medicao
+        return
+    token = _medicao_atual.set(medicao)
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        duracao = time.perf_counter() - inicio
+        _medicao_atual.reset(token)
+        registrar_io(tipo, duracao, medicao.bytes)
+
+
+def somar_bytes(nbytes):
+    """Soma bytes à medição aberta com medir_io (sem efeito fora de uma)."""
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.bytes += nbytes
+
+
+# --- Requisições ---
+
+def observar_requisicao(rota, metodo, segundos):
+    """Registra a latência de uma requisição no histograma da rota."""
+    with _lock:
+        histograma = _latencias.get((rota, metodo))
+        if histograma is None:
+            histograma = _latencias[(rota, metodo)] = Histograma(METRICAS_BUCKETS)
+        histograma.observar(segundos)
+
+
+def _server_timing(duracao, io_requisicao):
+    """Valor do cabeçalho Server-Timing (durações em milissegundos)."""
+    partes = [f"total;dur={duracao * 1000:.1f}"]
+    for tipo in TIPOS_IO:
+        parcial = io_requisicao.get(tipo) if io_requisicao else None
+        if parcial:
+            operacoes, segundos, nbytes = parcial
+            desc = f"{operacoes} op, {nbytes} B" if nbytes else f"{operacoes} op"
+            partes.append(f'{tipo};dur={segundos * 1000:.1f};desc="{desc}"')
+    return ", ".join(partes)
+
+
+def estatisticas():
+    """
+    Retorna um dict com as latências e o I/O acumulados no processo.
+
+    Returns:
+        {"requisicoes": {(rota, método): {"total", "soma", "buckets"}},
+         "io": {tipo: {"operacoes", "segundos", "bytes"}}}
+    """
+    with _lock:
+        requisicoes = {
+            chave: {"total": h.total, "soma": h.soma, "buckets": h.acumulados()}
+            for chave, h in _latencias.items()
+        }
+        io_totais = {
+            tipo: {"operacoes": n, "segundos": segundos, "bytes": nbytes}
+            for tipo, (n, segundos, nbytes) in _io.items()
+        }
+    return {"requisicoes": requisicoes, "io": io_totais}
+
+
+def zerar():
+    """Zera todos os contadores do processo."""
+    with _lock:
+        _latencias.clear()
+        for totais in _io.values():
+            totais[:] = [0, 0.0, 0]
+
+
+# --- Formato do Prometheus ---
+
+def _rotulos(**rotulos):
+    return ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in rotulos.items()
+    )
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus(caches=None):
+    """
+    Métricas no formato texto de exposição do Prometheus (versão 0.0.4).
+
+    Args:
+        caches: Dict nome → estatísticas de um cache (hits, misses, entradas),
+            exportado como furycelula_cache_*{cache="nome"}
+    """
+    dados = estatisticas()
+    linhas = [
+        "# HELP furycelula_requisicao_segundos Latência das requisições por rota.",
+        "# TYPE furycelula_requisicao_segundos histogram",
+    ]
+    for (rota, metodo), h in sorted(dados["requisicoes"].items()):
+        for limite, acumulado in h["buckets"]:
+            rotulos = _rotulos(rota=rota, metodo=metodo, le=_numero(limite))
+            linhas.append(f"furycelula_requisicao_segundos_bucket{{{rotulos}}} {acumulado}")
+        rotulos = _rotulos(rota=rota, metodo=metodo, le="+Inf")
+        linhas.append(f"furycelula_requisicao_segundos_bucket{{{rotulos}}} {h['total']}")
+        rotulos = _rotulos(rota=rota, metodo=metodo)
+        linhas.append(f"furycelula_requisicao_segundos_sum{{{rotulos}}} {_numero(h['soma'])}")
+        linhas.append(f"furycelula_requisicao_segundos_count{{{rotulos}}} {h['total']}")
+
+    for nome, campo, ajuda in (
+        ("furycelula_io_operacoes_total", "operacoes", "Operações de I/O de arquivos por tipo."),
+        ("furycelula_io_segundos_total", "segundos", "Tempo gasto em I/O de arquivos por tipo."),
+        ("furycelula_io_bytes_total", "bytes", "Bytes lidos/gravados por tipo de I/O."),
+    ):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} counter")
+        for tipo in TIPOS_IO:
+            valor = dados["io"][tipo][campo]
+            linhas.append(f"{nome}{{{_rotulos(tipo=tipo)}}} {_numero(valor)}")
+
+    if caches:
+        for nome, campo, tipo_metrica in (
+            ("furycelula_cache_hits_total", "hits", "counter"),
+            ("furycelula_cache_misses_total", "misses", "counter"),
+            ("furycelula_cache_entradas", "entradas", "gauge"),
+        ):
+            linhas.append(f"# TYPE {nome} {tipo_metrica}")
+            for cache, est in sorted(caches.items()):
+                linhas.append(f"{nome}{{{_rotulos(cache=cache)}}} {est[campo]}")
+    return "\n".join(linhas) + "\n"
+
+
+# --- Integração com o Flask ---
+
+def _iniciar_requisicao():
+    g.metricas_inicio = time.perf_counter()
+    _io_requisicao.set({})
+    if request.endpoint in PROFILE_ROTAS and _lock_profile.acquire(blocking=False):
+        import cProfile  # Só com FURY_PROFILE_ROTAS
+
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+        g.metricas_profile = perfilador
+
+
+def _responder_requisicao(response):
+    inicio = g.get("metricas_inicio")
+    if inicio is not None:
+        response.headers["Server-Timing"] = _server_timing(
+            time.perf_counter() - inicio, _io_requisicao.get()
+        )
+    return response
+
+
+def _encerrar_requisicao(exc):
+    inicio = g.pop("metricas_inicio", None)
+    if inicio is None:
+        return
+    observar_requisicao(request.endpoint or "sem_rota", request.method, time.perf_counter() - inicio)
+    _io_requisicao.set(None)
+
+    perfilador = g.pop("metricas_profile", None)
+    if perfilador is not None:
+        perfilador.disable()
+        _lock_profile.release()
+        nome = f"{request.endpoint}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof"
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            perfilador.dump_stats(os.path.join(PROFILE_DIR, nome))
+        except OSError as e:
+            print(f"Erro ao gravar profile {nome}: {e}")
+
+
+def _rota_metrics():
+    """GET /metrics: métricas do processo no formato do Prometheus."""
+    from utils import estatisticas_cache  # import tardio: utils importa este módulo
+
+    caches = {"arquivos": estatisticas_cache()}
+    cache_fragmentos = getattr(current_app.jinja_env, "cache_fragmentos", None)
+    if cache_fragmentos is not None:
+        caches["fragmentos"] = cache_fragmentos.estatisticas()
+    return Response(texto_prometheus(caches), mimetype="text/plain; version=0.0.4")
+
+
+def configurar(app):
+    """
+    Instrumenta as requisições do app e registra GET /metrics.
+
+    Chamar antes de registrar os outros before/after_request: assim a
+    medição começa antes deles e termina depois (inclui a gravação da
+    unidade de trabalho no fim da requisição).
+    """
+    if not METRICAS_ATIVAS:
+        return
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_responder_requisicao)
+    app.teardown_request(_encerrar_requisicao)
+    app.add_url_rule("/metrics", "metricas", _rota_metrics)
@@ -0,0 +1,603 @@
+"""Snapshots Incrementais - FuryCelula
+
+Backups dos arquivos JSON de data/ sem copiar o arquivo inteiro a cada
+gravação. utils.salvar_json só enfileira os bytes que acabou de gravar
+(registrar); uma thread à parte os divide em blocos, grava o que for novo e
+apaga o que ninguém mais usa, fora do caminho das requisições:
+
+- objetos/: blocos do arquivo, comprimidos (gzip) e endereçados pelo
+  conteúdo (SHA-256). Os cortes entre blocos dependem do conteúdo (ver
+  _dividir), então uma missão alterada só muda o bloco em que está e os
+  demais são compartilhados entre gravações e snapshots (deduplicação).
+- manifestos/<arquivo>/<id>.json: um snapshot = lista de hashes dos blocos.
+- deltas/<arquivo>/<id>.jsonl: uma linha por gravação depois do snapshot
+  <id>, com os trechos trocados da lista de blocos.
+
+Um novo snapshot é criado a cada SNAPSHOT_INTERVALO_SEGUNDOS ou
+SNAPSHOT_MAX_DELTAS gravações; como os blocos já estão guardados, é só um
+manifesto novo. Ficam os SNAPSHOT_RETENCAO mais recentes de cada arquivo e
+os objetos que ninguém mais referencia são apagados.
+
+Gravações seguidas do mesmo arquivo que a thread ainda não registrou se
+juntam na mais recente. Entre processos, a thread registra com a trava de
+snapshots/ e descarta uma versão que já não é a do arquivo (outro processo
+gravou depois e registra a sua).
+
+Uso: python snapshots.py listar | criar | restaurar <arquivo> [id] | gc
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from difflib import SequenceMatcher
+
+from config import (
+    DATA_DIR,
+    SNAPSHOTS_DIR,
+    SNAPSHOT_INTERVALO_SEGUNDOS,
+    SNAPSHOT_MAX_DELTAS,
+    SNAPSHOT_RETENCAO
+)
+import metricas
+
+OBJETOS_DIR = os.path.join(SNAPSHOTS_DIR, "objetos")
+MANIFESTOS_DIR = os.path.join(SNAPSHOTS_DIR, "manifestos")
+DELTAS_DIR = os.path.join(SNAPSHOTS_DIR, "deltas")
+TRAVA_SNAPSHOTS_PATH = os.path.join(SNAPSHOTS_DIR, ".trava")
+
+# Um corte a cada ~512 registros em média (os 9 bits baixos do CRC zerados)
+# e nenhum bloco maior que BLOCO_MAX_BYTES
+MASCARA_CORTE = 511
+BLOCO_MAX_BYTES = 1024 * 1024
+
+# A coleta só apaga objetos sem uso há este tempo: um bloco recém-guardado
+# ainda pode estar a caminho do manifesto ou do log de deltas
+CARENCIA_COLETA_SEGUNDOS = 60 * 60
+
+# Estado conhecido da última versão registrada de cada arquivo (ver _Estado)
+_estados = {}
+_lock = threading.RLock()
+
+# Versões gravadas à espera da thread de registro: nome -> (caminho,
+# conteudo, assinatura do arquivo logo após a gravação)
+_pendentes = {}
+_lock_fila = threading.Lock()
+_aviso = threading.Event()
+_thread = None
+_trava = None
+
+
+class _Estado:
+    """Blocos da última versão registrada de um arquivo e do seu log."""
+
+    def __init__(self, snapshot_id, criado, blocos):
+        self.snapshot_id = snapshot_id
+        self.criado = criado
+        self.blocos = blocos
+        self.deltas = 0
+        self.assinatura_log = None
+
+
+# --- Blocos endereçados pelo conteúdo ---
+
+def _dividir(conteudo):
+    """
+    Divide os bytes em blocos cujos cortes dependem só do conteúdo.
+
+    Corta depois de cada "{" (um registro por parte num JSON de lista)
+    cujo trecho seguinte tem CRC com os bits de MASCARA_CORTE zerados:
+    alterar, inserir ou remover um registro mexe só no bloco dele. Tudo
+    em passos de C (split, map, join), sem laço por byte.
+    """
+    partes = conteudo.split(b"{")
+    cortes = [i for i, crc in enumerate(map(zlib.crc32, partes)) if not crc & MASCARA_CORTE]
+    blocos = []
+    inicio = 0
+    for fim in cortes + [len(partes)]:
+        if fim > inicio:
+            bloco = b"{".join(partes[inicio:fim])
+            if fim < len(partes):
+                bloco += b"{"
+            blocos.extend(
+                bloco[i:i + BLOCO_MAX_BYTES] for i in range(0, len(bloco), BLOCO_MAX_BYTES)
+            )
+        inicio = fim
+    return blocos
+
+
+def _caminho_objeto(h):
+    return os.path.join(OBJETOS_DIR, h[:2], f"{h}.gz")
+
+
+def _gravar_atomico(caminho, conteudo):
+    diretorio = os.path.dirname(caminho)
+    os.makedirs(diretorio, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+        os.replace(temp_path, caminho)
+        metricas.somar_bytes(len(conteudo))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def guardar_blocos(conteudo):
+    """
+    Guarda os blocos de `conteudo` que ainda não existem.
+
+    Returns:
+        Lista dos hashes dos blocos, em ordem
+    """
+    hashes = []
+    for bloco in _dividir(conteudo):
+        h = hashlib.sha256(bloco).hexdigest()
+        caminho = _caminho_objeto(h)
+        try:
+            # Já guardado: renova a data para a coleta não apagá-lo agora
+            os.utime(caminho)
+        except FileNotFoundError:
+            _gravar_atomico(caminho, gzip.compress(bloco, compresslevel=6))
+        hashes.append(h)
+    return hashes
+
+
+def ler_bloco(h):
+    """Bytes do bloco guardado com o hash `h`."""
+    with open(_caminho_objeto(h), "rb") as f:
+        return gzip.decompress(f.read())
+
+
+# --- Deltas ---
+
+def _calcular_delta(anterior, atual):
+    """Trechos trocados da lista de blocos (None se iguais)."""
+    ops = [
+        [i1, i2, atual[j1:j2]]
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, anterior, atual, autojunk=False).get_opcodes()
+        if tag != "equal"
+    ]
+    return {"blocos": ops} if ops else None
+
+
+def _aplicar_delta(blocos, delta):
+    # Do fim para o início: os índices de cada operação continuam válidos
+    for i1, i2, hashes in reversed(delta["blocos"]):
+        blocos[i1:i2] = hashes
+    return blocos
+
+
+# --- Manifestos ---
+
+def _nome(caminho):
+    """Nome do arquivo relativo a data/, ou None se estiver fora dele."""
+    relativo = os.path.relpath(os.path.abspath(caminho), DATA_DIR)
+    if relativo.startswith(os.pardir) or os.path.isabs(relativo):
+        return None
+    return relativo.replace(os.sep, "/")
+
+
+def _dir_manifestos(nome):
+    return os.path.join(MANIFESTOS_DIR, nome)
+
+
+def _caminho_log(nome, snapshot_id):
+    return os.path.join(DELTAS_DIR, nome, f"{snapshot_id}.jsonl")
+
+
+def _ids_snapshots(nome):
+    """IDs dos snapshots de `nome`, do mais antigo para o mais novo."""
+    try:
+        nomes = os.listdir(_dir_manifestos(nome))
+    except FileNotFoundError:
+        return []
+    return sorted(n[:-len(".json")] for n in nomes if n.endswith(".json"))
+
+
+def _ler_manifesto(nome, snapshot_id):
+    with open(os.path.join(_dir_manifestos(nome), f"{snapshot_id}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _arquivos_com_snapshot():
+    nomes = []
+    for raiz, _, arquivos in os.walk(MANIFESTOS_DIR):
+        if any(a.endswith(".json") for a in arquivos):
+            nomes.append(os.path.relpath(raiz, MANIFESTOS_DIR).replace(os.sep, "/"))
+    return sorted(nomes)
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    # O inode muda a cada os.replace: distingue gravações no mesmo instante
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _novo_id():
+    return datetime.now().strftime("%Y%m%dT%H%M%S_%f")
+
+
+def _gravar_manifesto(nome, blocos):
+    """
+    Grava um manifesto com `blocos` (já guardados).
+
+    Returns:
+        Tupla (_Estado, True se a retenção descartou snapshots antigos)
+    """
+    snapshot_id = _novo_id()
+    while snapshot_id in _ids_snapshots(nome):
+        snapshot_id = _novo_id()
+    manifesto = {"arquivo": nome, "id": snapshot_id, "criado": time.time(), "blocos": blocos}
+    _gravar_atomico(
+        os.path.join(_dir_manifestos(nome), f"{snapshot_id}.json"),
+        json.dumps(manifesto, ensure_ascii=False).encode("utf-8"),
+    )
+    estado = _Estado(snapshot_id, manifesto["criado"], list(blocos))
+    estado.assinatura_log = _assinatura(_caminho_log(nome, snapshot_id))
+    _estados[nome] = estado
+    return estado, _aplicar_retencao(nome)
+
+
+def criar_snapshot(caminho, conteudo):
+    """
+    Grava um snapshot completo dos bytes `conteudo` como versão atual de
+    `caminho`.
+
+    Returns:
+        ID do snapshot, ou None se o arquivo está fora de data/
+    """
+    nome = _nome(caminho)
+    if nome is None:
+        return None
+    with _lock:
+        estado, _ = _gravar_manifesto(nome, guardar_blocos(conteudo))
+        return estado.snapshot_id
+
+
+def _ler_blocos(nome, snapshot_id):
+    """
+    Lista de blocos de um snapshot com os seus deltas aplicados.
+
+    Returns:
+        Tupla (blocos, _Estado), ou (None, None) se o manifesto não tem
+        blocos (gravado por uma versão antiga deste módulo)
+    """
+    manifesto = _ler_manifesto(nome, snapshot_id)
+    if "blocos" not in manifesto:
+        return None, None
+    blocos = list(manifesto["blocos"])
+    caminho_log = _caminho_log(nome, snapshot_id)
+    deltas = 0
+    if os.path.exists(caminho_log):
+        with open(caminho_log, "rb") as f:
+            for linha in f:
+                try:
+                    delta = json.loads(linha)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Linha incompleta (escrita interrompida): para aqui
+                    break
+                blocos = _aplicar_delta(blocos, delta)
+                deltas += 1
+
+    estado = _Estado(snapshot_id, manifesto["criado"], list(blocos))
+    estado.deltas = deltas
+    estado.assinatura_log = _assinatura(caminho_log)
+    return blocos, estado
+
+
+def _estado_atual(nome):
+    """
+    Estado da última versão registrada. Relido do disco quando outro
+    processo registrou algo depois (novo snapshot ou log alterado).
+
+    Returns:
+        _Estado, ou None se não há snapshot utilizável
+    """
+    estado = _estados.get(nome)
+    ids = _ids_snapshots(nome)
+    if not ids:
+        return None
+    if (
+        estado is None
+        or estado.snapshot_id != ids[-1]
+        or estado.assinatura_log != _assinatura(_caminho_log(nome, estado.snapshot_id))
+    ):
+        _, estado = _ler_blocos(nome, ids[-1])
+        _estados[nome] = estado
+    return estado
+
+
+def registrar(caminho, conteudo):
+    """
+    Enfileira uma nova versão de `caminho` (chamado por utils.salvar_json
+    com os bytes que acabou de gravar). Não toca o disco: a thread de
+    registro guarda os blocos e o delta logo depois (ver _registrar).
+    """
+    nome = _nome(caminho)
+    if nome is None:
+        return
+    global _thread
+    assinatura = _assinatura(caminho)
+    with _lock_fila:
+        _pendentes[nome] = (caminho, conteudo, assinatura)
+        if _thread is None:
+            _thread = threading.Thread(target=_executar, name="snapshots", daemon=True)
+            _thread.start()
+    _aviso.set()
+
+
+def _executar():
+    while True:
+        _aviso.wait()
+        _aviso.clear()
+        try:
+            descarregar()
+        except Exception as e:
+            print(f"Erro ao registrar snapshots: {e}")
+
+
+def descarregar():
+    """
+    Registra agora as versões enfileiradas e, se a retenção descartou
+    snapshots, apaga os objetos sem uso (ver coletar_lixo).
+    """
+    global _trava
+    coletar = False
+    # Com _lock desde a retirada da fila: quem chama enquanto a thread
+    # registra espera ela terminar (ex: recuperar)
+    with _lock:
+        with _lock_fila:
+            pendentes = list(_pendentes.values())
+            _pendentes.clear()
+        if not pendentes:
+            return
+        if _trava is None:
+            import utils
+            _trava = utils.TravaArquivo(TRAVA_SNAPSHOTS_PATH)
+        with metricas.medir_io("backup"), _trava:
+            coletar = _registrar_pendentes(pendentes)
+    if coletar:
+        coletar_lixo()
+
+
+def _registrar_pendentes(pendentes):
+    coletar = False
+    for caminho, conteudo, assinatura in pendentes:
+        if _assinatura(caminho) != assinatura:
+            # Já regravado (aqui ou em outro processo): a versão mais nova é
+            # registrada por quem a gravou
+            continue
+        try:
+            coletar = _registrar(_nome(caminho), conteudo) or coletar
+        except Exception as e:
+            print(f"Erro ao registrar snapshot de {caminho}: {e}")
+    return coletar
+
+
+def _registrar(nome, conteudo):
+    """
+    Guarda os blocos novos de `conteudo` e anexa ao log só os trechos
+    trocados da lista de blocos; grava um manifesto completo quando não há
+    snapshot utilizável ou quando o intervalo/limite de deltas foi atingido.
+
+    Returns:
+        True se a retenção descartou snapshots (há objetos para coletar)
+    """
+    blocos = guardar_blocos(conteudo)
+    estado = _estado_atual(nome)
+    if (
+        estado is None
+        or estado.deltas >= SNAPSHOT_MAX_DELTAS
+        or time.time() - estado.criado >= SNAPSHOT_INTERVALO_SEGUNDOS
+    ):
+        return _gravar_manifesto(nome, blocos)[1]
+
+    delta = _calcular_delta(estado.blocos, blocos)
+    if delta is None:
+        return False
+    caminho_log = _caminho_log(nome, estado.snapshot_id)
+    os.makedirs(os.path.dirname(caminho_log), exist_ok=True)
+    linha = json.dumps(delta).encode("utf-8") + b"\n"
+    with open(caminho_log, "ab") as f:
+        f.write(linha)
+    metricas.somar_bytes(len(linha))
+    estado.blocos = blocos
+    estado.deltas += 1
+    estado.assinatura_log = _assinatura(caminho_log)
+    return False
+
+
+def _apos_fork():
+    """No processo filho: fila vazia e sem thread (ela não atravessa o fork)."""
+    global _lock, _lock_fila, _aviso, _thread
+    _lock = threading.RLock()
+    _lock_fila = threading.Lock()
+    _aviso = threading.Event()
+    _pendentes.clear()
+    _thread = None
+
+
+atexit.register(descarregar)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_apos_fork)
+
+
+def recuperar(caminho, snapshot_id=None):
+    """
+    Conteúdo de `caminho` segundo os snapshots (último snapshot + deltas).
+
+    Returns:
+        Os dados, ou None se não houver snapshot do arquivo
+    """
+    import utils
+
+    nome = _nome(caminho)
+    if nome is None:
+        return None
+    descarregar()
+    with _lock:
+        ids = _ids_snapshots(nome)
+        if not ids:
+            return None
+        blocos, _ = _ler_blocos(nome, snapshot_id or ids[-1])
+        if blocos is None:
+            return None
+        conteudo = b"".join(ler_bloco(h) for h in blocos)
+    return utils.desserializar(conteudo)
+
+
+def restaurar(caminho, snapshot_id=None):
+    """
+    Regrava `caminho` com o conteúdo recuperado dos snapshots.
+
+    Args:
+        caminho: Arquivo em data/ (ex: data/missoes.json)
+        snapshot_id: Snapshot de origem (None = mais recente, com seus deltas)
+
+    Returns:
+        True se restaurou, False se não há snapshot ou a gravação falhou
+    """
+    import utils
+
+    dados = recuperar(caminho, snapshot_id)
+    if dados is None:
+        return False
+    return utils.salvar_json(caminho, dados)
+
+
+def listar():
+    """Retorna [{arquivo, id, criado, deltas}] de todos os snapshots."""
+    resultado = []
+    for nome in _arquivos_com_snapshot():
+        for snapshot_id in _ids_snapshots(nome):
+            manifesto = _ler_manifesto(nome, snapshot_id)
+            caminho_log = _caminho_log(nome, snapshot_id)
+            deltas = 0
+            if os.path.exists(caminho_log):
+                with open(caminho_log, "rb") as f:
+                    deltas = sum(1 for _ in f)
+            resultado.append({
+                "arquivo": nome,
+                "id": snapshot_id,
+                "criado": manifesto["criado"],
+                "deltas": deltas,
+            })
+    return resultado
+
+
+# --- Retenção ---
+
+def _aplicar_retencao(nome):
+    """
+    Mantém os SNAPSHOT_RETENCAO snapshots mais novos de `nome`.
+
+    Returns:
+        True se descartou algum (os objetos sem uso ficam para coletar_lixo)
+    """
+    antigos = _ids_snapshots(nome)[:-SNAPSHOT_RETENCAO]
+    for snapshot_id in antigos:
+        os.remove(os.path.join(_dir_manifestos(nome), f"{snapshot_id}.json"))
+        caminho_log = _caminho_log(nome, snapshot_id)
+        if os.path.exists(caminho_log):
+            os.remove(caminho_log)
+    return bool(antigos)
+
+
+def _referenciados():
+    """Hashes usados pelos manifestos e logs de deltas que restam."""
+    referenciados = set()
+    for nome in _arquivos_com_snapshot():
+        for snapshot_id in _ids_snapshots(nome):
+            try:
+                manifesto = _ler_manifesto(nome, snapshot_id)
+            except FileNotFoundError:
+                # Saiu da retenção enquanto a coleta lia
+                continue
+            referenciados.update(manifesto.get("blocos", []))
+            try:
+                with open(_caminho_log(nome, snapshot_id), "rb") as f:
+                    for linha in f:
+                        try:
+                            delta = json.loads(linha)
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            break
+                        for _, _, hashes in delta.get("blocos", []):
+                            referenciados.update(hashes)
+            except FileNotFoundError:
+                pass
+    return referenciados
+
+
+def coletar_lixo(carencia=CARENCIA_COLETA_SEGUNDOS):
+    """
+    Apaga objetos que nenhum snapshot restante referencia.
+
+    Lê manifestos e logs e percorre objetos/ sem segurar o lock; só a
+    remoção de cada objeto o segura, conferindo antes se ele não foi
+    reaproveitado (guardar_blocos renova a data dos blocos que reusa).
+
+    Args:
+        carencia: Idade mínima, em segundos, de um objeto para ser apagado
+
+    Returns:
+        Quantidade de objetos apagados
+    """
+    referenciados = _referenciados()
+    limite = time.time() - carencia
+    candidatos = []
+    for raiz, _, arquivos in os.walk(OBJETOS_DIR):
+        for arquivo in arquivos:
+            h, _, extensao = arquivo.partition(".")
+            # Também os .json.gz (um objeto por item) de versões antigas
+            if extensao in ("gz", "json.gz") and h not in referenciados:
+                candidatos.append(os.path.join(raiz, arquivo))
+
+    apagados = 0
+    for caminho in candidatos:
+        with _lock:
+            try:
+                if os.stat(caminho).st_mtime < limite:
+                    os.remove(caminho)
+                    apagados += 1
+            except FileNotFoundError:
+                pass
+    return apagados
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if comando == "listar":
+        for s in listar():
+            criado = datetime.fromtimestamp(s["criado"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{s['arquivo']:20} {s['id']}  {criado}  +{s['deltas']} deltas")
+    elif comando == "criar":
+        from config import MISSOES_PATH, PERFIL_PATH, TAGS_PATH
+        for caminho in (MISSOES_PATH, PERFIL_PATH, TAGS_PATH):
+            if os.path.exists(caminho):
+                with open(caminho, "rb") as f:
+                    conteudo = f.read()
+                print(f"{_nome(caminho)}: {criar_snapshot(caminho, conteudo)}")
+    elif comando == "restaurar" and len(sys.argv) >= 3:
+        caminho = os.path.join(DATA_DIR, sys.argv[2])
+        snapshot_id = sys.argv[3] if len(sys.argv) >= 4 else None
+        if restaurar(caminho, snapshot_id):
+            print(f"{sys.argv[2]} restaurado.")
+        else:
+            print(f"Erro: nenhum snapshot de {sys.argv[2]}")
+            sys.exit(1)
+    elif comando == "gc":
+        print(f"{coletar_lixo()} objetos apagados.")
+    else:
+        print("Uso: python snapshots.py listar | criar | restaurar <arquivo> [id] | gc")
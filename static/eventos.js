@@ -0,0 +1,119 @@
+// Eventos ao vivo (GET /eventos, ver eventos.py): atualiza XP, nível, moedas,
+// contadores, status das missões e histórico da página sem recarregar.
+// Elementos marcados com data-perfil, data-estatistica, li[data-id] e
+// #log-body[data-ao-vivo]; páginas sem eles só ignoram os eventos.
+(function () {
+  const url = document.currentScript.dataset.url;
+  if (!url || !window.EventSource) return;
+
+  const fonte = new EventSource(url);
+  // Cada aba conectada ocupa uma thread do servidor: solta ao sair da página
+  window.addEventListener('pagehide', () => fonte.close());
+
+  function preencher(atributo, valores) {
+    for (const [campo, valor] of Object.entries(valores)) {
+      document.querySelectorAll(`[${atributo}="${campo}"]`).forEach(el => { el.textContent = valor; });
+    }
+  }
+
+  function numero(campo) {
+    const el = document.querySelector(`[data-perfil="${campo}"]`);
+    return el ? Number(el.textContent) : 0;
+  }
+
+  fonte.addEventListener('perfil', e => {
+    const perfil = JSON.parse(e.data);
+    const subiu = perfil.subiu_nivel;
+    delete perfil.subiu_nivel;
+    preencher('data-perfil', perfil);
+
+    const barra = document.querySelector('[data-perfil-barra]');
+    if (barra && numero('xp_proximo_nivel')) {
+      barra.style.width = (numero('xp') / numero('xp_proximo_nivel')) * 100 + '%';
+    }
+    if (subiu && typeof confetti === 'function') {
+      confetti({ particleCount: 150, spread: 70, origin: { y: 0.6 }, colors: ['#8B5CF6', '#00F5A0', '#FACC15'] });
+    }
+  });
+
+  fonte.addEventListener('estatisticas', e => preencher('data-estatistica', JSON.parse(e.data)));
+
+  // Status: mesma marcação que o template gera para cada status
+  function aplicarStatus(item, status) {
+    if (item.classList.contains('concluida')) {
+      // Reaberta: os botões de missão aberta não estão na página
+      if (status !== 'concluída') location.reload();
+      return;
+    }
+    const selo = item.querySelector('.selo-andamento');
+    if (status === 'em_andamento' && !selo && item.closest('#lista-missoes')) {
+      const novo = document.createElement('span');
+      novo.className = 'selo-andamento';
+      novo.style.cssText = 'color: #fbbf24; font-size: 0.75rem; margin-left: 0.5rem;';
+      novo.textContent = '⏳ Em Andamento';
+      item.querySelector('.mission-title').after(novo);
+    } else if (status !== 'em_andamento' && selo) {
+      selo.remove();
+    }
+    if (status !== 'concluída') return;
+
+    item.classList.add('concluida', 'missao-concluida');
+    const completa = document.createElement('span');
+    completa.style.cssText = 'color: var(--accent); font-weight: bold;';
+    completa.textContent = '✔ Completa';
+    const registrar = item.querySelector('a[data-acao="registrar"]');
+    if (registrar) registrar.remove();
+    const concluir = item.querySelector('a[data-acao="concluir"]');
+    if (concluir) concluir.replaceWith(completa);
+  }
+
+  fonte.addEventListener('missoes', e => {
+    for (const missao of JSON.parse(e.data)) {
+      document.querySelectorAll(`li[data-id="${CSS.escape(missao.id)}"]`).forEach(item => aplicarStatus(item, missao.status));
+    }
+  });
+
+  // Histórico: mesma cor de borda e ícone que historico.html
+  const BORDAS = [['Criou', 'var(--accent)'], ['Concluiu', 'var(--primary)'], ['Editou', 'var(--gold)'],
+                  ['Excluiu', 'var(--danger)'], ['Comprou', '#d946ef']];
+  const ICONES = [['Criou', '✨'], ['Concluiu', '✅'], ['Editou', '✏️'], ['Equipou', '👕'],
+                  ['Excluiu', '🗑️'], ['Comprou', '🛍️']];
+
+  function escolher(opcoes, acao, padrao) {
+    const opcao = opcoes.find(([trecho]) => acao.includes(trecho));
+    return opcao ? opcao[1] : padrao;
+  }
+
+  function elemento(tag, estilo, texto) {
+    const el = document.createElement(tag);
+    el.style.cssText = estilo;
+    if (texto !== undefined) el.textContent = texto;
+    return el;
+  }
+
+  fonte.addEventListener('historico', e => {
+    const lista = document.querySelector('#log-body[data-ao-vivo]');
+    if (!lista) return;
+    const log = JSON.parse(e.data);
+    const textos = elemento('div', '');
+    textos.append(elemento('div', 'font-weight: 700; color: white; margin-bottom: 0.2rem;', log.acao),
+                  elemento('div', 'font-size: 0.9rem; color: #ccc;', log.resultado));
+    const esquerda = elemento('div', 'display: flex; align-items: center; gap: 1rem;');
+    esquerda.append(elemento('span', 'font-size: 1.5rem;', escolher(ICONES, log.acao, '📝')), textos);
+
+    const item = elemento('div', 'display: flex; justify-content: space-between; align-items: center; padding: 1rem; margin-bottom: 0.8rem; border-left: 4px solid '
+      + escolher(BORDAS, log.acao, '#aaa') + ';');
+    item.className = 'log-item card';
+    item.dataset.acao = log.acao;
+    item.append(esquerda, elemento('div', 'font-size: 0.8rem; color: #888; font-family: monospace;', log.data));
+    lista.prepend(item);
+    const aviso = document.getElementById('feedback');
+    if (aviso && lista.children.length === 1) aviso.textContent = '';
+  });
+
+  fonte.addEventListener('recarregar', () => {
+    // Eventos perdidos (reinício do servidor ou aba atrasada): estado incerto
+    fonte.close();
+    location.reload();
+  });
+})();
@@ -2,22 +2,379 @@
 
 Funções reutilizáveis para manipulação de arquivos JSON, validação e segurança.
 """
+import atexit
+import codecs
+import contextvars
+import copy
+import gzip
+import io
 import json
 import os
+import re
 import shutil
+import signal
+import sys
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from itertools import islice
 from markupsafe import escape
 from config import (
-    MISSOES_PATH,
+    CACHE_MAX_ARQUIVOS,
+    FORMATO_ARQUIVOS,
+    COMPRESSAO_HISTORICO,
+    TRAVA_PATH,
     HISTORICO_PATH,
+    HISTORICO_DIR,
+    HISTORICO_SEGMENTO_BYTES,
+    MAX_HISTORICO_ENTRIES,
     MAX_TITULO_LENGTH,
     MIN_TITULO_LENGTH,
-    MAX_HISTORICO_ENTRIES,
+    MAX_TAG_NOME_LENGTH,
+    ORDEM_PASSO,
+    ORDEM_INTERVALO_MINIMO,
+    PROGRESSO_DIAS_RESUMO,
     STATUS_VALIDOS,
     STATUS_DEFAULT,
-    PERFIL_PATH,
-    ITENS_LOJA
+    ITENS_LOJA,
+    ACOES_LOTE,
+    MAX_MISSOES_LOTE
 )
+import eventos
+import metricas
+import snapshots
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# Codecs opcionais (ver FORMATO_ARQUIVOS e COMPRESSAO_HISTORICO)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class CacheArquivos:
+    """
+    Cache read-through de arquivos JSON já decodificados, por caminho.
+
+    Cada entrada guarda a assinatura do arquivo (inode, mtime_ns, tamanho);
+    uma leitura custa um os.stat e só decodifica de novo se o arquivo mudou
+    (ex: outro processo gravou). salvar_json troca a entrada pelos dados
+    gravados, só depois que a gravação deu certo. Limitado a `max_entradas`
+    arquivos (LRU).
+
+    Os objetos retornados são compartilhados entre requisições e não devem
+    ser alterados: as sessões que alteram dados trabalham em cópias (ver
+    carregar_em_sessao).
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def assinatura(caminho):
+        """Retorna (inode, mtime_ns, tamanho) do arquivo; FileNotFoundError se não existir."""
+        st = os.stat(caminho)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def obter(self, caminho, assinatura):
+        """Retorna os dados em cache se a assinatura confere, senão None."""
+        with self._lock:
+            entrada = self._entradas.get(caminho)
+            if entrada is not None and entrada[0] == assinatura:
+                self._entradas.move_to_end(caminho)
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+            return None
+
+    def guardar(self, caminho, assinatura, dados):
+        """Guarda os dados decodificados de `caminho`, descartando os menos usados."""
+        with self._lock:
+            self._entradas[caminho] = (assinatura, dados)
+            self._entradas.move_to_end(caminho)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, caminho=None):
+        """Remove a entrada de `caminho` (ou todas, se None)."""
+        with self._lock:
+            if caminho is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(caminho, None)
+
+    def estatisticas(self):
+        """Retorna dict com hits, misses, taxa de acerto e ocupação."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+            }
+
+
+_cache = CacheArquivos(CACHE_MAX_ARQUIVOS)
+
+
+def estatisticas_cache():
+    """Retorna os contadores do cache de arquivos (hits, misses...)."""
+    return _cache.estatisticas()
+
+
+# --- Formatos de arquivo ---
+
+FORMATOS = ("json", "json_indentado", "orjson", "msgpack")
+_MAGICA_GZIP = b"\x1f\x8b"
+_MAGICA_ZSTD = b"\x28\xb5\x2f\xfd"
+_PRIMEIRO_BYTE = re.compile(rb"\s*(.)", re.S)
+
+
+def formato_efetivo(formato=None):
+    """
+    Formato usado para gravar: `formato` ou FORMATO_ARQUIVOS, trocado por
+    "json" se for desconhecido ou se a biblioteca opcional não estiver
+    instalada.
+    """
+    formato = formato or FORMATO_ARQUIVOS
+    if (
+        formato not in FORMATOS
+        or (formato == "orjson" and orjson is None)
+        or (formato == "msgpack" and msgpack is None)
+    ):
+        return "json"
+    return formato
+
+
+def serializar(dados, formato=None):
+    """Serializa `dados` em bytes no formato indicado (ver formato_efetivo)."""
+    formato = formato_efetivo(formato)
+    if formato == "msgpack":
+        return msgpack.packb(dados, use_bin_type=True)
+    if formato == "orjson":
+        return orjson.dumps(dados)
+    if formato == "json_indentado":
+        return json.dumps(dados, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(dados, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _eh_msgpack(conteudo):
+    """True se o conteúdo começa como um array/map msgpack (não é texto JSON)."""
+    m = _PRIMEIRO_BYTE.match(conteudo)
+    return m is not None and (0x80 <= m.group(1)[0] <= 0x9f or 0xdc <= m.group(1)[0] <= 0xdf)
+
+
+def comprimir(conteudo, algoritmo):
+    """
+    Comprime bytes com "gzip" ou "zstd" (gzip se zstandard não estiver instalado).
+
+    Returns:
+        Tupla (bytes comprimidos, extensão: ".gz" ou ".zst")
+    """
+    if algoritmo == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(conteudo), ".zst"
+    return gzip.compress(conteudo), ".gz"
+
+
+def descomprimir(conteudo):
+    """Descomprime bytes gzip/zstd (detectados pela assinatura); outros voltam iguais."""
+    if conteudo[:2] == _MAGICA_GZIP:
+        return gzip.decompress(conteudo)
+    if conteudo[:4] == _MAGICA_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Arquivo comprimido com zstd, mas o pacote zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(conteudo)
+    return conteudo
+
+
+def desserializar(conteudo):
+    """
+    Decodifica bytes gravados por serializar() em qualquer formato.
+
+    O formato é detectado pelo conteúdo: compressão gzip/zstd pela
+    assinatura, msgpack pelo primeiro byte; o resto é JSON (lido com orjson
+    quando instalado).
+
+    Raises:
+        json.JSONDecodeError: Se o conteúdo estiver corrompido
+    """
+    conteudo = descomprimir(conteudo)
+    if _eh_msgpack(conteudo):
+        if msgpack is None:
+            raise json.JSONDecodeError("Arquivo msgpack, mas o pacote msgpack não está instalado", "", 0)
+        try:
+            return msgpack.unpackb(conteudo, raw=False)
+        except Exception as e:
+            raise json.JSONDecodeError(f"msgpack inválido: {e}", "", 0)
+    if orjson is not None:
+        return orjson.loads(conteudo)
+    return json.loads(conteudo)
+
+
+def _ler_json_com_cache(caminho):
+    """
+    Lê e decodifica um arquivo JSON passando pelo cache.
+
+    Returns:
+        Dados decodificados, ou None se o arquivo não existir
+
+    Raises:
+        json.JSONDecodeError: Se o conteúdo estiver corrompido
+    """
+    try:
+        assinatura = CacheArquivos.assinatura(caminho)
+    except FileNotFoundError:
+        return None
+
+    dados = _cache.obter(caminho, assinatura)
+    if dados is not None:
+        return dados
+
+    with metricas.medir_io("leitura") as medicao:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        medicao.bytes = len(conteudo)
+        dados = desserializar(conteudo)
+    _cache.guardar(caminho, assinatura, dados)
+    return dados
+
+
+def dados_em_memoria(caminho, chave=None):
+    """
+    Dados de `caminho` já carregados, sem ler o arquivo.
+
+    Procura na sessão ativa (store `chave`, padrão o próprio caminho) e
+    depois no cache (validado por os.stat).
+
+    Returns:
+        Os dados, ou None se ainda não estão na memória
+    """
+    sessao = _sessao.get()
+    if sessao is not None:
+        dados = sessao.carregado(chave or caminho)
+        if dados is not None:
+            return dados
+    try:
+        assinatura = CacheArquivos.assinatura(caminho)
+    except FileNotFoundError:
+        return None
+    return _cache.obter(caminho, assinatura)
+
+
+# Leitura incremental de um array JSON (ver ler_registros_json)
+_ESCALAR = re.compile(r'[^,\]\s]+')
+_ESPACOS = re.compile(r'[\s,]*')
+_decodificador_json = json.JSONDecoder()
+
+
+def _percorrer_array_json(caminho, tamanho_bloco):
+    """
+    Gera os elementos do array JSON em `caminho`, um por vez.
+
+    Cada elemento é decodificado com JSONDecoder.raw_decode direto no
+    buffer; o texto já consumido é descartado a cada bloco lido. Arquivos
+    que não são texto JSON (msgpack, comprimidos) são decodificados inteiros.
+    """
+    try:
+        f = open(caminho, "rb")
+    except FileNotFoundError:
+        return
+
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    with f:
+        inicio = f.read(4)
+        if inicio[:2] == _MAGICA_GZIP or inicio[:4] == _MAGICA_ZSTD or _eh_msgpack(inicio):
+            dados = desserializar(inicio + f.read())
+            if isinstance(dados, list):
+                yield from dados
+            return
+        f.seek(0)
+        texto = ""
+        eof = False
+        dentro = False
+        posicao = 0
+        while True:
+            if not dentro:
+                resto = texto.lstrip()
+                if resto:
+                    if resto[0] != "[":
+                        return  # O topo não é uma lista
+                    dentro = True
+                    posicao = len(texto) - len(resto) + 1
+            if dentro:
+                posicao = _ESPACOS.match(texto, posicao).end()
+                if posicao < len(texto):
+                    if texto[posicao] == "]":
+                        return
+                    valor, fim = None, None
+                    # Escalar (número, true...) colado no fim do buffer pode
+                    # continuar no próximo bloco
+                    escalar = texto[posicao] not in '"[{' and not eof
+                    if not escalar or _ESCALAR.match(texto, posicao).end() < len(texto):
+                        try:
+                            valor, fim = _decodificador_json.raw_decode(texto, posicao)
+                        except json.JSONDecodeError:
+                            # Elemento incompleto: falta ler mais
+                            if eof:
+                                raise
+                    if fim is not None:
+                        yield valor
+                        posicao = fim
+                        continue
+            if eof:
+                raise json.JSONDecodeError("Array JSON incompleto", texto, posicao)
+            # Descarta o que já foi consumido e lê o próximo bloco
+            texto = texto[posicao:]
+            posicao = 0
+            bloco = f.read(tamanho_bloco)
+            eof = not bloco
+            texto += decodificador.decode(bloco, final=eof)
+
+
+def ler_registros_json(caminho, pular=0, tamanho_bloco=65536):
+    """
+    Gera os registros de um arquivo JSON cujo topo é uma lista, um por vez.
+
+    A memória usada fica limitada a um bloco e um registro, qualquer que
+    seja o tamanho do arquivo; parar a iteração encerra a leitura.
+
+    Args:
+        caminho: Path do arquivo JSON
+        pular: Quantos registros iniciais descartar (sem guardá-los)
+        tamanho_bloco: Bytes lidos por vez
+
+    Yields:
+        Cada elemento da lista, decodificado
+
+    Raises:
+        json.JSONDecodeError: Se o conteúdo estiver corrompido
+    """
+    yield from islice(_percorrer_array_json(caminho, tamanho_bloco), pular, None)
 
 
 def carregar_json(caminho):
@@ -31,25 +388,15 @@ def carregar_json(caminho):
         Lista com os dados ou lista vazia se houver erro
     """
     try:
-        if not os.path.exists(caminho):
-            return []
-        
-        with open(caminho, "r", encoding="utf-8") as f:
-            dados = json.load(f)
-            return dados if isinstance(dados, list) else []
+        dados = _ler_json_com_cache(caminho)
+        return dados if isinstance(dados, list) else []
     
     except json.JSONDecodeError as e:
         print(f"Erro ao decodificar JSON {caminho}: {e}")
-        # Tentar restaurar backup
-        backup_path = f"{caminho}.bak"
-        if os.path.exists(backup_path):
-            print(f"Restaurando backup de {backup_path}")
-            shutil.copy(backup_path, caminho)
-            return carregar_json(caminho)
-        return []
+        _cache.invalidar(caminho)
+        dados = _recuperar_arquivo(caminho)
+        return dados if isinstance(dados, list) else []
     
-    except Exception as e:
-        print(f"Erro ao carregar {caminho}: {e}")
     except Exception as e:
         print(f"Erro ao carregar {caminho}: {e}")
         return []
@@ -66,52 +413,526 @@ def carregar_json_dict(caminho):
         Dicionário com os dados ou dict vazio se houver erro
     """
     try:
-        if not os.path.exists(caminho):
-            return {}
-        
-        with open(caminho, "r", encoding="utf-8") as f:
-            dados = json.load(f)
-            return dados if isinstance(dados, dict) else {}
+        dados = _ler_json_com_cache(caminho)
+        return dados if isinstance(dados, dict) else {}
+    
+    except json.JSONDecodeError as e:
+        print(f"Erro ao decodificar JSON {caminho}: {e}")
+        _cache.invalidar(caminho)
+        dados = _recuperar_arquivo(caminho)
+        return dados if isinstance(dados, dict) else {}
     
     except Exception as e:
         print(f"Erro ao carregar dict {caminho}: {e}")
+        _cache.invalidar(caminho)
         return {}
 
 
-def salvar_json(caminho, dados):
+def _recuperar_arquivo(caminho):
     """
-    Salva dados em arquivo JSON com backup automático.
+    Recupera um JSON corrompido: último snapshot + deltas (ver snapshots.py)
+    ou, em instalações antigas sem snapshots, o .bak. Regrava o arquivo.
+
+    Returns:
+        Os dados recuperados ou None
+    """
+    try:
+        dados = snapshots.recuperar(caminho)
+    except Exception as e:
+        print(f"Erro ao ler snapshots de {caminho}: {e}")
+        dados = None
+    if dados is not None:
+        print(f"Restaurando {caminho} a partir dos snapshots")
+        salvar_json(caminho, dados)
+        return dados
+
+    backup_path = f"{caminho}.bak"
+    if os.path.exists(backup_path):
+        print(f"Restaurando backup de {backup_path}")
+        try:
+            with open(backup_path, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+        salvar_json(caminho, dados)
+        return dados
+    return None
+
+
+def salvar_json(caminho, dados, formato=None):
+    """
+    Salva dados em arquivo JSON; o backup é incremental (snapshots.registrar).
     
     Args:
         caminho: Path do arquivo JSON
         dados: Dados a serem salvos
+        formato: Formato de gravação (padrão: FORMATO_ARQUIVOS)
     
     Returns:
         True se sucesso, False se houver erro
     """
     try:
-        # Criar backup antes de salvar
-        if os.path.exists(caminho):
-            backup_path = f"{caminho}.bak"
-            shutil.copy(caminho, backup_path)
-        
         # Criar diretório se não existir
         os.makedirs(os.path.dirname(caminho), exist_ok=True)
         
-        # Salvar com lock simples (arquivo temporário)
-        temp_path = f"{caminho}.tmp"
-        with open(temp_path, "w", encoding="utf-8") as f:
-            json.dump(dados, f, indent=2, ensure_ascii=False)
+        # Arquivo temporário único no mesmo diretório: gravações concorrentes
+        # não compartilham o .tmp, e os.replace troca o arquivo atomicamente
+        diretorio = os.path.dirname(caminho)
+        fd, temp_path = tempfile.mkstemp(
+            dir=diretorio, prefix=f"{os.path.basename(caminho)}.", suffix=".tmp"
+        )
+        with metricas.medir_io("gravacao") as medicao:
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    conteudo = serializar(dados, formato)
+                    f.write(conteudo)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(caminho):
+                    shutil.copymode(caminho, temp_path)
+                os.replace(temp_path, caminho)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            _fsync_diretorio(diretorio)
+            medicao.bytes = len(conteudo)
+        
+        # Backup: enfileira os bytes gravados; snapshots registra o delta
+        # (ou um snapshot periódico) em segundo plano
+        try:
+            snapshots.registrar(caminho, conteudo)
+        except Exception as e:
+            print(f"Erro ao registrar snapshot de {caminho}: {e}")
         
-        # Renomear arquivo temporário para o definitivo
-        shutil.move(temp_path, caminho)
+        # Atualizar o cache no lugar: a próxima leitura não decodifica de novo
+        _cache.guardar(caminho, CacheArquivos.assinatura(caminho), dados)
         return True
     
     except Exception as e:
         print(f"Erro ao salvar {caminho}: {e}")
+        _cache.invalidar(caminho)
+        return False
+
+
+def _fsync_diretorio(diretorio):
+    """Garante no disco a troca de nome feita por os.replace (só POSIX)."""
+    if os.name != "posix":
+        return
+    fd = os.open(diretorio, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class TravaArquivo:
+    """
+    Trava exclusiva entre processos e threads baseada em um arquivo.
+
+    Usa fcntl.flock (msvcrt.locking no Windows). Cada thread abre o próprio
+    descritor, então threads do mesmo processo também se excluem. É
+    reentrante na mesma thread.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+    def adquirir(self):
+        profundidade = getattr(self._local, "profundidade", 0)
+        if profundidade == 0:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            f = open(self.caminho, "a+b")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                elif msvcrt is not None:
+                    f.seek(0)
+                    while True:
+                        try:
+                            # LK_LOCK desiste após ~10s; continua tentando
+                            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+            except BaseException:
+                f.close()
+                raise
+            self._local.arquivo = f
+        self._local.profundidade = profundidade + 1
+
+    def liberar(self):
+        profundidade = getattr(self._local, "profundidade", 0)
+        if profundidade == 0:
+            return
+        self._local.profundidade = profundidade - 1
+        if profundidade == 1:
+            f = self._local.arquivo
+            self._local.arquivo = None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                f.close()
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+
+# Trava dos dados em data/: protege ciclos ler-alterar-gravar entre workers
+_trava_dados = TravaArquivo(TRAVA_PATH)
+
+
+def trava_dados():
+    """Retorna a trava de data/ (use com `with` em ciclos ler-alterar-gravar)."""
+    return _trava_dados
+
+
+def _linha_jsonl(registro):
+    if orjson is not None:
+        return orjson.dumps(registro, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(registro, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def anexar_jsonl(caminho, registros):
+    """
+    Acrescenta registros como linhas JSON no fim do arquivo (uma escrita).
+
+    Custo O(len(registros)): não lê nem reescreve o conteúdo existente.
+
+    Args:
+        caminho: Path do arquivo .jsonl
+        registros: Lista de dicts a serem gravados
+
+    Returns:
+        Tamanho do arquivo após a escrita, ou None se houver erro
+    """
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        linhas = b"".join(_linha_jsonl(r) for r in registros)
+        with metricas.medir_io("gravacao") as medicao, open(caminho, "ab") as f:
+            f.write(linhas)
+            medicao.bytes = len(linhas)
+            return f.tell()
+    except Exception as e:
+        print(f"Erro ao anexar em {caminho}: {e}")
+        return None
+
+
+def ler_jsonl(caminho):
+    """
+    Gera os registros de um arquivo JSON Lines na ordem de gravação (nada
+    se o arquivo não existe). Linhas corrompidas são ignoradas.
+    """
+    try:
+        f = _abrir_jsonl(caminho)
+    except FileNotFoundError:
+        return
+    with f:
+        for linha in f:
+            registro = _decodificar_linha_jsonl(linha, caminho)
+            if registro is not None:
+                yield registro
+
+
+def reescrever_jsonl(caminho, registros):
+    """
+    Substitui o conteúdo de um arquivo JSON Lines (arquivo temporário +
+    os.replace, como salvar_json). Usado para compactar arquivos que no
+    resto do tempo só recebem acréscimos.
+
+    Returns:
+        True se sucesso, False se houver erro
+    """
+    try:
+        diretorio = os.path.dirname(caminho)
+        os.makedirs(diretorio, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=diretorio, prefix=f"{os.path.basename(caminho)}.", suffix=".tmp"
+        )
+        with metricas.medir_io("gravacao") as medicao:
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    conteudo = b"".join(_linha_jsonl(r) for r in registros)
+                    f.write(conteudo)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, caminho)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            _fsync_diretorio(diretorio)
+            medicao.bytes = len(conteudo)
+        return True
+    except Exception as e:
+        print(f"Erro ao reescrever {caminho}: {e}")
         return False
 
 
+def ler_jsonl_reverso(caminho, tamanho_bloco=8192):
+    """
+    Gera os registros de um arquivo JSON Lines do último para o primeiro.
+
+    Lê blocos a partir do fim do arquivo, então parar cedo (ex: só as
+    primeiras N entradas) custa proporcional a N, não ao arquivo inteiro.
+    Linhas corrompidas (ex: escrita interrompida) são ignoradas.
+
+    Args:
+        caminho: Path do arquivo .jsonl
+        tamanho_bloco: Bytes lidos por vez
+
+    Yields:
+        Dicts na ordem inversa de gravação
+    """
+    for _, registro in ler_jsonl_reverso_com_posicao(caminho, tamanho_bloco=tamanho_bloco):
+        yield registro
+
+
+def _abrir_jsonl(caminho):
+    """
+    Abre um arquivo JSON Lines para leitura binária. Segmentos comprimidos
+    (.gz/.zst) são descomprimidos em memória; as posições em bytes
+    continuam sendo as do conteúdo original.
+    """
+    if caminho.endswith((".gz", ".zst")):
+        with open(caminho, "rb") as f:
+            return io.BytesIO(descomprimir(f.read()))
+    return open(caminho, "rb")
+
+
+def ler_jsonl_reverso_com_posicao(caminho, fim=None, tamanho_bloco=8192):
+    """
+    Como ler_jsonl_reverso, mas também informa onde cada linha começa.
+
+    Args:
+        caminho: Path do arquivo .jsonl (ou .jsonl.gz/.jsonl.zst)
+        fim: Lê apenas as linhas que começam antes deste byte (None = arquivo todo)
+        tamanho_bloco: Bytes lidos por vez
+
+    Yields:
+        Tuplas (byte inicial da linha, dict), na ordem inversa de gravação
+    """
+    try:
+        f = _abrir_jsonl(caminho)
+    except FileNotFoundError:
+        return
+
+    with f:
+        f.seek(0, os.SEEK_END)
+        posicao = f.tell() if fim is None else min(fim, f.tell())
+        resto = b""
+        while posicao > 0:
+            tamanho = min(tamanho_bloco, posicao)
+            posicao -= tamanho
+            with metricas.medir_io("leitura") as medicao:
+                f.seek(posicao)
+                bloco = f.read(tamanho)
+                medicao.bytes = len(bloco)
+            bloco += resto
+            linhas = bloco.split(b"\n")
+            # A primeira linha do bloco pode estar incompleta: fica para o próximo
+            resto = linhas.pop(0)
+            inicio = posicao + len(bloco)
+            for linha in reversed(linhas):
+                inicio -= len(linha) + 1
+                registro = _decodificar_linha_jsonl(linha, caminho)
+                if registro is not None:
+                    yield inicio + 1, registro
+        registro = _decodificar_linha_jsonl(resto, caminho)
+        if registro is not None:
+            yield 0, registro
+
+
+def _decodificar_linha_jsonl(linha, caminho):
+    """Decodifica uma linha JSON Lines; retorna None para linhas vazias ou inválidas."""
+    linha = linha.strip()
+    if not linha:
+        return None
+    try:
+        return orjson.loads(linha) if orjson is not None else json.loads(linha)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        print(f"Linha inválida ignorada em {caminho}")
+        return None
+
+
+def _segmentos_historico():
+    """Lista os segmentos do histórico, do mais antigo para o mais novo."""
+    try:
+        nomes = os.listdir(HISTORICO_DIR)
+    except FileNotFoundError:
+        return []
+    nomes = [n for n in nomes if _NOME_SEGMENTO.match(n)]
+    return [os.path.join(HISTORICO_DIR, n) for n in sorted(nomes, key=_numero_segmento)]
+
+
+def versao_historico():
+    """
+    Versão do histórico em JSON Lines: muda a cada entrada anexada (o
+    segmento mais novo cresce) e quando segmentos são criados ou apagados.
+    """
+    segmentos = _segmentos_historico()
+    if not segmentos:
+        return ()
+    try:
+        assinatura = CacheArquivos.assinatura(segmentos[-1])
+    except FileNotFoundError:
+        return None
+    return (len(segmentos), os.path.basename(segmentos[-1])) + assinatura
+
+
+def numeros_segmentos_historico():
+    """Números dos segmentos do histórico existentes, do mais antigo ao mais novo."""
+    return [_numero_segmento(caminho) for caminho in _segmentos_historico()]
+
+
+# historico.000001.jsonl, ou .jsonl.gz/.jsonl.zst depois de fechado e comprimido
+_NOME_SEGMENTO = re.compile(r"^historico\.\d+\.jsonl(\.gz|\.zst)?$")
+
+
+def _caminho_segmento(numero):
+    return os.path.join(HISTORICO_DIR, f"historico.{numero:06d}.jsonl")
+
+
+def _numero_segmento(caminho):
+    return int(os.path.basename(caminho).split(".")[1])
+
+
+def _contar_linhas(caminho):
+    with _abrir_jsonl(caminho) as f:
+        return sum(1 for linha in f if linha.strip())
+
+
+def _comprimir_segmento(caminho):
+    """Troca um segmento fechado pela versão comprimida (COMPRESSAO_HISTORICO)."""
+    with open(caminho, "rb") as f:
+        conteudo, extensao = comprimir(f.read(), COMPRESSAO_HISTORICO)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(conteudo)
+    os.replace(temp_path, caminho + extensao)
+    os.remove(caminho)
+
+
+def anexar_historico(entradas):
+    """
+    Acrescenta entradas (mais antiga primeiro) ao segmento ativo do histórico.
+
+    Quando o segmento passa de HISTORICO_SEGMENTO_BYTES, ele é fechado e
+    os segmentos mais antigos que já não são necessários para manter
+    MAX_HISTORICO_ENTRIES são apagados inteiros.
+
+    Returns:
+        True se sucesso, False se houver erro
+    """
+    segmentos = _segmentos_historico()
+    ativo = segmentos[-1] if segmentos else _caminho_segmento(1)
+    if ativo.endswith((".gz", ".zst")):
+        # Segmento comprimido já está fechado: abre o próximo
+        ativo = _caminho_segmento(_numero_segmento(ativo) + 1)
+
+    tamanho = anexar_jsonl(ativo, entradas)
+    if tamanho is None:
+        return False
+
+    if tamanho >= HISTORICO_SEGMENTO_BYTES:
+        numero = _numero_segmento(ativo)
+        # Cria o próximo segmento vazio: a partir de agora ele é o ativo
+        open(_caminho_segmento(numero + 1), "a").close()
+        if COMPRESSAO_HISTORICO:
+            try:
+                _comprimir_segmento(ativo)
+            except Exception as e:
+                print(f"Erro ao comprimir {ativo}: {e}")
+        _descartar_segmentos_antigos()
+    return True
+
+
+def _descartar_segmentos_antigos():
+    """Apaga segmentos fechados que ficaram além da retenção."""
+    fechados = _segmentos_historico()[:-1]
+    total = 0
+    for i in range(len(fechados) - 1, -1, -1):
+        if total >= MAX_HISTORICO_ENTRIES:
+            for caminho in fechados[:i + 1]:
+                os.remove(caminho)
+            return
+        total += _contar_linhas(fechados[i])
+
+
+def ler_historico():
+    """
+    Gera as entradas do histórico, da mais recente para a mais antiga.
+
+    Percorre os segmentos do mais novo para o mais antigo, cada um lido de
+    trás para frente.
+    """
+    for caminho in reversed(_segmentos_historico()):
+        yield from ler_jsonl_reverso(caminho)
+
+
+def ler_historico_a_partir(cursor=None):
+    """
+    Gera (cursor, entrada) do mais recente para o mais antigo.
+
+    O cursor de uma entrada ("<segmento>:<byte>") é estável porque o
+    histórico só recebe acréscimos: passá-lo de volta retoma a leitura logo
+    depois dela (entradas mais antigas), sem reler as anteriores.
+
+    Args:
+        cursor: Cursor devolvido em uma leitura anterior, ou None para o início
+    """
+    segmentos = _segmentos_historico()
+    numero_cursor, fim = None, None
+    if cursor:
+        try:
+            numero_cursor, fim = (int(parte) for parte in cursor.split(":", 1))
+        except ValueError:
+            numero_cursor, fim = None, None
+
+    for caminho in reversed(segmentos):
+        numero = _numero_segmento(caminho)
+        if numero_cursor is not None and numero > numero_cursor:
+            continue
+        limite = fim if numero == numero_cursor else None
+        for inicio, registro in ler_jsonl_reverso_com_posicao(caminho, fim=limite):
+            yield f"{numero}:{inicio}", registro
+
+
+def limpar_historico():
+    """Apaga todos os segmentos do histórico."""
+    for caminho in _segmentos_historico():
+        os.remove(caminho)
+    return True
+
+
+def migrar_historico_legado():
+    """
+    Converte o historico.json antigo (lista, mais recente primeiro) em segmentos.
+
+    Só age se ainda não houver segmentos. O arquivo antigo é renomeado para
+    historico.json.migrado.
+    """
+    if _segmentos_historico() or not os.path.exists(HISTORICO_PATH):
+        return
+
+    # Só as MAX_HISTORICO_ENTRIES primeiras (mais recentes) são lidas
+    try:
+        logs = list(islice(ler_registros_json(HISTORICO_PATH), MAX_HISTORICO_ENTRIES))
+    except json.JSONDecodeError:
+        logs = carregar_json(HISTORICO_PATH)[:MAX_HISTORICO_ENTRIES]
+    anexar_historico(list(reversed(logs)))
+    os.replace(HISTORICO_PATH, f"{HISTORICO_PATH}.migrado")
+
+
 def salvar_log(acao, detalhe):
     """
     Salva uma entrada no histórico com rotação automática.
@@ -120,19 +941,255 @@ def salvar_log(acao, detalhe):
         acao: Ação realizada (ex: "Criou missão")
         detalhe: Detalhes da ação
     """
-    logs = carregar_json(HISTORICO_PATH)
-    
-    logs.insert(0, {
+    entrada = {
         "data": datetime.now().strftime("%Y-%m-%d %H:%M"),
         "acao": str(acao),
         "resultado": str(detalhe)
-    })
-    
-    # Rotacionar histórico se exceder o limite
-    if len(logs) > MAX_HISTORICO_ENTRIES:
-        logs = logs[:MAX_HISTORICO_ENTRIES]
-    
-    salvar_json(HISTORICO_PATH, logs)
+    }
+    sessao = sessao_atual()
+    if sessao is not None:
+        sessao.registrar_log(entrada)
+    else:
+        _gravar_logs([entrada])
+
+
+def _gravar_logs(entradas):
+    """Anexa as entradas ao histórico e as publica nas abas conectadas."""
+    if _repositorio().adicionar_logs(entradas) is False:
+        return False
+    for entrada in entradas:
+        eventos.publicar("historico", entrada)
+    return True
+
+
+def publicar_evento(tipo, dados):
+    """
+    Publica um evento ao vivo (ver eventos.py) depois que a sessão ativa
+    gravar tudo com sucesso, ou na hora se não houver sessão.
+    """
+    sessao = _sessao.get()
+    if sessao is None:
+        eventos.publicar(tipo, dados)
+    else:
+        sessao.registrar_evento(tipo, dados)
+
+
+def _repositorio():
+    """Retorna o repositório configurado (import tardio: database importa utils)."""
+    from database import get_repositorio
+    return get_repositorio()
+
+
+_sessao = contextvars.ContextVar("fury_sessao", default=None)
+
+
+class UnidadeDeTrabalho:
+    """
+    Sessão de dados de uma requisição (unit of work).
+
+    Cada store (perfil, missões...) é carregado no máximo uma vez (em uma
+    sessão exclusiva, como cópia privada); gravações apenas atualizam a
+    cópia em memória e marcam o store como alterado, e as entradas de
+    histórico ficam em espera. concluir() grava cada store alterado uma
+    única vez e anexa o histórico em uma só escrita; só então os eventos ao
+    vivo da sessão são publicados e as tarefas de depois_de_concluir()
+    executadas.
+    """
+
+    def __init__(self, exclusiva=False):
+        self._dados = {}
+        self._gravadores = {}
+        self._logs = []
+        self._eventos = []
+        self._tarefas = []
+        self.exclusiva = exclusiva
+
+    def carregar(self, chave, carregador, copiar=None):
+        """
+        Retorna o store `chave`, chamando `carregador` só na primeira vez.
+
+        Em uma sessão exclusiva, o que `carregador` devolve passa antes por
+        `copiar` (se informado): as alterações da sessão não tocam os
+        objetos do cache, vistos pelas outras requisições.
+        """
+        if chave not in self._dados:
+            dados = carregador()
+            if copiar is not None and self.exclusiva:
+                dados = copiar(dados)
+            self._dados[chave] = dados
+        return self._dados[chave]
+
+    def salvar(self, chave, dados, gravador):
+        """Substitui o store em memória e agenda a gravação com `gravador`."""
+        self._dados[chave] = dados
+        self._gravadores[chave] = gravador
+        return True
+
+    def carregado(self, chave):
+        """Retorna o store `chave` se já foi carregado nesta sessão, senão None."""
+        return self._dados.get(chave)
+
+    def esquecer(self, chave):
+        """Descarta o store da sessão (sem gravar)."""
+        self._dados.pop(chave, None)
+        self._gravadores.pop(chave, None)
+
+    def registrar_log(self, entrada):
+        """Coloca uma entrada de histórico na fila de gravação."""
+        self._logs.append(entrada)
+
+    def registrar_evento(self, tipo, dados):
+        """Guarda um evento ao vivo para publicar depois das gravações."""
+        self._eventos.append((tipo, dados))
+
+    def depois_de_concluir(self, tarefa):
+        """Agenda `tarefa()` para depois das gravações (descartada se a sessão não gravar)."""
+        self._tarefas.append(tarefa)
+
+    def pendente(self):
+        """True se há stores alterados ou histórico ainda não gravados."""
+        return bool(self._gravadores or self._logs)
+
+    def concluir(self):
+        """
+        Grava os stores alterados e o histórico pendente.
+
+        Returns:
+            True se todas as gravações tiveram sucesso
+        """
+        sucesso = True
+        for chave, gravador in self._gravadores.items():
+            if gravador(self._dados[chave]) is False:
+                print(f"Erro ao gravar {chave} no fim da requisição")
+                sucesso = False
+        if sucesso:
+            for tipo, dados in self._eventos:
+                eventos.publicar(tipo, dados)
+        if self._logs:
+            sucesso = _gravar_logs(self._logs) and sucesso
+        if sucesso:
+            for tarefa in self._tarefas:
+                tarefa()
+        if self.exclusiva and eventos.ha_assinantes():
+            # Só em requisições que alteram dados e com alguma aba conectada
+            eventos.publicar_estatisticas(_repositorio().estatisticas())
+        self._gravadores = {}
+        self._logs = []
+        self._eventos = []
+        self._tarefas = []
+        return sucesso
+
+
+def sessao_atual():
+    """Retorna a UnidadeDeTrabalho ativa no contexto atual, ou None."""
+    return _sessao.get()
+
+
+def iniciar_sessao(exclusiva=False):
+    """
+    Abre uma UnidadeDeTrabalho para o contexto atual (ex: uma requisição).
+
+    Args:
+        exclusiva: Mantém a trava de data/ até encerrar_sessao(), de modo
+            que todo o ciclo ler-alterar-gravar da sessão é atômico entre
+            processos. Use nas requisições que alteram dados.
+    """
+    if exclusiva:
+        _trava_dados.adquirir()
+    sessao = UnidadeDeTrabalho(exclusiva)
+    _sessao.set(sessao)
+    return sessao
+
+
+def encerrar_sessao(gravar=True):
+    """
+    Fecha a sessão ativa, gravando as alterações se `gravar` for True.
+
+    Sem sessão ativa, não faz nada.
+
+    Returns:
+        True se sucesso (ou nada a fazer), False se alguma gravação falhou
+    """
+    sessao = _sessao.get()
+    if sessao is None:
+        return True
+    _sessao.set(None)
+    try:
+        if not gravar:
+            # As alterações ficaram nas cópias da sessão: o cache segue válido
+            return True
+        return sessao.concluir()
+    finally:
+        if sessao.exclusiva:
+            _trava_dados.liberar()
+
+
+@contextmanager
+def unidade_de_trabalho(exclusiva=True):
+    """Context manager para scripts: grava tudo ao sair, descarta em caso de erro."""
+    sessao = iniciar_sessao(exclusiva)
+    try:
+        yield sessao
+    except Exception:
+        encerrar_sessao(gravar=False)
+        raise
+    encerrar_sessao()
+
+
+def carregar_em_sessao(chave, carregador, copiar=copy.deepcopy):
+    """
+    Carrega via sessão ativa (no máximo uma vez) ou direto se não houver.
+
+    Args:
+        chave: Nome do store na sessão
+        carregador: Função que lê o store (em geral do cache de arquivos)
+        copiar: Em sessão exclusiva, faz a cópia privada do que foi lido
+            (padrão: cópia profunda); None para stores que o carregador já
+            cria do zero. A cópia só substitui a do cache quando salvar_json
+            grava, então uma sessão descartada não deixa rastro.
+    """
+    sessao = _sessao.get()
+    if sessao is None:
+        return carregador()
+    return sessao.carregar(chave, carregador, copiar)
+
+
+def salvar_em_sessao(chave, dados, gravador):
+    """Adia a gravação para o fim da sessão ativa, ou grava direto se não houver."""
+    sessao = _sessao.get()
+    if sessao is None:
+        return gravador(dados)
+    return sessao.salvar(chave, dados, gravador)
+
+
+def apos_sessao(tarefa):
+    """Executa `tarefa()` depois que a sessão ativa gravar, ou já se não houver sessão."""
+    sessao = _sessao.get()
+    if sessao is None:
+        return tarefa()
+    sessao.depois_de_concluir(tarefa)
+
+
+def versoes_dados(versoes=None):
+    """
+    Versões dos dados ("missoes", "tags", "perfil", "historico"), usadas como
+    chave do cache de fragmentos de template.
+
+    Args:
+        versoes: Versões lidas do repositório antes de carregar os dados da
+            requisição (ver app.py); se None, lê agora
+
+    Returns:
+        Dict área → versão; None nas áreas com alterações ainda não gravadas
+        (na sessão ou no write-behind do perfil), que não podem ser cacheadas
+    """
+    versoes = dict(versoes if versoes is not None else _repositorio().versoes())
+    sessao = _sessao.get()
+    if sessao is not None and sessao.pendente():
+        return dict.fromkeys(versoes)
+    if _perfil_adiado is not None and _perfil_adiado.tem_pendente():
+        versoes["perfil"] = None
+    return versoes
 
 
 def validar_titulo(titulo):
@@ -165,21 +1222,82 @@ def validar_titulo(titulo):
     return True, titulo_sanitizado, ""
 
 
+def gerar_id_missao():
+    """Gera um ID curto, estável e único para uma missão."""
+    return uuid.uuid4().hex[:12]
+
+
+def gerar_id_tag():
+    """Gera um ID curto e único para uma tag."""
+    return uuid.uuid4().hex[:12]
+
+
+_COR_TAG = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+def validar_tag(nome, cor):
+    """
+    Valida nome e cor (#rrggbb) de uma tag.
+
+    Returns:
+        Tuple (is_valid: bool, nome_sanitizado: str, error_msg: str)
+    """
+    nome = (nome or "").strip() if isinstance(nome, str) else ""
+    if not nome:
+        return False, "", "Nome da tag é obrigatório!"
+    if len(nome) > MAX_TAG_NOME_LENGTH:
+        return False, nome, f"Nome da tag deve ter no máximo {MAX_TAG_NOME_LENGTH} caracteres"
+    if not isinstance(cor, str) or not _COR_TAG.match(cor):
+        return False, nome, "Cor inválida (use #rrggbb)"
+    return True, nome.replace("<", "&lt;").replace(">", "&gt;"), ""
+
+
+def validar_tag_missao(tag):
+    """
+    Valida a tag informada para uma missão: {id} de uma tag existente ou
+    {nome, cor}. Um nome que ainda não existe cria a tag ao gravar a
+    missão, então passa pelas mesmas regras de validar_tag.
+
+    Returns:
+        Tuple (is_valid: bool, tag: dict ou None, error_msg: str); a tag
+        volta como a gravada ({id, nome, cor}) se já existe
+    """
+    if not tag:
+        return True, None, ""
+    repo = _repositorio()
+    if tag.get("id"):
+        existente = repo.obter_tag(tag["id"])
+        if existente is None:
+            return False, None, "Tag não encontrada."
+        return True, existente, ""
+    valida, nome, erro = validar_tag(tag.get("nome"), tag.get("cor"))
+    existente = repo.tag_por_nome(nome) if nome else None
+    if existente is not None:
+        return True, existente, ""
+    if not valida:
+        return False, None, erro
+    return True, {"nome": nome, "cor": tag["cor"]}, ""
+
+
 def criar_missao(titulo, tag=None):
     """
     Cria uma nova estrutura de missão se o título for válido.
     
     Args:
         titulo: O título da missão.
-        tag: Dicionário opcional com cor e nome da tag (ou apenas nome).
+        tag: Dicionário opcional com cor e nome da tag (ou apenas nome,
+            de uma tag existente), ou {id} (ver validar_tag_missao).
 
     Returns:
         Tuple (success: bool, missao_dict: dict, error_msg: str)
     """
     sucesso, titulo_sanitizado, erro = validar_titulo(titulo)
+    if sucesso:
+        sucesso, tag, erro = validar_tag_missao(tag)
     
     if sucesso:
         missao = {
+            "id": gerar_id_missao(),
             "titulo": titulo_sanitizado,
             "status": STATUS_DEFAULT,
             "data_criacao": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -192,6 +1310,63 @@ def criar_missao(titulo, tag=None):
     return False, {}, erro
 
 
+def ordem_entre(anterior, proxima):
+    """
+    Calcula a chave de ordem de uma missão colocada entre duas vizinhas.
+    
+    Args:
+        anterior: Ordem da vizinha de cima (None = início da lista)
+        proxima: Ordem da vizinha de baixo (None = fim da lista)
+    
+    Returns:
+        Nova chave (float), ou None se as vizinhas estão próximas demais
+        e a lista precisa ser renumerada (rebalancear_ordem)
+    """
+    if anterior is None and proxima is None:
+        return ORDEM_PASSO
+    if anterior is None:
+        return proxima - ORDEM_PASSO
+    if proxima is None:
+        return anterior + ORDEM_PASSO
+    if proxima - anterior < ORDEM_INTERVALO_MINIMO:
+        return None
+    return (anterior + proxima) / 2
+
+
+def rebalancear_ordem(missoes):
+    """Renumera a ordem de uma lista já ordenada com intervalos de ORDEM_PASSO."""
+    for posicao, missao in enumerate(missoes, start=1):
+        missao["ordem"] = posicao * ORDEM_PASSO
+
+
+def somar_progresso(progresso, datas):
+    """
+    Inclui registros de progresso no resumo gravado na missão.
+
+    O resumo tem tamanho fixo: total, último registro e a contagem por dia
+    só dos PROGRESSO_DIAS_RESUMO dias mais recentes com registro (os
+    registros em si ficam no store de progresso do repositório).
+
+    Args:
+        progresso: Resumo atual ({"total", "ultimo", "dias"}) ou None
+        datas: Datas ISO dos novos registros
+
+    Returns:
+        Novo dict de resumo
+    """
+    progresso = progresso or {}
+    total = progresso.get("total", 0)
+    ultimo = progresso.get("ultimo") or ""
+    dias = dict(progresso.get("dias") or {})
+    for data in datas:
+        total += 1
+        ultimo = max(ultimo, data)
+        dias[data[:10]] = dias.get(data[:10], 0) + 1
+    if len(dias) > PROGRESSO_DIAS_RESUMO:
+        dias = dict(sorted(dias.items())[-PROGRESSO_DIAS_RESUMO:])
+    return {"total": total, "ultimo": ultimo, "dias": dias}
+
+
 def validar_status(status):
     """
     Valida se o status é válido.
@@ -207,22 +1382,167 @@ def validar_status(status):
     return True, status
 
 
+def perfil_padrao():
+    """Retorna um novo dict com o perfil inicial."""
+    return {
+        "nivel": 1,
+        "xp": 0,
+        "xp_proximo_nivel": 100,
+        "moedas": 0,
+        "streak": 0,
+        "dias_concluidos": [],  # Lista de datas YYYY-MM-DD
+        "inventario": [],       # Lista de IDs de itens comprados
+        "tema_ativo": ""        # ID do tema ativo (vazio = padrão)
+    }
+
+class GravadorAdiado:
+    """
+    Write-behind de um store: guarda só o estado mais recente e o grava em
+    segundo plano a cada `intervalo` segundos, coalescendo várias alterações
+    em uma única gravação.
+
+    pendente() devolve o estado ainda não gravado (inclusive durante a
+    gravação), para que as leituras vejam sempre a versão mais nova. Com
+    `trava`, cada gravação acontece com ela adquirida: quem a mantém (ex: uma
+    sessão exclusiva) pode descartar() sem corrida com a gravação.
+    """
+
+    def __init__(self, gravador, intervalo, trava=None):
+        self._gravador = gravador
+        self.intervalo = intervalo
+        self._trava = trava if trava is not None else nullcontext()
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._pendente = None
+        self._em_gravacao = None
+        self._parar = threading.Event()
+        self._thread = None
+        self.agendamentos = 0
+        self.gravacoes = 0
+
+    def agendar(self, dados):
+        """Substitui o estado pendente por uma cópia de `dados`."""
+        with self._lock:
+            self._pendente = copy.deepcopy(dados)
+            self.agendamentos += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._executar, name="gravador-adiado", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def pendente(self):
+        """Cópia do estado mais recente ainda não gravado, ou None."""
+        with self._lock:
+            dados = self._pendente if self._pendente is not None else self._em_gravacao
+            return copy.deepcopy(dados) if dados is not None else None
+
+    def tem_pendente(self):
+        """True se há estado ainda não gravado (sem copiá-lo, como pendente())."""
+        with self._lock:
+            return self._pendente is not None or self._em_gravacao is not None
+
+    def descartar(self):
+        """Esquece o estado pendente sem gravá-lo."""
+        with self._lock:
+            self._pendente = None
+
+    def descarregar(self):
+        """
+        Grava agora o estado pendente, se houver.
+
+        Returns:
+            True se sucesso (ou nada a gravar), False se a gravação falhou
+        """
+        with self._trava, self._lock_gravacao:
+            with self._lock:
+                dados, self._pendente = self._pendente, None
+                self._em_gravacao = dados
+            if dados is None:
+                return True
+            try:
+                sucesso = self._gravador(dados) is not False
+            except Exception as e:
+                print(f"Erro na gravação adiada: {e}")
+                sucesso = False
+            with self._lock:
+                self._em_gravacao = None
+                if sucesso:
+                    self.gravacoes += 1
+                elif self._pendente is None:
+                    # Tenta de novo no próximo ciclo
+                    self._pendente = dados
+            return sucesso
+
+    def parar(self):
+        """Encerra a thread e grava o que estiver pendente."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo + 5)
+        return self.descarregar()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.descarregar()
+
+
+# Write-behind do perfil (ver configurar_perfil_adiado); None = desativado
+_perfil_adiado = None
+
+
+def configurar_perfil_adiado(intervalo):
+    """
+    Ativa o write-behind do perfil: XP, moedas etc. ficam em memória e são
+    gravados no máximo a cada `intervalo` segundos e ao encerrar o processo.
+
+    Chame na thread principal para também gravar ao receber SIGTERM.
+
+    Returns:
+        O GravadorAdiado criado
+    """
+    global _perfil_adiado
+    _perfil_adiado = GravadorAdiado(
+        lambda perfil: _repositorio().salvar_perfil(perfil), intervalo, trava=_trava_dados
+    )
+    atexit.register(_perfil_adiado.parar)
+
+    # SIGTERM encerra sem rodar atexit; converte em SystemExit se ninguém
+    # (ex: gunicorn) já tratou o sinal
+    if (
+        threading.current_thread() is threading.main_thread()
+        and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
+    ):
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    return _perfil_adiado
+
+
+def descarregar_perfil():
+    """Grava já o perfil pendente do write-behind (sem efeito se desativado)."""
+    return _perfil_adiado.descarregar() if _perfil_adiado is not None else True
+
+
+def _carregar_perfil_atual():
+    if _perfil_adiado is not None:
+        pendente = _perfil_adiado.pendente()
+        if pendente is not None:
+            return pendente
+    return _repositorio().carregar_perfil()
+
+
+def _gravar_perfil(perfil):
+    if _perfil_adiado is not None:
+        sucesso = _perfil_adiado.agendar(perfil)
+    else:
+        sucesso = _repositorio().salvar_perfil(perfil)
+    if sucesso is not False:
+        eventos.publicar_perfil(perfil)
+    return sucesso
+
+
 def inicializar_perfil():
     """Cria o perfil padrão se não existir."""
-    if not os.path.exists(PERFIL_PATH):
-        perfil_padrao = {
-            "nivel": 1,
-            "xp": 0,
-            "xp_proximo_nivel": 100,
-            "moedas": 0,
-            "streak": 0,
-            "dias_concluidos": [],  # Lista de datas YYYY-MM-DD
-            "inventario": [],       # Lista de IDs de itens comprados
-            "tema_ativo": ""        # ID do tema ativo (vazio = padrão)
-        }
-        salvar_json(PERFIL_PATH, perfil_padrao)
-        return perfil_padrao
-    return carregar_json_dict(PERFIL_PATH)
+    return carregar_em_sessao("perfil", _carregar_perfil_atual)
 
 def carregar_perfil():
     """Carrega o perfil do usuário."""
@@ -230,7 +1550,17 @@ def carregar_perfil():
 
 def salvar_perfil(dados):
     """Salva o perfil do usuário."""
-    return salvar_json(PERFIL_PATH, dados)
+    return salvar_em_sessao("perfil", dados, _gravar_perfil)
+
+def apagar_perfil():
+    """Apaga o perfil; o próximo carregamento recria o padrão."""
+    sessao = sessao_atual()
+    if sessao is not None:
+        sessao.esquecer("perfil")
+    if _perfil_adiado is not None:
+        _perfil_adiado.descartar()
+    _repositorio().apagar_perfil()
+    eventos.publicar_perfil(perfil_padrao())
 
 def calcular_proximo_nivel(nivel):
     """Calcula XP necessário para o próximo nível (Exponencial suave)."""
@@ -351,3 +1681,94 @@ def equipar_item(item_id):
         return True, "Tema equipado com sucesso!"
     
     return False, "Este item não pode ser equipado."
+
+
+def _resumo_titulos(missoes, limite=5):
+    """Títulos para a entrada de histórico de um lote: "a, b, c e mais N"."""
+    titulos = [m["titulo"] for m in missoes[:limite]]
+    resumo = ", ".join(titulos)
+    if len(missoes) > limite:
+        resumo += f" e mais {len(missoes) - limite}"
+    return f"{len(missoes)} missão(ões): {resumo}"
+
+
+def executar_lote(acao, ids=(), tag=None, titulos=()):
+    """
+    Aplica uma ação a várias missões com uma leitura e uma gravação.
+
+    Grava uma única entrada de histórico para o lote e faz um único acerto
+    de XP/moedas (mesmos valores por missão das ações individuais).
+
+    Args:
+        acao: Uma de ACOES_LOTE
+        ids: IDs das missões (concluir, iniciar, tag, apagar)
+        tag: Dict {id} (tag existente) ou {nome, cor} para a ação "tag";
+            None remove a tag
+        titulos: Títulos das novas missões (importar)
+
+    Returns:
+        Tuple (sucesso: bool, mensagem: str, missoes: list) com as missões
+        afetadas
+    """
+    if acao not in ACOES_LOTE:
+        return False, "Ação inválida.", []
+    ids = list(dict.fromkeys(ids))
+    alvos = ids if acao != "importar" else [t for t in titulos if t and t.strip()]
+    if not alvos:
+        return False, "Nenhuma missão selecionada.", []
+    if len(alvos) > MAX_MISSOES_LOTE:
+        return False, f"Máximo de {MAX_MISSOES_LOTE} missões por lote.", []
+
+    repo = _repositorio()
+    xp = moedas = 0
+
+    if acao == "importar":
+        novas = []
+        for titulo in alvos:
+            sucesso, missao, erro = criar_missao(titulo.strip(), tag)
+            if not sucesso:
+                return False, f"{erro} ({titulo.strip()[:40]})", []
+            novas.append(missao)
+        if not repo.adicionar_missoes(novas):
+            return False, "Erro ao salvar missões.", []
+        afetadas, xp = novas, 10 * len(novas)
+        salvar_log("Criou missões (lote)", _resumo_titulos(afetadas))
+        mensagem = f"{len(afetadas)} missão(ões) criada(s) (+{xp} XP)!"
+    elif acao == "apagar":
+        afetadas = repo.remover_missoes(ids)
+        if afetadas:
+            salvar_log("Excluiu missões (lote)", _resumo_titulos(afetadas))
+        mensagem = f"{len(afetadas)} missão(ões) excluída(s)."
+    elif acao == "concluir":
+        # Só as que ainda não estavam concluídas rendem XP e moedas
+        pendentes = [m["id"] for m in repo.obter_missoes(ids) if m["status"] != "concluída"]
+        afetadas = repo.atualizar_missoes(pendentes, {"status": "concluída"}) if pendentes else []
+        if afetadas:
+            salvar_log("Concluiu missões (lote)", _resumo_titulos(afetadas))
+        xp, moedas = 50 * len(afetadas), 5 * len(afetadas)
+        mensagem = f"{len(afetadas)} missão(ões) concluída(s) (+{xp} XP, +{moedas} Moedas)!"
+    elif acao == "iniciar":
+        afetadas = repo.atualizar_missoes(ids, {"status": "em_andamento"})
+        if afetadas:
+            salvar_log("Iniciou missões (lote)", _resumo_titulos(afetadas))
+        mensagem = f"{len(afetadas)} missão(ões) iniciada(s)."
+    else:
+        # {id} (ex: tag_id da API) volta como a tag gravada, com o nome
+        # para o histórico
+        valida, tag, erro = validar_tag_missao(tag)
+        if not valida:
+            return False, erro, []
+        afetadas = repo.atualizar_missoes(ids, {"tag": tag})
+        if afetadas:
+            salvar_log("Editou missões (lote)", f"Tag {tag['nome'] if tag else 'removida'} em {_resumo_titulos(afetadas)}")
+        mensagem = f"Tag atualizada em {len(afetadas)} missão(ões)."
+
+    if not afetadas:
+        return False, "Nenhuma missão alterada.", []
+    if xp:
+        novo_nivel, subiu = adicionar_xp(xp)
+        if subiu:
+            mensagem += f" SUBIU DE NÍVEL! {novo_nivel}!"
+    if moedas:
+        adicionar_moedas(moedas)
+    return True, mensagem, afetadas
@@ -1,11 +1,17 @@
 # -*- mode: python ; coding: utf-8 -*-
+import subprocess
+import sys
+
+# Templates pré-compilados (bytecode Jinja) vão junto: o executável não
+# compila templates nem na primeira requisição
+subprocess.run([sys.executable, 'fragmentos.py', 'compilar'], check=True)
 
 
 a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('templates', 'templates'), ('static', 'static')],
+    datas=[('templates', 'templates'), ('static', 'static'), ('__pycache__/templates', '__pycache__/templates')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
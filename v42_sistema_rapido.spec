@@ -0,0 +1,74 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Build otimizado para a inicialização (pyinstaller v42_sistema_rapido.spec):
+#
+# - onedir: dist/v42_sistema_rapido/ com o executável e _internal/. Nada é
+#   extraído a cada execução (o onefile descompacta o pacote inteiro em uma
+#   pasta temporária toda vez que abre).
+# - sem UPX: binários comprimidos teriam de ser descomprimidos a cada carga.
+# - excludes: módulos da biblioteca padrão e extras do Flask que o app nunca
+#   importa, mas que a análise arrasta (menos arquivos para ler e mapear).
+# - templates pré-compilados (bytecode Jinja), como em v42_sistema.spec.
+#
+# Tempo até a primeira resposta: python benchmarks/bench_inicio.py --comando dist/v42_sistema_rapido/v42_sistema_rapido
+import subprocess
+import sys
+
+subprocess.run([sys.executable, 'fragmentos.py', 'compilar'], check=True)
+
+EXCLUDES = [
+    # Biblioteca padrão sem uso no app
+    'tkinter', 'unittest', 'doctest', 'pydoc', 'pydoc_data', 'lib2to3',
+    'distutils', 'xmlrpc', 'curses', 'ftplib', 'tarfile', 'webbrowser',
+    'asyncio', 'concurrent', 'multiprocessing', 'tracemalloc', 'statistics',
+    # Ferramentas de empacotamento trazidas pelos hooks
+    'setuptools', 'pkg_resources', 'jaraco', 'packaging', 'backports',
+    # Extras opcionais do Flask/Werkzeug (async, .env, reloader, SSL adhoc)
+    'asgiref', 'dotenv', 'watchdog', 'cryptography',
+    # Servidores de produção: o executável roda o app.py (python -m furycelula serve
+    # é para instalações com Python)
+    'gunicorn', 'waitress',
+]
+
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('templates', 'templates'), ('static', 'static'), ('__pycache__/templates', '__pycache__/templates')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='v42_sistema_rapido',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='v42_sistema_rapido',
+)
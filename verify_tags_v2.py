@@ -1,43 +1,43 @@
-from utils import criar_missao, carregar_perfil, salvar_perfil
+from utils import criar_missao
+from database import get_repositorio
 import datetime
 
 def test_tags_v2():
     print("Testing Tag System V2 (Fixes & Management)...")
-    
-    # 1. Criar Tag no Perfil
-    perfil = carregar_perfil()
-    tag_teste = {"nome": "TEST_V2", "cor": "#FF00FF"}
-    
-    if "tags" not in perfil:
-        perfil["tags"] = []
-    
+    repo = get_repositorio()
+
+    # 1. Criar Tag
     # Limpar anterior
-    perfil["tags"] = [t for t in perfil["tags"] if t["nome"] != "TEST_V2"]
-    perfil["tags"].append(tag_teste)
-    salvar_perfil(perfil)
+    anterior = repo.tag_por_nome("TEST_V2")
+    if anterior:
+        repo.remover_tag(anterior["id"])
+    tag_teste = repo.criar_tag("TEST_V2", "#FF00FF")
     print(" - Tag 'TEST_V2' criada.")
 
     # 2. Criar Missão com Tag (Agora deve funcionar)
-    sucesso, missao, erro = criar_missao("Missão Tag V2", tag_teste)
-    
-    if sucesso and missao.get("tag") == tag_teste:
+    sucesso, missao, erro = criar_missao("Missão Tag V2", {"nome": "TEST_V2", "cor": "#FF00FF"})
+
+    if sucesso and repo.adicionar_missao(missao) and repo.obter_missao(missao["id"]).get("tag") == tag_teste:
         print(" - SUCESSO: Missão criada com tag corretamente.")
     else:
         print(f" - FALHA: Missão não salvou tag. Erro: {erro}")
         print(f" - Dados da missão: {missao}")
         return
 
-    # 3. Testar Deletar Tag (Simulando a lógica da rota)
+    # 3. Renomear (só a tag muda; a missão acompanha pelo ID)
+    repo.renomear_tag(tag_teste["id"], "TEST_V2_RENOMEADA")
+    if repo.obter_missao(missao["id"])["tag"]["nome"] == "TEST_V2_RENOMEADA":
+        print(" - SUCESSO: Missão reflete o novo nome da tag.")
+    else:
+        print(" - FALHA: Missão não reflete o novo nome.")
+
+    # 4. Testar Deletar Tag
     print(" - Testando exclusão...")
-    perfil = carregar_perfil()
-    original_len = len(perfil["tags"])
-    perfil["tags"] = [t for t in perfil["tags"] if t["nome"] != "TEST_V2"]
-    
-    if len(perfil["tags"]) < original_len:
-        salvar_perfil(perfil)
-        print(" - SUCESSO: Tag 'TEST_V2' removida do perfil.")
+    if repo.remover_tag(tag_teste["id"]) is not None and "tag" not in repo.obter_missao(missao["id"]):
+        print(" - SUCESSO: Tag 'TEST_V2' removida (e da missão).")
     else:
         print(" - FALHA: Tag não foi removida.")
+    repo.remover_missao(missao["id"])
 
 if __name__ == "__main__":
     test_tags_v2()